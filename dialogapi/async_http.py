@@ -0,0 +1,444 @@
+"""asyncio のストリームで HTTP/1.1 リクエストを送信するトランスポートを実装するモジュール
+
+外部のライブラリには依存せず、asyncio のストリームの上で
+リポジトリが使う範囲の HTTP/1.1 (JSON・multipart/form-data のボディ、
+Content-Length または chunked のレスポンス) を扱う。
+リクエストはスレッドを使わずにイベントループ上で送信するため、
+同時に送信できるリクエスト数はホスト毎のコネクション数の上限 limit のみで決まる。
+"""
+
+
+import asyncio
+import json as json_
+import os
+import socket
+import ssl
+import time
+import uuid
+from collections import deque
+from collections import namedtuple
+from email.parser import Parser
+from http.client import HTTPMessage
+from urllib.parse import urlsplit
+from dialogapi.transport import AsyncTransport
+from dialogapi.transport import Timings
+
+
+# ホスト毎に同時に開くコネクション数のデフォルト値
+DEFAULT_LIMIT = 100
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# _prepare が受け付ける引数
+_KWARGS = {"headers", "json", "data", "files", "timeout", "verify"}
+
+_Prepared = namedtuple(
+    "_Prepared",
+    ["method", "scheme", "host", "port", "target", "headers", "body",
+     "timeout", "verify"]
+)
+
+
+class AsyncHTTPException(Exception):
+    """サーバの応答が HTTP として解釈できない場合に送出される例外"""
+
+
+class AsyncHTTPResponse:
+    """AsyncHTTP のレスポンス
+
+    requests.Response と同じ名前の属性とメソッドのうち、リポジトリが使うものを持つ。
+    """
+    def __init__(self, url, status_code, reason, headers, content):
+        self._url = url
+        self._status_code = status_code
+        self._reason = reason
+        self._headers = headers
+        self._content = content
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def status_code(self):
+        return self._status_code
+
+    @property
+    def reason(self):
+        return self._reason
+
+    @property
+    def headers(self):
+        """大文字・小文字を区別せずに参照できるレスポンスヘッダ"""
+        return self._headers
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def text(self):
+        return self._content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json_.loads(self._content.decode("utf-8"))
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class _HostPool:
+    """ホスト毎の待機中のコネクションと、同時に使うコネクション数の制限"""
+    def __init__(self, limit):
+        self.idle = deque()
+        self.semaphore = asyncio.Semaphore(limit) if limit else None
+
+
+class AsyncHTTP(AsyncTransport):
+    """keep-alive なコネクションプールを持つ asyncio の HTTP/1.1 トランスポート
+
+    インスタンスは長期間保持して使い回し、使い終わったら
+    同じイベントループ上で close を呼び出すこと。
+    同一ホストへのリクエストは TCP/TLS コネクションを再利用する。
+    コネクションは最初に送信したイベントループに属し、
+    別のイベントループから送信した場合は新たにコネクションを開く。
+    """
+    def __init__(self, verify, limit=DEFAULT_LIMIT, hooks=None):
+        """
+        Args:
+            verify (bool or str): SSL 検証を行うかどうか。
+                文字列の場合は CA バンドルのパスとして検証に使う
+            limit (int): ホスト毎に同時に開くコネクションの最大数。
+                これを超えるリクエストはコネクションが空くまで待機する。
+                0 または None の場合は制限しない
+            hooks (List[TransportHook]): 登録するフック
+        """
+        super().__init__(hooks=hooks)
+        self._verify = verify
+        self._limit = limit
+        self._loop = None
+        self._pools = dict()
+        self._ssl_contexts = dict()
+
+    @property
+    def verify(self):
+        return self._verify
+
+    @property
+    def limit(self):
+        return self._limit
+
+    async def close(self):
+        """待機中のコネクションを全て閉じる"""
+        pools, self._pools = self._pools, dict()
+        for pool in pools.values():
+            while pool.idle:
+                pool.idle.popleft().close()
+
+    def _prepare(self, method, url, kwargs):
+        unknown = set(kwargs) - _KWARGS
+        if unknown:
+            raise TypeError(
+                "Unsupported arguments: {}".format(", ".join(sorted(unknown)))
+            )
+        parts = urlsplit(url)
+        if parts.scheme not in _DEFAULT_PORTS:
+            raise ValueError("Unsupported URL: {}".format(url))
+        port = parts.port or _DEFAULT_PORTS[parts.scheme]
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        headers = {
+            "Host": parts.hostname if port == _DEFAULT_PORTS[parts.scheme]
+            else "{}:{}".format(parts.hostname, port),
+            "User-Agent": "dialogapi",
+            "Accept": "*/*",
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+        }
+        body, content_type = _encode_body(kwargs)
+        if content_type:
+            headers["Content-Type"] = content_type
+        if body or method in {"POST", "PUT"}:
+            headers["Content-Length"] = str(len(body))
+        headers.update(kwargs.get("headers") or {})
+
+        prepared = _Prepared(
+            method=method, scheme=parts.scheme, host=parts.hostname,
+            port=port, target=target, headers=headers, body=body,
+            timeout=kwargs.get("timeout"),
+            verify=kwargs.get("verify", self._verify)
+        )
+        return prepared, len(body)
+
+    async def _send(self, prepared):
+        if prepared.timeout is None:
+            return await self._send_pooled(prepared)
+        return await asyncio.wait_for(
+            self._send_pooled(prepared), prepared.timeout
+        )
+
+    async def _send_pooled(self, prepared):
+        pool = self._pool(prepared)
+        if pool.semaphore is None:
+            return await self._send_on_connection(pool, prepared)
+        async with pool.semaphore:
+            return await self._send_on_connection(pool, prepared)
+
+    async def _send_on_connection(self, pool, prepared):
+        conn = self._idle_connection(pool)
+        if conn is not None:
+            try:
+                return await self._exchange(
+                    pool, conn, prepared, Timings(None, None, None, None)
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 待機中にサーバが閉じたコネクションには新しいコネクションで再送する
+                pass
+        conn, timings = await self._connect(prepared)
+        return await self._exchange(pool, conn, prepared, timings)
+
+    def _pool(self, prepared):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 以前のイベントループのコネクションは使えない
+            self._loop = loop
+            self._pools = dict()
+        key = (prepared.scheme, prepared.host, prepared.port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _HostPool(self._limit)
+        return pool
+
+    def _idle_connection(self, pool):
+        while pool.idle:
+            conn = pool.idle.pop()
+            if not conn.reader.at_eof() and not conn.writer.is_closing():
+                return conn
+            conn.close()
+        return None
+
+    async def _connect(self, prepared):
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        sock = await _open_socket(loop, prepared.host, prepared.port)
+        connected = time.monotonic()
+        context = None
+        if prepared.scheme == "https":
+            context = self._ssl_context(prepared.verify)
+        try:
+            reader, writer = await asyncio.open_connection(
+                sock=sock, ssl=context,
+                server_hostname=prepared.host if context else None
+            )
+        except BaseException:
+            sock.close()
+            raise
+        end = time.monotonic()
+        timings = Timings(
+            connect=connected - start,
+            tls=end - connected if context else None,
+            ttfb=None, total=None
+        )
+        return _Connection(reader, writer), timings
+
+    def _ssl_context(self, verify):
+        key = verify if isinstance(verify, str) else bool(verify)
+        context = self._ssl_contexts.get(key)
+        if context is not None:
+            return context
+        if isinstance(verify, str):
+            if os.path.isdir(verify):
+                context = ssl.create_default_context(capath=verify)
+            else:
+                context = ssl.create_default_context(cafile=verify)
+        else:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+        self._ssl_contexts[key] = context
+        return context
+
+    async def _exchange(self, pool, conn, prepared, timings):
+        """リクエストを送信してレスポンスを読み込む
+
+        再利用できるコネクションはプールに戻し、それ以外は閉じる。
+        """
+        start = time.monotonic()
+        try:
+            conn.writer.write(_request_head(prepared) + prepared.body)
+            await conn.writer.drain()
+            version, status_code, reason, headers = \
+                await _read_head(conn.reader)
+            ttfb = time.monotonic() - start
+            content = await _read_body(
+                conn.reader, prepared.method, status_code, headers
+            )
+        except BaseException:
+            conn.close()
+            raise
+
+        connection = (headers.get("Connection") or "").lower()
+        keep_alive = "close" not in connection and (
+            version == "HTTP/1.1" or "keep-alive" in connection
+        ) and (
+            "Content-Length" in headers
+            or "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+            or not _has_body(prepared.method, status_code)
+        )
+        if keep_alive:
+            pool.idle.append(conn)
+        else:
+            conn.close()
+
+        url = "{}://{}:{}{}".format(
+            prepared.scheme, prepared.host, prepared.port, prepared.target
+        )
+        res = AsyncHTTPResponse(
+            url=url, status_code=status_code, reason=reason,
+            headers=headers, content=content
+        )
+        return res, timings._replace(ttfb=ttfb)
+
+
+async def _open_socket(loop, host, port):
+    """ノンブロッキングのソケットでホストに接続する"""
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    error = None
+    for family, type_, proto, _, address in infos:
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            await loop.sock_connect(sock, address)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+        except BaseException:
+            sock.close()
+            raise
+    raise error or OSError("Cannot resolve {}".format(host))
+
+
+def _encode_body(kwargs):
+    """ボディのバイト列と Content-Type を返す
+
+    files はフィールド名とファイルオブジェクトの辞書とし、
+    requests と同様に multipart/form-data で送信する。
+    """
+    if kwargs.get("files"):
+        return _encode_multipart(kwargs["files"], kwargs.get("data") or {})
+    if kwargs.get("json") is not None:
+        return json_.dumps(kwargs["json"]).encode("utf-8"), \
+            "application/json"
+    data = kwargs.get("data")
+    if data is None:
+        return b"", None
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return data, None
+
+
+def _encode_multipart(files, fields):
+    boundary = uuid.uuid4().hex
+    body = []
+    for name, value in fields.items():
+        body.append(
+            '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n'
+            .format(boundary, name).encode("utf-8")
+        )
+        body.append(_bytes(value) + b"\r\n")
+    for name, f in files.items():
+        filename = os.path.basename(getattr(f, "name", None) or name)
+        body.append(
+            '--{}\r\nContent-Disposition: form-data; name="{}"; '
+            'filename="{}"\r\n\r\n'
+            .format(boundary, name, filename).encode("utf-8")
+        )
+        body.append(_bytes(f.read()) + b"\r\n")
+    body.append("--{}--\r\n".format(boundary).encode("utf-8"))
+    return b"".join(body), \
+        "multipart/form-data; boundary={}".format(boundary)
+
+
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+def _request_head(prepared):
+    lines = ["{} {} HTTP/1.1".format(prepared.method, prepared.target)]
+    lines.extend(
+        "{}: {}".format(key, value)
+        for key, value in prepared.headers.items()
+    )
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _read_head(reader):
+    """ステータス行とヘッダを読み込む。1xx の応答は読み飛ばす"""
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        try:
+            version, status, *reason = \
+                line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+            status_code = int(status)
+        except ValueError:
+            raise AsyncHTTPException(
+                "Invalid status line: {!r}".format(line)
+            )
+        lines = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(line, None)
+            if line in (b"\r\n", b"\n"):
+                break
+            lines.append(line.decode("latin-1"))
+        if 100 <= status_code < 200:
+            continue
+        headers = Parser(_class=HTTPMessage).parsestr("".join(lines))
+        return version, status_code, " ".join(reason), headers
+
+
+def _has_body(method, status_code):
+    return method != "HEAD" and status_code not in {204, 304} \
+        and not 100 <= status_code < 200
+
+
+async def _read_body(reader, method, status_code, headers):
+    if not _has_body(method, status_code):
+        return b""
+    if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+        chunks = []
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise AsyncHTTPException(
+                    "Invalid chunk size: {!r}".format(line)
+                )
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # トレーラは読み飛ばす
+        while await reader.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+    if "Content-Length" in headers:
+        return await reader.readexactly(int(headers["Content-Length"]))
+    return await reader.read()
@@ -0,0 +1,391 @@
+"""repository モジュールの各リポジトリに対応する asyncio 版リポジトリを実装するモジュール
+
+各リポジトリは同名のメソッドをコルーチンとして提供する。
+HTTP リクエストは server.AsyncEndpoint のトランスポートでイベントループ上から送信し、
+スレッドを使わないため、一つのイベントループで多数のリクエストを同時に送信できる。
+ステータスコードの確認とレスポンスの解釈は同期版リポジトリと同じ規則で行う。
+"""
+
+
+import asyncio
+import contextvars
+from dialogapi.entity import Project
+from dialogapi.repository import StatusCodeException
+from dialogapi.repository import assert_status_code
+from dialogapi.repository import authorizer_header
+from dialogapi.repository import _application
+from dialogapi.repository import _bot_data
+from dialogapi.repository import _bots
+from dialogapi.repository import _scenario_status
+from dialogapi.repository import _upload_status_code
+from dialogapi.repository import _warn_sraix_rejected
+from dialogapi.repository import _warn_sraix_unsupported
+
+
+async def authorized_request(endpoint, user, method, url, **kwargs):
+    """repository.authorized_request の asyncio 版
+
+    ステータスコード 401 が返った場合は一度だけ再ログインして再送する。
+    再ログインは他のスレッドのリクエストとも排他するため、
+    同期版のリポジトリで Executor 上で行う。
+
+    Args:
+        endpoint (AsyncEndpoint): エンドポイント
+        user (User): 認証済みのユーザ
+        method (str): get, post, put, delete のいずれか
+        url (str): URL
+        kwargs: トランスポートに渡す引数
+
+    Returns:
+        レスポンス
+    """
+    access_token = user.access_token
+    send = getattr(endpoint.transport, method)
+    res = await send(url, headers=authorizer_header(user), **kwargs)
+    if res.status_code == 401 and await _run_in_executor(
+        user.reauthorize, access_token
+    ):
+        # アップロードするファイルは先頭から送り直す
+        for f in kwargs.get("files", {}).values():
+            f.seek(0)
+        res = await send(url, headers=authorizer_header(user), **kwargs)
+    return res
+
+
+async def _run_in_executor(func, *args):
+    # プロファイルのボットとフェーズを Executor のスレッドに引き継ぐ
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, contextvars.copy_context().run, func, *args
+    )
+
+
+class AsyncUserRepository:
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    async def login(self, user):
+        """repository.UserRepository.login を参照"""
+        if not user.password:
+            raise Exception("Set password")
+
+        data = {"accountName": user.name, "password": user.password}
+        res = await self._endpoint.transport.post(
+            self._endpoint.url("login"),
+            json=data,
+            headers=self._endpoint.header,
+            timeout=3
+        )
+        assert_status_code(200, res.status_code)
+        user.set_authorized(access_token=res.json()["accessToken"])
+        return user
+
+
+class AsyncProjectRepository:
+    def __init__(self, endpoint, user):
+        self._endpoint = endpoint
+        self._user = user
+
+    async def get_all(self):
+        res = await authorized_request(
+            self._endpoint, self._user, "get", self._endpoint.url("projects")
+        )
+        assert_status_code(200, res.status_code)
+        return [Project(name=item["projectName"],
+                        id_=item["projectId"],
+                        organization_id=item['organizationId'],
+                        create_date=item['createDate'])
+                for item in res.json()["projects"]]
+
+    async def get(self, project):
+        for project_ in await self.get_all():
+            if project_.name == project.name:
+                return project_
+        raise Exception("Project {} not found".format(project.name))
+
+
+class AsyncBotRepository:
+    def __init__(self, endpoint, user, project, capabilities=None):
+        """
+        引数は repository.BotRepository を参照。endpoint は AsyncEndpoint とする
+        """
+        self._endpoint = endpoint
+        self._user = user
+        self._project = project
+        self._capabilities = capabilities
+        # サーバに存在するボットIDの集合。exists の初回呼び出し時に取得する
+        self._bot_ids = None
+        self._bot_ids_lock = None
+
+    def _bots_url(self, bot=None, point=None):
+        url = "projects/{}/bots".format(self._project.id_)
+        if bot:
+            url += "/{}".format(bot.id_)
+        if point:
+            url += "/{}".format(point)
+        return self._endpoint.url(url)
+
+    async def _request(self, method, url, **kwargs):
+        return await authorized_request(
+            self._endpoint, self._user, method, url, **kwargs
+        )
+
+    async def get_all(self):
+        res = await self._request("get", self._bots_url())
+        assert_status_code(200, res.status_code)
+        return _bots(res, self, self._capabilities)
+
+    async def get(self, bot):
+        for bot_ in await self.get_all():
+            if bot_.id_ == bot.id_:
+                return bot_
+        raise Exception("Bot {} not found".format(bot.id_))
+
+    async def exists(self, bot):
+        """repository.BotRepository.exists を参照"""
+        if self._bot_ids_lock is None:
+            self._bot_ids_lock = asyncio.Lock()
+        async with self._bot_ids_lock:
+            if self._bot_ids is None:
+                self._bot_ids = {bot_.id_ for bot_ in await self.get_all()}
+            return bot.id_ in self._bot_ids
+
+    def _set_exists(self, bot, exists):
+        if self._bot_ids is None:
+            return
+        if exists:
+            self._bot_ids.add(bot.id_)
+        else:
+            self._bot_ids.discard(bot.id_)
+
+    async def add(self, bot, ignore_sraix=None):
+        """repository.BotRepository.add を参照"""
+        await self._send_with_sraix(self._add, bot, ignore_sraix)
+        self._set_exists(bot, True)
+
+    async def _send_with_sraix(self, send, bot, ignore_sraix):
+        """repository.BotRepository._send_with_sraix の asyncio 版"""
+        capabilities = self._capabilities
+        if ignore_sraix is not None:
+            await send(bot=bot, ignore_sraix=ignore_sraix)
+            return
+        if capabilities is None:
+            await self._send_detecting_sraix(send, bot)
+            return
+        if capabilities.sraix is None:
+            async with capabilities.async_detecting():
+                if capabilities.sraix is None:
+                    await self._send_detecting_sraix(send, bot)
+                    return
+
+        if capabilities.sraix is False:
+            _warn_sraix_unsupported(capabilities, bot)
+            await send(bot=bot, ignore_sraix=True)
+        elif capabilities.configured:
+            await send(bot=bot, ignore_sraix=False)
+        else:
+            await self._send_detecting_sraix(send, bot)
+
+    async def _send_detecting_sraix(self, send, bot):
+        capabilities = self._capabilities
+        try:
+            await send(bot=bot, ignore_sraix=False)
+        except StatusCodeException as e:
+            if e.status_code != 400:
+                raise
+            _warn_sraix_rejected(capabilities)
+            await send(bot=bot, ignore_sraix=True)
+            if capabilities:
+                capabilities.set_sraix(False)
+        else:
+            if capabilities:
+                capabilities.set_sraix(True)
+
+    async def _add(self, bot, ignore_sraix=False):
+        res = await self._request(
+            "post", self._bots_url(),
+            json=_bot_data(bot, ignore_sraix, add=True)
+        )
+        assert_status_code(201, res.status_code)
+
+    async def remove(self, bot):
+        res = await self._request("delete", self._bots_url(bot))
+        assert_status_code(204, res.status_code)
+        self._set_exists(bot, False)
+
+    async def update(self, bot, ignore_sraix=None):
+        """repository.BotRepository.update を参照"""
+        await self._send_with_sraix(self._update, bot, ignore_sraix)
+
+    async def _update(self, bot, ignore_sraix=False):
+        res = await self._request(
+            "put", self._bots_url(bot),
+            json=_bot_data(bot, ignore_sraix, add=False)
+        )
+        assert_status_code(204, res.status_code)
+
+    async def compile(self, bot):
+        res = await self._request(
+            "post", self._bots_url(bot, "scenarios/compile")
+        )
+        assert_status_code(202, res.status_code)
+        return res.json()
+
+    async def compile_status(self, bot):
+        return (await self.compile_state(bot=bot)).completed
+
+    async def compile_state(self, bot):
+        res = await self._request(
+            "get", self._bots_url(bot, "scenarios/compile/status")
+        )
+        assert_status_code(200, res.status_code)
+        return _scenario_status([res.json()])
+
+    async def transfer(self, bot):
+        res = await self._request(
+            "post", self._bots_url(bot, "scenarios/transfer")
+        )
+        assert_status_code(202, res.status_code)
+        return res.json()
+
+    async def transfer_status(self, bot):
+        return (await self.transfer_state(bot=bot)).completed
+
+    async def transfer_state(self, bot):
+        res = await self._request(
+            "get", self._bots_url(bot, "scenarios/transfer/status")
+        )
+        assert_status_code(200, res.status_code)
+        return _scenario_status(res.json()["transferStatusResponses"])
+
+
+class _AsyncBotResourceRepository:
+    """ボット毎のリソースを操作するリポジトリ。継承して利用する"""
+    def __init__(self, endpoint, user, project, bot):
+        self._endpoint = endpoint
+        self._user = user
+        self._project = project
+        self._bot = bot
+
+    def _url(self, point):
+        return self._endpoint.url("projects/{}/bots/{}/{}".format(
+            self._project.id_, self._bot.id_, point
+        ))
+
+    async def _request(self, method, point, **kwargs):
+        return await authorized_request(
+            self._endpoint, self._user, method, self._url(point), **kwargs
+        )
+
+    async def _upload(self, point, filename):
+        with open(filename, encoding="utf-8") as f:
+            res = await self._request("put", point, files={"uploadFile": f})
+        return _upload_status_code(res)
+
+
+class AsyncAIMLRepository(_AsyncBotResourceRepository):
+    async def upsert(self, aiml):
+        return await self._upload("aiml", aiml.filename)
+
+
+class AsyncSetRepository(_AsyncBotResourceRepository):
+    async def upsert(self, set):
+        return await self._upload("sets", set.filename)
+
+
+class AsyncMapRepository(_AsyncBotResourceRepository):
+    async def upsert(self, map):
+        return await self._upload("maps", map.filename)
+
+
+class AsyncPropertyRepository(_AsyncBotResourceRepository):
+    def __init__(self, endpoint, user, project, bot):
+        super().__init__(endpoint, user, project, bot)
+        # ボットプロパティが登録済みか。exists の初回呼び出し時に取得する
+        self._exists = None
+
+    async def exists(self):
+        """repository.PropertyRepository.exists を参照"""
+        if self._exists is not None:
+            return self._exists
+        res = await self._request("get", "properties")
+        if res.status_code == 200:
+            self._exists = True
+        elif res.status_code == 404:
+            self._exists = False
+        return self._exists
+
+    async def _add(self, property):
+        res = await self._request("post", "properties", json=property.dict())
+        assert_status_code(201, res.status_code)
+
+    async def _update(self, property):
+        res = await self._request("put", "properties", json=property.dict())
+        assert_status_code(204, res.status_code)
+
+    async def upsert(self, property):
+        if await self.exists():
+            try:
+                await self._update(property)
+            except StatusCodeException as e:
+                # 登録済みと判定した後に削除された場合は 404 がかえる
+                if e.status_code == 404:
+                    await self._add(property)
+                else:
+                    raise
+        else:
+            try:
+                await self._add(property)
+            except StatusCodeException as e:
+                # ボットプロパティが存在する場合は 409 がかえる
+                if e.status_code == 409:
+                    await self._update(property)
+                else:
+                    raise
+        self._exists = True
+
+
+class AsyncConfigRepository(_AsyncBotResourceRepository):
+    async def upsert(self, config):
+        res = await self._request("put", "configs", json=config.dict())
+        assert_status_code(201, res.status_code)
+
+
+class AsyncApplicationRepository:
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    @property
+    def endpoint(self):
+        return self._endpoint
+
+    async def register(self, bot,
+                       app_id=None, app_kind="dialogapi",
+                       notification="false"):
+        data = {"bot_id": bot.id_,
+                "app_kind": app_kind,
+                "notification": notification}
+        if app_id:
+            data["app_id"] = app_id
+
+        res = await self._endpoint.transport.post(
+            self._endpoint.url(),
+            headers=self._endpoint.header,
+            json=data
+        )
+        assert_status_code(200, res.status_code)
+        return _application(bot, res)
+
+
+class AsyncDialogueRepository:
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    async def dialogue(self, request):
+        res = await self._endpoint.transport.post(
+            self._endpoint.url(),
+            headers=self._endpoint.header,
+            json=request.dict()
+        )
+        assert_status_code(200, res.status_code)
+        return res.json()
@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import functools
+from dialogapi.async_http import DEFAULT_LIMIT
+from dialogapi.repository_factory import RepositoryFactory
+from dialogapi.repository_factory import _STALE_PROJECT_STATUS_CODES
+from dialogapi.async_repository import AsyncProjectRepository
+from dialogapi.async_repository import AsyncBotRepository
+from dialogapi.async_repository import AsyncAIMLRepository
+from dialogapi.async_repository import AsyncApplicationRepository
+from dialogapi.async_repository import AsyncDialogueRepository
+from dialogapi.async_repository import AsyncSetRepository
+from dialogapi.async_repository import AsyncMapRepository
+from dialogapi.async_repository import AsyncConfigRepository
+from dialogapi.async_repository import AsyncPropertyRepository
+from dialogapi.repository import StatusCodeException
+from dialogapi.server import AsyncEndpoint
+
+
+class _AsyncProjectScopedRepository:
+    """repository_factory._ProjectScopedRepository の asyncio 版
+
+    プロジェクトIDの解決し直しはファイルキャッシュとサーバへの問い合わせを伴うため、
+    RepositoryFactory で Executor 上で行う。
+    """
+    def __init__(self, factory, project, build):
+        """
+        Args:
+            factory (RepositoryFactory): プロジェクトIDを解決するファクトリ
+            project (Project): プロジェクト名を設定した Project
+            build (Callable[[Project], object]):
+                プロジェクトIDを設定した Project から asyncio 版リポジトリを
+                作成する関数
+        """
+        self._factory = factory
+        self._project = project
+        self._build = build
+        self._resolved = factory.get_project(project=project)
+        self._repository = build(self._resolved)
+
+    def __getattr__(self, name):
+        attr = getattr(self._repository, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            resolved = self._resolved
+            try:
+                return await getattr(self._repository, name)(*args, **kwargs)
+            except StatusCodeException as e:
+                if e.status_code not in _STALE_PROJECT_STATUS_CODES:
+                    raise
+                loop = asyncio.get_running_loop()
+                project_ = await loop.run_in_executor(
+                    None, contextvars.copy_context().run,
+                    self._factory.refresh_project, self._project, resolved
+                )
+                if project_ is None:
+                    raise
+            if self._resolved is resolved:
+                self._resolved = project_
+                self._repository = self._build(project_)
+            return await getattr(self._repository, name)(*args, **kwargs)
+        return call
+
+
+class AsyncRepositoryFactory:
+    """asyncio 版リポジトリを生成するクラス
+
+    RepositoryFactory と同じメソッドで、対応する asyncio 版リポジトリを返す。
+    ログインとプロジェクトIDの解決は RepositoryFactory で行い、
+    生成時と create_* の呼び出し時にサーバへの問い合わせを伴うことがある。
+    生成したリポジトリはエンドポイント毎に一つの AsyncHTTP を共有する。
+    リポジトリを使うイベントループ上で Async With文で利用するか、
+    使い終わったら close を呼び出すこと。
+    """
+    def __init__(self, server, auth=True, limit=DEFAULT_LIMIT,
+                 project_cache=None, token_cache=None, capability_cache=None):
+        """
+        Args:
+            server (Server): サーバ
+            auth (bool): True の場合は Management API の認証を行う
+            limit (int): エンドポイントのホスト毎に同時に開くコネクションの最大数。
+                同時に送信するリクエスト数の上限となる。
+                0 または None の場合は制限しない
+            project_cache (FileCache): RepositoryFactory を参照
+            token_cache (FileCache): RepositoryFactory を参照
+            capability_cache (FileCache): RepositoryFactory を参照
+        """
+        self._factory = RepositoryFactory(
+            server=server, auth=auth, project_cache=project_cache,
+            token_cache=token_cache, capability_cache=capability_cache
+        )
+        self._server = server
+        self._user = server.user
+        self._limit = limit
+        # Endpoint をキーとした AsyncEndpoint
+        self._endpoints = {
+            id(endpoint): AsyncEndpoint(endpoint, limit=limit)
+            for endpoint in server.endpoints
+        }
+
+    @property
+    def server(self):
+        return self._server
+
+    @property
+    def limit(self):
+        """ホスト毎に同時に開くコネクションの最大数"""
+        return self._limit
+
+    async def close(self):
+        """全てのエンドポイントのコネクションを閉じる"""
+        for endpoint in self._endpoints.values():
+            await endpoint.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _endpoint(self, endpoint):
+        return self._endpoints[id(endpoint)]
+
+    def create_project_repository(self):
+        return AsyncProjectRepository(
+            endpoint=self._endpoint(self._server.management_endpoint),
+            user=self._user
+        )
+
+    def create_bot_repository(self, project):
+        endpoint = self._endpoint(self._server.management_endpoint)
+        return _AsyncProjectScopedRepository(
+            self._factory, project,
+            lambda project_: AsyncBotRepository(
+                endpoint=endpoint,
+                user=self._user,
+                project=project_,
+                capabilities=self._server.capabilities,
+            )
+        )
+
+    def create_aiml_repository(self, project, bot):
+        return self._bot_repos(AsyncAIMLRepository, project, bot)
+
+    def create_set_repository(self, project, bot):
+        return self._bot_repos(AsyncSetRepository, project, bot)
+
+    def create_map_repository(self, project, bot):
+        return self._bot_repos(AsyncMapRepository, project, bot)
+
+    def create_property_repository(self, project, bot):
+        return self._bot_repos(AsyncPropertyRepository, project, bot)
+
+    def create_config_repository(self, project, bot):
+        return self._bot_repos(AsyncConfigRepository, project, bot)
+
+    def create_application_repository(self):
+        return AsyncApplicationRepository(
+            endpoint=self._endpoint(self._server.registration_endpoint)
+        )
+
+    def create_dialogue_repository(self):
+        return AsyncDialogueRepository(
+            endpoint=self._endpoint(self._server.dialogue_endpoint)
+        )
+
+    def _bot_repos(self, cls, project, bot):
+        endpoint = self._endpoint(self._server.management_endpoint)
+        return _AsyncProjectScopedRepository(
+            self._factory, project,
+            lambda project_: cls(endpoint, self._user, project_, bot)
+        )
@@ -0,0 +1,68 @@
+"""Management API のアクセストークンを管理するモジュール"""
+
+
+import threading
+from dialogapi import profile
+
+
+class Authenticator:
+    """ログインとアクセストークンの更新を行うクラス
+
+    アクセストークンはキャッシュに有効期限付きで保存し、
+    CLI の実行をまたいで再利用する。
+    複数のスレッドから同時に更新を要求された場合も、ログインは一度だけ行う。
+    """
+    def __init__(self, user_repository, user, key, token_cache=None):
+        """
+        Args:
+            user_repository (UserRepository): ログインに使うリポジトリ
+            user (User): ログインするユーザ
+            key (str): キャッシュのキー。サーバとユーザを一意に表す文字列
+            token_cache (FileCache): アクセストークンのキャッシュ。
+                None の場合はキャッシュしない
+        """
+        self._user_repository = user_repository
+        self._user = user
+        self._key = key
+        self._token_cache = token_cache
+        self._lock = threading.Lock()
+
+    def authorize(self):
+        """有効なアクセストークンをユーザに設定する
+
+        キャッシュに有効なアクセストークンがあればそれを使い、なければログインする。
+
+        Returns:
+            User: 認証済みのユーザ
+        """
+        with self._lock:
+            access_token = None
+            if self._token_cache:
+                access_token = self._token_cache.get(self._key)
+            if access_token:
+                self._user.set_authorized(access_token=access_token)
+            else:
+                self._login()
+        self._user.set_authenticator(self)
+        return self._user
+
+    def reauthorize(self, stale_access_token):
+        """失効したアクセストークンを更新する
+
+        他のスレッドが既に更新している場合はログインしない。
+
+        Args:
+            stale_access_token (str): 失効したアクセストークン
+        """
+        with self._lock:
+            if self._user.access_token != stale_access_token:
+                return
+            if self._token_cache:
+                self._token_cache.invalidate(self._key)
+            self._login()
+
+    def _login(self):
+        with profile.span("login"):
+            self._user_repository.login(user=self._user)
+        if self._token_cache:
+            self._token_cache.set(self._key, self._user.access_token)
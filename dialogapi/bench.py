@@ -0,0 +1,526 @@
+"""Dialogue API の負荷試験を行うモジュール
+
+テストファイルのタスクのリクエストをコーパスとして、
+Dialogue API へ指定した同時実行数・リクエストレートで一定時間リクエストを送り、
+スループット・エラー率・レイテンシのパーセンタイルをタスク毎と全体で集計する。
+"""
+
+
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from collections import OrderedDict
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dialogapi.entity import Request
+from dialogapi.histogram import Histogram
+from dialogapi.repository import StatusCodeException
+from dialogapi.test.app_pool import AppIdPool
+
+
+# レポートに表示するパーセンタイル
+PERCENTILES = [50, 90, 99, 99.9]
+
+# OpenLoopBench の送信間隔
+ARRIVALS = ["constant", "poisson"]
+
+BenchRequest = namedtuple("BenchRequest", ["name", "request"])
+
+
+def build_corpus(tests):
+    """テストファイルのタスクからコーパスを作成する
+
+    Args:
+        tests (List[TaskManager]): テストファイル毎のタスクマネージャ
+
+    Returns:
+        List[BenchRequest]: タスク名と対話リクエストの辞書のリスト
+    """
+    return [
+        BenchRequest(name=task.name, request=task.request)
+        for task_manager in tests
+        for task in task_manager.tasks
+    ]
+
+
+class LatencyStats:
+    """リクエスト数・エラー数・レイテンシを集計するクラス
+
+    レイテンシはヒストグラムに記録するため、メモリ使用量はリクエスト数によらない。
+    """
+    def __init__(self):
+        self._histogram = Histogram()
+        self._errors = Counter()
+
+    @property
+    def histogram(self):
+        return self._histogram
+
+    @property
+    def count(self):
+        """成功したリクエスト数"""
+        return self._histogram.count
+
+    @property
+    def errors(self):
+        """エラーの種類毎の件数"""
+        return self._errors
+
+    @property
+    def error_count(self):
+        return sum(self._errors.values())
+
+    def record(self, latency):
+        """成功したリクエストのレイテンシ (秒) を記録する"""
+        self._histogram.record(latency)
+
+    def record_error(self, kind):
+        """失敗したリクエストを記録する
+
+        Args:
+            kind (str): エラーの種類
+        """
+        self._errors[kind] += 1
+
+    def percentile(self, percentile):
+        """レイテンシのパーセンタイル (秒) を返す。記録がない場合は None を返す"""
+        return self._histogram.percentile(percentile)
+
+    def merge(self, other):
+        """他の LatencyStats の記録を加える"""
+        self._histogram.merge(other._histogram)
+        self._errors.update(other._errors)
+
+    def to_dict(self):
+        """JSON に変換可能な辞書を返す"""
+        return {
+            "histogram": self._histogram.to_dict(),
+            "errors": dict(self._errors),
+        }
+
+    @classmethod
+    def from_dict(cls, dic):
+        """to_dict で変換した辞書から復元する"""
+        stats = cls()
+        stats._histogram = Histogram.from_dict(dic["histogram"])
+        stats._errors = Counter(dic["errors"])
+        return stats
+
+
+class BenchResult:
+    """負荷試験の結果を保持するクラス"""
+    def __init__(self, duration):
+        """
+        Args:
+            duration (float): 負荷をかけた時間 (秒)
+        """
+        self.duration = duration
+        self.total = LatencyStats()
+        self.tasks = OrderedDict()
+        # 以下は OpenLoopBench の場合のみ記録する
+        self.open_loop = False
+        # 送信予定時刻から実際に送信するまでの遅れ
+        self.lag = LatencyStats()
+        self.late = 0
+        self.dropped = 0
+
+    def stats(self, name):
+        """タスクの LatencyStats を返す"""
+        if name not in self.tasks:
+            self.tasks[name] = LatencyStats()
+        return self.tasks[name]
+
+    def record(self, name, latency):
+        self.total.record(latency)
+        self.stats(name).record(latency)
+
+    def record_error(self, name, kind):
+        self.total.record_error(kind)
+        self.stats(name).record_error(kind)
+
+    def record_lag(self, lag, late):
+        """送信予定時刻からの遅れを記録する
+
+        Args:
+            lag (float): 遅れ (秒)
+            late (bool): 遅延とみなす場合は True
+        """
+        self.lag.record(lag)
+        if late:
+            self.late += 1
+
+    def record_dropped(self, name):
+        """送信せずに破棄したリクエストを記録する"""
+        self.dropped += 1
+        self.stats(name)
+
+    def merge(self, other):
+        """他の BenchResult の記録を加える。時間は長い方とする"""
+        self.duration = max(self.duration, other.duration)
+        self.open_loop = self.open_loop or other.open_loop
+        self.total.merge(other.total)
+        self.lag.merge(other.lag)
+        self.late += other.late
+        self.dropped += other.dropped
+        for name, stats in other.tasks.items():
+            self.stats(name).merge(stats)
+
+    def to_dict(self):
+        """JSON に変換可能な辞書を返す"""
+        return {
+            "duration": self.duration,
+            "open_loop": self.open_loop,
+            "total": self.total.to_dict(),
+            "tasks": [
+                [name, stats.to_dict()] for name, stats in self.tasks.items()
+            ],
+            "lag": self.lag.to_dict(),
+            "late": self.late,
+            "dropped": self.dropped,
+        }
+
+    @classmethod
+    def from_dict(cls, dic):
+        """to_dict で変換した辞書から復元する"""
+        result = cls(duration=dic["duration"])
+        result.open_loop = dic["open_loop"]
+        result.total = LatencyStats.from_dict(dic["total"])
+        for name, stats in dic["tasks"]:
+            result.tasks[name] = LatencyStats.from_dict(stats)
+        result.lag = LatencyStats.from_dict(dic["lag"])
+        result.late = dic["late"]
+        result.dropped = dic["dropped"]
+        return result
+
+    def report(self, out=None):
+        """結果を表形式で出力する
+
+        Args:
+            out (file): 出力先。None の場合は標準出力に出力する
+        """
+        header = ["task", "requests", "errors", "rps"] + [
+            "p{}".format(p) for p in PERCENTILES
+        ]
+        rows = [
+            self._row(name, stats) for name, stats in self.tasks.items()
+        ]
+        rows.append(self._row("total", self.total))
+
+        widths = [
+            max(len(str(row[i])) for row in [header] + rows)
+            for i in range(len(header))
+        ]
+        for row in [header] + rows:
+            print(
+                "  ".join(
+                    str(col).ljust(width) if i == 0 else str(col).rjust(width)
+                    for i, (col, width) in enumerate(zip(row, widths))
+                ),
+                file=out
+            )
+        if self.open_loop:
+            print("latency in milliseconds from intended send time",
+                  file=out)
+            lags = [_format_ms(self.lag.percentile(p)) for p in [50, 99, 100]]
+            text = "schedule lag p50 {} p99 {} max {}, late {}, dropped {}"
+            print(text.format(*lags, self.late, self.dropped), file=out)
+        else:
+            print("latency in milliseconds", file=out)
+        for kind, count in sorted(self.total.errors.items()):
+            print("error {}: {}".format(kind, count), file=out)
+
+    def _row(self, name, stats):
+        requests = stats.count + stats.error_count
+        rps = requests / self.duration if self.duration else 0
+        row = [name, requests, stats.error_count, "{:.1f}".format(rps)]
+        for p in PERCENTILES:
+            row.append(_format_ms(stats.percentile(p)))
+        return row
+
+
+def _format_ms(seconds):
+    return "-" if seconds is None else "{:.1f}".format(seconds * 1000)
+
+
+class RateLimiter:
+    """全てのワーカーで共有して、リクエストの送信間隔を一定にするクラス"""
+    def __init__(self, rate, phase=0):
+        """
+        Args:
+            rate (float): 1 秒あたりのリクエスト数
+            phase (float): 最初の送信を遅らせる時間 (秒)
+        """
+        self._interval = 1 / rate
+        self._phase = phase
+        self._next_time = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """次の送信時刻まで待機する"""
+        with self._lock:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now + self._phase
+            elif self._next_time < now:
+                # 遅れている場合は取り戻そうとせず、現在時刻から数え直す
+                self._next_time = now
+            send_time = self._next_time
+            self._next_time += self._interval
+        time.sleep(max(send_time - time.monotonic(), 0))
+
+
+class Bench:
+    """Dialogue API に負荷をかけるクラス
+
+    各ワーカーは一つの app_id を使い、
+    コーパスのリクエストを順番に応答を待ってから送信する。
+    """
+    def __init__(self, application_repository, dialogue_repository,
+                 bot, corpus, concurrency=1, rate=None, duration=10,
+                 phase=0):
+        """
+        Args:
+            application_repository (ApplicationRepository)
+            dialogue_repository (DialogueRepository)
+            bot (Bot): 対象のボット
+            corpus (List[BenchRequest]): 送信するリクエスト
+            concurrency (int): 同時にリクエストを送信するワーカー数
+            rate (float): 全体で 1 秒あたりに送信するリクエスト数の上限。
+                None の場合は上限を設けない
+            duration (float): 負荷をかける時間 (秒)
+            phase (float): 送信予定時刻をずらす時間 (秒)。
+                rate を分け合う複数のプロセスが同時に送信しないようにする
+        """
+        if not corpus:
+            raise ValueError("Corpus is empty")
+        self._application_repository = application_repository
+        self._dialogue_repository = dialogue_repository
+        self._bot = bot
+        self._corpus = corpus
+        self._concurrency = concurrency
+        self._rate = rate
+        self._duration = duration
+        self._phase = phase
+        self._index = 0
+        self._index_lock = threading.Lock()
+        # 前回 drain してからの記録と、これまでの全ての記録
+        self._current = self._new_result()
+        self._total = self._new_result()
+        self._result_lock = threading.Lock()
+
+    def run(self, on_interval=None, interval=1.0):
+        """負荷試験を実行する
+
+        Args:
+            on_interval (Callable[[BenchResult], None]):
+                実行中に interval 秒毎に、前回からの記録を渡して呼び出す関数
+            interval (float): on_interval を呼び出す間隔 (秒)
+
+        Returns:
+            BenchResult: 結果
+        """
+        apps = self._register_apps()
+        start = time.monotonic()
+        stop = threading.Event()
+        reporter = None
+        if on_interval:
+            def report():
+                while not stop.wait(interval):
+                    on_interval(self.drain())
+            reporter = threading.Thread(target=report, daemon=True)
+            reporter.start()
+        try:
+            self._run(apps)
+        finally:
+            stop.set()
+            if reporter:
+                reporter.join()
+        last = self.drain()
+        if on_interval:
+            on_interval(last)
+        self._total.duration = time.monotonic() - start
+        return self._total
+
+    def drain(self):
+        """前回呼び出してからの記録を返す
+
+        Returns:
+            BenchResult: 前回からの記録。時間は 0 とする
+        """
+        with self._result_lock:
+            result = self._current
+            self._current = self._new_result()
+        self._total.merge(result)
+        return result
+
+    def _new_result(self):
+        result = BenchResult(duration=0)
+        # コーパスの順にタスクを表示する
+        for item in self._corpus:
+            result.stats(item.name)
+        return result
+
+    def _register_apps(self):
+        with AppIdPool(
+            self._application_repository, self._bot,
+            workers=self._concurrency
+        ) as app_pool:
+            app_pool.reserve(self._concurrency)
+            return [app_pool.acquire() for _ in range(self._concurrency)]
+
+    def _run(self, apps):
+        limiter = RateLimiter(self._rate, self._phase) if self._rate \
+            else None
+        deadline = time.monotonic() + self._duration
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            futures = [
+                executor.submit(self._work, app, limiter, deadline)
+                for app in apps
+            ]
+            for future in futures:
+                future.result()
+
+    def _next_request(self):
+        with self._index_lock:
+            item = self._corpus[self._index % len(self._corpus)]
+            self._index += 1
+        return item
+
+    def _work(self, app, limiter, deadline):
+        while time.monotonic() < deadline:
+            if limiter:
+                limiter.wait()
+                if time.monotonic() >= deadline:
+                    break
+            self._send(app, self._next_request(), time.perf_counter())
+
+    def _send(self, app, item, start_time):
+        """リクエストを送信し、start_time から応答までの時間を記録する"""
+        request = Request(
+            application=app,
+            voice_text=item.request["voiceText"],
+            **{key: val for key, val in item.request.items()
+               if key != "voiceText"}
+        )
+        try:
+            self._dialogue_repository.dialogue(request=request)
+        except StatusCodeException as e:
+            kind = "status {}".format(e.status_code)
+        except Exception as e:
+            kind = type(e).__name__
+        else:
+            latency = time.perf_counter() - start_time
+            with self._result_lock:
+                self._current.record(item.name, latency)
+            return
+        with self._result_lock:
+            self._current.record_error(item.name, kind)
+
+
+def build_schedule(rate, duration, arrival="constant", random_=None,
+                   phase=0):
+    """リクエストの送信予定時刻を求める
+
+    Args:
+        rate (float): 1 秒あたりのリクエスト数
+        duration (float): 負荷をかける時間 (秒)
+        arrival (str): constant の場合は一定間隔、
+            poisson の場合はポアソン過程に従う間隔とする
+        random_ (random.Random): poisson で使う乱数生成器
+        phase (float): 全ての送信予定時刻を遅らせる時間 (秒)
+
+    Returns:
+        Iterator[float]: 開始時刻からの経過時間 (秒)
+    """
+    if arrival not in ARRIVALS:
+        raise ValueError("Unknown arrival: {}".format(arrival))
+    random_ = random_ or random.Random()
+    offset = phase
+    count = 0
+    while offset < duration:
+        yield offset
+        count += 1
+        if arrival == "constant":
+            # 誤差が積み重ならないように、間隔の和ではなく積で求める
+            offset = phase + count / rate
+        else:
+            offset += random_.expovariate(rate)
+
+
+class OpenLoopBench(Bench):
+    """送信予定表に従ってリクエストを送信する Bench
+
+    応答を待たずに予定時刻にリクエストを送信するため、
+    サーバが停滞した場合の待ち時間もレイテンシに含まれる。
+    レイテンシは実際の送信時刻ではなく送信予定時刻から計測する。
+    同時に応答待ちにできるリクエスト数は concurrency を上限とし、
+    上限に達している間は送信が遅れる。
+    """
+    def __init__(self, application_repository, dialogue_repository,
+                 bot, corpus, rate, concurrency=1, duration=10,
+                 arrival="constant", max_lag=1.0, seed=None, phase=0):
+        """
+        Args:
+            rate (float): 1 秒あたりに送信するリクエスト数
+            concurrency (int): 同時に応答待ちにできるリクエスト数
+            arrival (str): 送信間隔。 constant か poisson を指定する
+            max_lag (float): 送信予定時刻からこの秒数を過ぎても
+                送信できないリクエストは送信せずに破棄する
+            seed (int): poisson の乱数のシード
+
+            その他の引数は Bench を参照
+        """
+        super().__init__(
+            application_repository, dialogue_repository, bot, corpus,
+            concurrency=concurrency, rate=rate, duration=duration,
+            phase=phase
+        )
+        self._arrival = arrival
+        self._max_lag = max_lag
+        self._random = random.Random(seed)
+        # 次の送信予定を過ぎてから送信したリクエストを遅延とみなす
+        self._late_threshold = 1 / rate
+
+    def _new_result(self):
+        result = super()._new_result()
+        result.open_loop = True
+        return result
+
+    def _run(self, apps):
+        # 応答待ちでないワーカーの app_id
+        idle = queue.Queue()
+        for app in apps:
+            idle.put(app)
+
+        schedule = build_schedule(
+            self._rate, self._duration, self._arrival, self._random,
+            self._phase
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            for offset in schedule:
+                intended = start + offset
+                item = self._next_request()
+                time.sleep(max(intended - time.perf_counter(), 0))
+                try:
+                    app = idle.get(timeout=max(
+                        intended + self._max_lag - time.perf_counter(), 0
+                    ))
+                except queue.Empty:
+                    with self._result_lock:
+                        self._current.record_dropped(item.name)
+                    continue
+                lag = time.perf_counter() - intended
+                with self._result_lock:
+                    self._current.record_lag(
+                        lag, late=lag > self._late_threshold
+                    )
+                executor.submit(self._dispatch, app, item, intended, idle)
+
+    def _dispatch(self, app, item, intended, idle):
+        try:
+            self._send(app, item, intended)
+        finally:
+            idle.put(app)
@@ -0,0 +1,142 @@
+"""CLI の実行をまたいで値を保持するファイルキャッシュのモジュール"""
+
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows ではプロセス間のロックを行わない
+    fcntl = None
+
+
+# 同じプロセス内の書き込みを直列化するロック
+_lock = threading.Lock()
+
+
+def cache_dir():
+    """キャッシュファイルを保存するディレクトリを返す
+
+    環境変数 DIALOGAPI_CACHE_DIR が設定されている場合はその値を、
+    そうでない場合は ~/.cache/dialogapi を返す。
+    """
+    default = os.path.join(os.path.expanduser("~"), ".cache", "dialogapi")
+    return os.environ.get("DIALOGAPI_CACHE_DIR", default)
+
+
+class FileCache:
+    """JSON ファイルに値を有効期限付きで保存するキャッシュクラス
+
+    ファイルは所有者のみ読み書きできるパーミッションで作成する。
+    書き込みは読み込み・変更・置き換えの間をロックするため、
+    複数のスレッド・プロセスから同時に書き込んでも値は失われない。
+    """
+    def __init__(self, filename, ttl):
+        """
+        Args:
+            filename (str): キャッシュファイル名
+            ttl (float): 値の有効期間 (秒)
+        """
+        self._filename = filename
+        self._ttl = ttl
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def get(self, key):
+        """有効期限内の値を返す。存在しない場合は None を返す"""
+        entry = self._load().get(key)
+        if not entry or entry["expires"] <= time.time():
+            return None
+        return entry["value"]
+
+    def set(self, key, value, ttl=None):
+        """値を保存する
+
+        Args:
+            key (str): キー
+            value (object): JSON に変換可能な値
+            ttl (float): 値の有効期間 (秒)。None の場合はコンストラクタの値を使う
+        """
+        self.update(key, lambda _: value, ttl=ttl)
+
+    def update(self, key, func, ttl=None):
+        """有効期限内の値を func で変換して保存する
+
+        読み込みから保存までロックするため、他の書き込みと競合しない。
+
+        Args:
+            key (str): キー
+            func (Callable[[object], object]): 現在の値を受け取り、
+                保存する値を返す関数。値が存在しない場合は None を受け取る。
+                None を返した場合は値を削除する
+            ttl (float): 値の有効期間 (秒)。None の場合はコンストラクタの値を使う
+        """
+        ttl = self._ttl if ttl is None else ttl
+        with self._locked():
+            now = time.time()
+            # 期限切れのエントリはここで取り除く
+            entries = {
+                key_: entry for key_, entry in self._load().items()
+                if entry["expires"] > now
+            }
+            entry = entries.pop(key, None)
+            value = func(entry["value"] if entry else None)
+            if value is not None:
+                entries[key] = {"value": value, "expires": now + ttl}
+            self._dump(entries)
+
+    def invalidate(self, key=None):
+        """値を削除する。key が None の場合は全ての値を削除する"""
+        with self._locked():
+            if key is None:
+                entries = {}
+            else:
+                entries = self._load()
+                entries.pop(key, None)
+            self._dump(entries)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with _lock:
+            if fcntl is None:
+                yield
+                return
+            dirname = os.path.dirname(os.path.abspath(self._filename))
+            os.makedirs(dirname, mode=0o700, exist_ok=True)
+            # キャッシュファイルは置き換えるため、別のファイルをロックする
+            fd = os.open(self._filename + ".lock", os.O_RDWR | os.O_CREAT,
+                         0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _load(self):
+        try:
+            with open(self._filename, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 壊れたキャッシュは空として扱う
+            return {}
+
+    def _dump(self, entries):
+        dirname = os.path.dirname(os.path.abspath(self._filename))
+        os.makedirs(dirname, mode=0o700, exist_ok=True)
+        # 書き込み途中のファイルを読まれないように、一時ファイルを置き換える
+        # mkstemp は所有者のみ読み書きできるファイルを作成する
+        fd, tmpname = tempfile.mkstemp(dir=dirname)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmpname, self._filename)
+        except Exception:
+            os.remove(tmpname)
+            raise
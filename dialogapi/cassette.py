@@ -0,0 +1,244 @@
+"""Registration API と Dialogue API の通信を記録・再生するモジュール
+
+記録モードでは ApplicationRepository.register と DialogueRepository.dialogue の
+リクエストとレスポンスの組をカセットファイルに記録する。
+再生モードではカセットファイルのレスポンスを返し、ネットワークには接続しない。
+
+カセットファイルは一行に一つの記録を持つ JSON Lines 形式で、
+ファイル名が .gz で終わる場合は gzip で圧縮する。
+各記録は正規化したリクエストのハッシュ値をキーとして持つ。
+"""
+
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from dialogapi.entity import Application
+from dialogapi.repository import StatusCodeException
+from dialogapi.repository import assert_status_code
+
+
+# 実行毎に変わるため、キーに含めない対話リクエストのパラメータ
+VOLATILE_DIALOGUE_PARAMS = {"appId", "appRecvTime", "addSendTime"}
+
+MODES = ["record", "replay"]
+
+
+class CassetteMissException(Exception):
+    """再生モードでリクエストに対応する記録がない場合に送出される例外"""
+
+
+def register_key(bot, app_id=None, app_kind="dialogapi",
+                 notification="false"):
+    """app_id 登録リクエストのキーを返す"""
+    return _hash({
+        "bot_id": bot.id_,
+        "app_id": app_id,
+        "app_kind": app_kind,
+        "notification": notification,
+    })
+
+
+def dialogue_key(request, previous=None):
+    """対話リクエストのキーを返す
+
+    app_id など実行毎に変わるパラメータはキーに含めない。
+    同じ発話でも対話の文脈によって応答が変わるため、
+    同じ app_id の直前のリクエストのキーを含める。
+
+    Args:
+        request (DialogueRequest): 対話リクエスト
+        previous (str): 同じ app_id の直前のリクエストのキー
+    """
+    params = {
+        key: val for key, val in request.dict().items()
+        if key not in VOLATILE_DIALOGUE_PARAMS
+    }
+    return _hash({"previous": previous, "request": params})
+
+
+def _hash(dic):
+    content = json.dumps(dic, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def _open(filename, mode):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "t", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")
+
+
+class Cassette:
+    """通信の記録を保持するクラス
+
+    同じキーの記録が複数ある場合は記録した順に返し、
+    最後の記録を返した後は最後の記録を返し続ける。
+    With文で利用するか、記録モードでは使い終わったら save を呼び出すこと。
+    """
+    def __init__(self, filename, mode):
+        """
+        Args:
+            filename (str): カセットファイル名
+            mode (str): record か replay
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown cassette mode: {}".format(mode))
+        self._filename = filename
+        self._mode = mode
+        self._records = []
+        # (種類, キー) と、その記録のリストおよび次に返す位置
+        self._index = dict()
+        # app_id と、その app_id の直前の対話リクエストのキー
+        self._previous_keys = dict()
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._mode == "record":
+            self.save()
+
+    def next_dialogue_key(self, request):
+        """対話リクエストのキーを返し、app_id の直前のキーとして覚える"""
+        app_id = request.dict().get("appId")
+        with self._lock:
+            key = dialogue_key(request, self._previous_keys.get(app_id))
+            self._previous_keys[app_id] = key
+        return key
+
+    def record(self, type_, key, status, response=None):
+        """通信を記録する
+
+        Args:
+            type_ (str): register か dialogue
+            key (str): 正規化したリクエストのキー
+            status (int): レスポンスのステータスコード
+            response (Dict[str][Any]): レスポンスの JSON
+        """
+        with self._lock:
+            self._records.append({
+                "type": type_, "key": key,
+                "status": status, "response": response
+            })
+
+    def play(self, type_, key):
+        """記録を返す
+
+        Raises:
+            CassetteMissException: 記録がない場合
+        """
+        with self._lock:
+            entry = self._index.get((type_, key))
+            if entry is None:
+                raise CassetteMissException(
+                    "No recorded {} for request {}".format(type_, key)
+                )
+            records, position = entry
+            entry[1] = min(position + 1, len(records) - 1)
+            return records[position]
+
+    def save(self):
+        """記録をカセットファイルに保存する"""
+        dirname = os.path.dirname(os.path.abspath(self._filename))
+        os.makedirs(dirname, exist_ok=True)
+        with self._lock, _open(self._filename, "w") as f:
+            for record in self._records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def wrap_application_repository(self, repository):
+        """モードに従って ApplicationRepository を置き換える"""
+        if self._mode == "record":
+            return RecordingApplicationRepository(repository, self)
+        return ReplayApplicationRepository(self)
+
+    def wrap_dialogue_repository(self, repository):
+        """モードに従って DialogueRepository を置き換える"""
+        if self._mode == "record":
+            return RecordingDialogueRepository(repository, self)
+        return ReplayDialogueRepository(self)
+
+    def _load(self):
+        with _open(self._filename, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = (record["type"], record["key"])
+                self._index.setdefault(key, [[], 0])[0].append(record)
+
+
+def _replay(cassette, type_, key):
+    record = cassette.play(type_, key)
+    assert_status_code(200, record["status"])
+    return record["response"]
+
+
+class RecordingApplicationRepository:
+    """ApplicationRepository の登録結果を記録するクラス"""
+    def __init__(self, repository, cassette):
+        self._repository = repository
+        self._cassette = cassette
+
+    def register(self, bot,
+                 app_id=None, app_kind="dialogapi", notification="false"):
+        key = register_key(bot, app_id, app_kind, notification)
+        try:
+            app = self._repository.register(
+                bot=bot, app_id=app_id, app_kind=app_kind,
+                notification=notification
+            )
+        except StatusCodeException as e:
+            self._cassette.record("register", key, e.status_code)
+            raise
+        self._cassette.record(
+            "register", key, 200, {"app_id": app.app_id}
+        )
+        return app
+
+
+class ReplayApplicationRepository:
+    """記録した登録結果を返す ApplicationRepository"""
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def register(self, bot,
+                 app_id=None, app_kind="dialogapi", notification="false"):
+        key = register_key(bot, app_id, app_kind, notification)
+        response = _replay(self._cassette, "register", key)
+        return Application(bot=bot, app_id=response["app_id"])
+
+
+class RecordingDialogueRepository:
+    """DialogueRepository の対話結果を記録するクラス"""
+    def __init__(self, repository, cassette):
+        self._repository = repository
+        self._cassette = cassette
+
+    def dialogue(self, request):
+        key = self._cassette.next_dialogue_key(request)
+        try:
+            response = self._repository.dialogue(request=request)
+        except StatusCodeException as e:
+            self._cassette.record("dialogue", key, e.status_code)
+            raise
+        self._cassette.record("dialogue", key, 200, response)
+        return response
+
+
+class ReplayDialogueRepository:
+    """記録した対話結果を返す DialogueRepository"""
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def dialogue(self, request):
+        key = self._cassette.next_dialogue_key(request)
+        return _replay(self._cassette, "dialogue", key)
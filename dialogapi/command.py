@@ -1,7 +1,16 @@
 """CLIコマンドに対応する関数を定義するモジュール"""
 
+import io
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
+from dialogapi import profile
+from dialogapi.bench import Bench
+from dialogapi.bench import OpenLoopBench
+from dialogapi.bench import build_corpus
+from dialogapi.poller import wait_status
+from dialogapi.server import DeployConfig
+from dialogapi.test.app_pool import AppIdPool
+from dialogapi.test.app_pool import DEFAULT_WORKERS as DEFAULT_APP_POOL_WORKERS
 
 
 class ProgressBar:
@@ -44,8 +53,18 @@ def bot_list(bot_repository):
 def bot_setup(
     bot_repository, aiml_repository, set_repository,
     map_repository, config_repository, property_repository,
-    bot, aimls, sets, maps, configs, properties
+    bot, aimls, sets, maps, configs, properties, deploy_config=None,
+    manifest=None, incremental=False
 ):
+    """
+    Args:
+        manifest (DeployManifest): デプロイマニフェスト。
+            指定した場合はデプロイの開始前に削除し、成功したら保存する。
+            途中で失敗したデプロイの後は、次回の差分デプロイで全てをアップロードする
+        incremental (bool): True の場合は manifest と比較して、
+            前回デプロイに成功してから変更されたリソースのみアップロードする。
+            変更がない場合はコンパイル・転送も行わない
+    """
     # 設定内容
     # - ボット追加
     #   - 存在すれば、値を更新する
@@ -57,14 +76,48 @@ def bot_setup(
     #   - 存在すれば、値を更新する
     # - Botのコンパイル
     # - Botの転送
-    _bot_upsert(bot_repository, bot)
-    aiml_upsert(aiml_repository, aimls)
-    set_upsert(set_repository, sets)
-    map_upsert(map_repository, maps)
-    config_upsert(config_repository, configs)
-    property_upsert(property_repository, properties)
-    bot_compile(bot_repository, bot)
-    bot_transfer(bot_repository, bot)
+    plan = None
+    bot_changed = True
+    if manifest:
+        plan = manifest.plan(bot, aimls, sets, maps, configs, properties)
+    if manifest and incremental:
+        report_plan(bot, plan)
+        if plan.up_to_date:
+            return
+        bot_changed = plan.bot_changed
+        aimls, sets, maps = plan.aimls, plan.sets, plan.maps
+        configs, properties = plan.configs, plan.properties
+    if manifest:
+        # 途中で失敗した場合に古いマニフェストが残らないよう、先に削除する
+        manifest.remove()
+
+    with profile.span("setup", bot=bot.id_):
+        if bot_changed:
+            with profile.span("bot upsert"):
+                _bot_upsert(bot_repository, bot)
+        aiml_upsert(aiml_repository, aimls)
+        set_upsert(set_repository, sets)
+        map_upsert(map_repository, maps)
+        config_upsert(config_repository, configs)
+        property_upsert(property_repository, properties)
+        bot_compile(bot_repository, bot, deploy_config)
+        bot_transfer(bot_repository, bot, deploy_config)
+
+    if manifest:
+        manifest.save(plan)
+
+
+def report_plan(bot, plan):
+    """差分デプロイでスキップする内容を表示する"""
+    for filename in plan.skipped:
+        print("Skipping {} (unchanged)".format(filename), file=sys.stderr)
+    if plan.up_to_date:
+        print(
+            "Bot {} is up to date. Skipped compile and transfer.".format(
+                bot.id_
+            ),
+            file=sys.stderr
+        )
 
 
 def bot_add(bot_repository, bot):
@@ -78,6 +131,10 @@ def bot_remove(bot_repository, bot):
 
 
 def _bot_upsert(bot_repository, bot):
+    # 既存のボットは追加を試みずに更新する
+    if bot_repository.exists(bot=bot):
+        bot_update(bot_repository, bot)
+        return
     try:
         bot_add(bot_repository, bot)
     except Exception:
@@ -94,78 +151,248 @@ def bot_update(bot_repository, bot):
         bot_repository.update(bot=bot)
 
 
-def bot_compile(bot_repository, bot):
+def bot_compile(bot_repository, bot, deploy_config=None):
+    deploy_config = deploy_config or DeployConfig()
     with ProgressBar("Compiling bot {}".format(bot.id_)) as pg:
-        bot_repository.compile(bot=bot)
+        with profile.span("compile request"):
+            bot_repository.compile(bot=bot)
         # コンパイルが完了するまで待機する処理
-        while True:
-            completed = bot_repository.compile_status(bot=bot)
-            if completed:
-                break
-            pg.update()
-            time.sleep(1)
+        with profile.span("compile wait"):
+            wait_status(
+                lambda: bot_repository.compile_state(bot=bot),
+                "Compiling bot {}".format(bot.id_),
+                deploy_config,
+                on_tick=pg.update
+            )
 
 
-def bot_transfer(bot_repository, bot):
+def bot_transfer(bot_repository, bot, deploy_config=None):
+    deploy_config = deploy_config or DeployConfig()
     with ProgressBar("Transfering: bot {}".format(bot.id_)) as pg:
-        bot_repository.transfer(bot=bot)
+        with profile.span("transfer request"):
+            bot_repository.transfer(bot=bot)
         # 転送が完了するまで待機する処理
-        while True:
-            completed = bot_repository.transfer_status(bot=bot)
-            if completed:
-                break
-            pg.update()
-            time.sleep(1)
+        with profile.span("transfer wait"):
+            wait_status(
+                lambda: bot_repository.transfer_state(bot=bot),
+                "Transfering bot {}".format(bot.id_),
+                deploy_config,
+                on_tick=pg.update
+            )
 
 
 def bot_test(
     application_repository, dialogue_repository,
-    bot, tests
+    bot, tests, concurrency=1, out=None, app_id_cache=None, reporter=None
 ):
     """
+    Args:
+        concurrency (int): テストファイル毎に同時に実行するタスク数
+        out (file): 結果の出力先。None の場合は標準出力に出力する
+        app_id_cache (FileCache): 使われなかった app_id を次回の実行のために
+            保存するキャッシュ。None の場合は保存しない
+        reporter (Reporter): タスクの終了毎に結果を報告するレポーター
+
     Returns:
         (bool) テストが成功した場合は True を、そうでない場合は False を返す
     """
     test_results = []
 
-    print("Testing bot {}".format(bot.id_))
-    for task_manager in tests:
-        # app_id登録を行う
-        res = task_manager.execute_tasks(
-            bot=bot,
-            application_repository=application_repository,
-            dialogue_repository=dialogue_repository
-        )
-        test_results.append(res)
+    print("Testing bot {}".format(bot.id_), file=out)
+    with profile.span("test", bot=bot.id_), AppIdPool(
+        application_repository, bot,
+        workers=max(concurrency, DEFAULT_APP_POOL_WORKERS),
+        cache=app_id_cache
+    ) as app_pool:
+        # 全てのテストファイルで使う app_id の登録を先に開始する
+        count = sum(task_manager.app_id_count for task_manager in tests)
+        app_pool.reserve(count)
+        if app_id_cache:
+            # 次回の実行で使う分もキャッシュに残す。
+            # キャッシュに残っている分を先に取り出し、足りない分だけ登録する
+            app_pool.reserve(count * 2)
+        for task_manager in tests:
+            res = task_manager.execute_tasks(
+                bot=bot,
+                application_repository=application_repository,
+                dialogue_repository=dialogue_repository,
+                concurrency=concurrency,
+                out=out,
+                app_pool=app_pool,
+                reporter=reporter
+            )
+            test_results.append(res)
 
     return all(test_results)
 
 
+def project_test(
+    application_repository, dialogue_repository,
+    bot_tests, workers=1, concurrency=1, app_id_cache=None, reporter=None
+):
+    """複数のボットを並列にテストする
+
+    ボットはタスク数の多い順にワーカーへ割り当てる。
+    各ボットの出力はボット毎にバッファし、ボットの定義順に出力する。
+
+    Args:
+        bot_tests (List[Tuple[Bot, List[TaskManager]]]):
+            テストするボットとそのテストのリスト
+        workers (int): 同時にテストするボット数
+        concurrency (int): テストファイル毎に同時に実行するタスク数
+        app_id_cache (FileCache): bot_test を参照
+        reporter (Reporter): bot_test を参照
+
+    Returns:
+        List[bool]: bot_tests の順に、ボット毎のテスト結果を返す
+    """
+    def run(bot, tests):
+        out = io.StringIO()
+        res = bot_test(
+            application_repository, dialogue_repository,
+            bot, tests, concurrency=concurrency, out=out,
+            app_id_cache=app_id_cache, reporter=reporter
+        )
+        return res, out.getvalue()
+
+    def task_count(index):
+        _, tests = bot_tests[index]
+        return sum(len(task_manager.tasks) for task_manager in tests)
+
+    # タスク数の多いボットから投入することで、ワーカー間の負荷を均す
+    order = sorted(range(len(bot_tests)), key=task_count, reverse=True)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            index: executor.submit(run, *bot_tests[index])
+            for index in order
+        }
+        try:
+            for index in range(len(bot_tests)):
+                res, text = futures[index].result()
+                sys.stdout.write(text)
+                results.append(res)
+        except Exception:
+            for future in futures.values():
+                future.cancel()
+            raise
+    return results
+
+
+def bench(
+    application_repository, dialogue_repository,
+    bot, tests, concurrency=1, rate=None, duration=10,
+    open_loop=False, arrival="constant", max_lag=1.0, histogram_file=None
+):
+    """テストファイルのリクエストで Dialogue API に負荷をかけ、結果を表示する
+
+    Args:
+        tests (List[TaskManager]): コーパスとするテストファイル
+        concurrency (int): 同時にリクエストを送信するワーカー数
+        rate (float): 1 秒あたりのリクエスト数の上限。
+            open_loop が True の場合は 1 秒あたりに送信するリクエスト数
+        duration (float): 負荷をかける時間 (秒)
+        open_loop (bool): True の場合は応答を待たずに送信予定表に従って送信する
+        arrival (str): open_loop の送信間隔。 constant か poisson
+        max_lag (float): open_loop で送信予定時刻から送信を諦めるまでの秒数
+        histogram_file (str): 全体のレイテンシのヒストグラムを保存するファイル名
+
+    Returns:
+        BenchResult: 結果
+    """
+    print(
+        "Benchmarking bot {} for {} seconds".format(bot.id_, duration),
+        file=sys.stderr
+    )
+    result = build_bench(
+        application_repository, dialogue_repository, bot,
+        build_corpus(tests), concurrency=concurrency, rate=rate,
+        duration=duration, open_loop=open_loop, arrival=arrival,
+        max_lag=max_lag
+    ).run()
+    report_bench(result, histogram_file)
+    return result
+
+
+def build_bench(
+    application_repository, dialogue_repository, bot, corpus,
+    concurrency=1, rate=None, duration=10,
+    open_loop=False, arrival="constant", max_lag=1.0, phase=0
+):
+    """bench の引数に従って Bench を作成する
+
+    Args:
+        corpus (List[BenchRequest]): コーパス
+        phase (float): 送信予定時刻をずらす時間 (秒)
+
+        その他の引数は bench を参照
+    """
+    if open_loop:
+        return OpenLoopBench(
+            application_repository, dialogue_repository, bot, corpus,
+            rate=rate, concurrency=concurrency, duration=duration,
+            arrival=arrival, max_lag=max_lag, phase=phase
+        )
+    return Bench(
+        application_repository, dialogue_repository, bot, corpus,
+        concurrency=concurrency, rate=rate, duration=duration, phase=phase
+    )
+
+
+def bench_distributed(coordinator, histogram_file=None):
+    """ワーカーの接続を待って分散負荷試験を行い、マージした結果を表示する
+
+    Args:
+        coordinator (Coordinator): ワーカーを割り当て済みのコーディネータ
+        histogram_file (str): bench を参照
+
+    Returns:
+        BenchResult: 結果
+    """
+    address = "{}:{}".format(*coordinator.address)
+    print("Waiting for workers on {}".format(address), file=sys.stderr)
+    result = coordinator.run()
+    report_bench(result, histogram_file)
+    return result
+
+
+def report_bench(result, histogram_file=None):
+    """負荷試験の結果を表示し、ヒストグラムを保存する"""
+    result.report()
+    if histogram_file:
+        result.total.histogram.dump(histogram_file)
+
+
 def aiml_upsert(aiml_repository, aimls):
     for aiml in aimls:
-        with ProgressBar("Uploading AIML {}".format(aiml.filename)):
+        with ProgressBar("Uploading AIML {}".format(aiml.filename)), \
+                profile.span("upload aiml", filename=aiml.filename):
             aiml_repository.upsert(aiml=aiml)
 
 
 def set_upsert(set_repository, sets):
     for set_ in sets:
-        with ProgressBar("Uploading Set {}".format(set_.filename)):
+        with ProgressBar("Uploading Set {}".format(set_.filename)), \
+                profile.span("upload set", filename=set_.filename):
             set_repository.upsert(set=set_)
 
 
 def map_upsert(map_repository, maps):
     for map_ in maps:
-        with ProgressBar("Uploading Map {}".format(map_.filename)):
+        with ProgressBar("Uploading Map {}".format(map_.filename)), \
+                profile.span("upload map", filename=map_.filename):
             map_repository.upsert(map=map_)
 
 
 def config_upsert(config_repository, configs):
     for config in configs:
-        with ProgressBar("Uploading Config {}".format(config.filename)):
+        with ProgressBar("Uploading Config {}".format(config.filename)), \
+                profile.span("upload config", filename=config.filename):
             config_repository.upsert(config=config)
 
 
 def property_upsert(property_repository, properties):
     for property in properties:
-        with ProgressBar("Uploading Property {}".format(property.filename)):
+        with ProgressBar("Uploading Property {}".format(property.filename)), \
+                profile.span("upload property", filename=property.filename):
             property_repository.upsert(property=property)
@@ -4,6 +4,11 @@
 import yaml
 from dialogapi.server import Server
 from dialogapi.server import Endpoint
+from dialogapi.server import DeployConfig
+from dialogapi.server import CacheConfig
+from dialogapi.server import Capabilities
+from dialogapi.requests import DEFAULT_POOL_CONNECTIONS
+from dialogapi.requests import DEFAULT_POOL_MAXSIZE
 from dialogapi.entity import Project
 from dialogapi.entity import Bot
 from dialogapi.entity import AIML
@@ -102,6 +107,13 @@ class _ServerParser:
                 prefix=endpoint[name]["prefix"],
                 header=endpoint[name]["header"],
                 ssl_verify=ssl_verify,
+                pool_connections=_get_default(
+                    endpoint[name], "pool_connections",
+                    DEFAULT_POOL_CONNECTIONS
+                ),
+                pool_maxsize=_get_default(
+                    endpoint[name], "pool_maxsize", DEFAULT_POOL_MAXSIZE
+                ),
             )
         else:
             return None
@@ -132,12 +144,28 @@ class _ServerParser:
                 name=_get_default(server_config, "user", None),
                 password=_get_default(server_config, "password", None)
             )
+            deploy = _get_default(server_config, "deploy", {})
+            _validate_dic(
+                deploy,
+                {"max_concurrent_compiles", "poll_initial_interval",
+                 "poll_max_interval", "poll_timeout"}
+            )
+            cache = _get_default(server_config, "cache", {})
+            _validate_dic(
+                cache,
+                {"project_ttl", "token_ttl", "capability_ttl", "app_id_ttl"}
+            )
+            capabilities = _get_default(server_config, "capabilities", {})
+            _validate_dic(capabilities, {"sraix"})
             server = Server(
                 management_endpoint=management,
                 registration_endpoint=registration,
                 dialogue_endpoint=dialogue,
                 user=user,
-                ssl_verify=ssl_verify
+                ssl_verify=ssl_verify,
+                deploy_config=DeployConfig(**deploy),
+                cache_config=CacheConfig(**cache),
+                capabilities=Capabilities(**capabilities)
             )
 
             name = _get(item, "name")
@@ -0,0 +1,329 @@
+"""負荷試験を複数のプロセス・ホストに分散して実行するモジュール
+
+コーディネータは multiprocessing.connection で待ち受け、
+接続したワーカーにコーパスの担当範囲と同時実行数・リクエストレートを割り当てる。
+ワーカーは実行中の記録を一定間隔でコーディネータへ送り、
+コーディネータはヒストグラムとエラー数をマージして一つの結果にする。
+
+メッセージは JSON で送受信し、接続時には認証キーで相互に認証する。
+"""
+
+
+import json
+import os
+import sys
+import time
+from multiprocessing.connection import Client
+from multiprocessing.connection import Listener
+from multiprocessing.connection import wait
+from dialogapi.bench import BenchResult
+
+
+# リモートのワーカーとコーディネータで共有する認証キーを設定する環境変数
+AUTHKEY_ENV = "DIALOGAPI_BENCH_AUTHKEY"
+
+# ワーカーの接続を待つ間、ワーカープロセスの終了を確認する間隔 (秒)
+_ACCEPT_POLL_INTERVAL = 0.5
+
+
+class DistributedBenchException(Exception):
+    """ワーカーが失敗した場合に送出される例外"""
+
+
+def parse_address(address):
+    """host:port 形式の文字列を (host, port) に変換する"""
+    host, sep, port = address.rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError("Address must be host:port: {}".format(address))
+    return host, int(port)
+
+
+def authkey_from_env():
+    """環境変数から認証キーを取得する
+
+    Raises:
+        DistributedBenchException: 環境変数が設定されていない場合
+    """
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        raise DistributedBenchException(
+            "Set {} to the same secret on the coordinator and workers".format(
+                AUTHKEY_ENV
+            )
+        )
+    return authkey.encode("utf-8")
+
+
+def split_corpus(corpus, index, workers):
+    """ワーカーが担当するコーパスを返す
+
+    コーパスをワーカー数で交互に分ける。
+    コーパスがワーカー数より少ない場合は、一つのリクエストを複数のワーカーが担当する。
+
+    Args:
+        corpus (List[BenchRequest]): コーパス
+        index (int): ワーカーの番号
+        workers (int): ワーカー数
+
+    Returns:
+        List[BenchRequest]: 担当するリクエスト
+    """
+    return corpus[index::workers] or [corpus[index % len(corpus)]]
+
+
+def build_assignments(workers, project, bot, concurrency, rate, duration,
+                      open_loop=False, arrival="constant", max_lag=1.0,
+                      interval=1.0):
+    """各ワーカーへの割り当てを作成する
+
+    concurrency と rate は全体の値を指定し、ワーカー数で分ける。
+    各ワーカーの送信予定時刻は番号 / rate 秒ずつずらし、
+    全体で一定間隔になるようにする。
+    引数の意味は command.bench を参照。
+
+    Returns:
+        List[Dict[str][Any]]: ワーカー毎の割り当て
+
+    Raises:
+        ValueError: concurrency がワーカー数より少ない場合
+    """
+    if concurrency < workers:
+        raise ValueError(
+            "concurrency must be at least the number of workers: {} < {}"
+            .format(concurrency, workers)
+        )
+    assignments = []
+    for index in range(workers):
+        share = concurrency // workers
+        if index < concurrency % workers:
+            share += 1
+        assignments.append({
+            "index": index,
+            "workers": workers,
+            "project": project,
+            "bot": bot,
+            "concurrency": share,
+            "rate": rate / workers if rate else None,
+            "phase": index / rate if rate else 0,
+            "duration": duration,
+            "open_loop": open_loop,
+            "arrival": arrival,
+            "max_lag": max_lag,
+            "interval": interval,
+        })
+    return assignments
+
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(message).encode("utf-8"))
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes().decode("utf-8"))
+
+
+class Coordinator:
+    """ワーカーに負荷試験を割り当て、結果をまとめるクラス"""
+    def __init__(self, address, authkey, assignments, out=None,
+                 accept_timeout=None, processes=None):
+        """
+        Args:
+            address (Tuple[str, int]): 待ち受けるアドレス。
+                ポートに 0 を指定した場合は空いているポートを使う
+            authkey (bytes): 認証キー
+            assignments (List[Dict[str][Any]]): ワーカー毎の割り当て。
+                接続した順に割り当てる
+            out (file): 進捗の出力先。None の場合は標準エラー出力に出力する
+            accept_timeout (float): 全てのワーカーが接続するまで待つ時間 (秒)。
+                None の場合は制限しない
+            processes (List[multiprocessing.Process]): ローカルで起動した
+                ワーカープロセス。全てのワーカーが接続する前に
+                いずれかが終了した場合は待つのをやめる。
+                run を呼び出すまでにプロセスを追加してもよい
+        """
+        self._listener = Listener(address, authkey=authkey)
+        self._assignments = assignments
+        self._out = out or sys.stderr
+        self._accept_timeout = accept_timeout
+        self._processes = [] if processes is None else processes
+
+    @property
+    def address(self):
+        """待ち受けているアドレス"""
+        return self._listener.address
+
+    def close(self):
+        self._listener.close()
+
+    def run(self):
+        """全てのワーカーの接続を待ち、負荷試験を実行する
+
+        Returns:
+            BenchResult: 全てのワーカーの結果をマージした結果
+
+        Raises:
+            DistributedBenchException: いずれかのワーカーが失敗した場合と、
+                期限内に全てのワーカーが接続しなかった場合
+        """
+        conns = []
+        deadline = None
+        if self._accept_timeout is not None:
+            deadline = time.monotonic() + self._accept_timeout
+        try:
+            for assignment in self._assignments:
+                conn = self._accept(deadline, len(conns))
+                conns.append(conn)
+                _send(conn, assignment)
+                self._log("Worker {} connected ({}/{})".format(
+                    assignment["index"], len(conns), len(self._assignments)
+                ))
+            for conn in conns:
+                try:
+                    _send(conn, {"type": "start"})
+                except OSError:
+                    # 失敗したワーカーのメッセージは _collect で受け取る
+                    pass
+            return self._collect(conns)
+        finally:
+            for conn in conns:
+                conn.close()
+            self.close()
+
+    def _accept(self, deadline, connected):
+        """ワーカーの接続を一つ受け付ける
+
+        期限を過ぎた場合と、ワーカープロセスが終了した場合は例外を送出する。
+
+        Args:
+            deadline (float): time.monotonic の期限。None の場合は制限しない
+            connected (int): 接続済みのワーカー数
+        """
+        # Listener は待ち受けるソケットを公開していないため、内部の属性を参照する
+        sock = self._listener._listener._socket
+        while True:
+            timeout = _ACCEPT_POLL_INTERVAL if self._processes else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._raise_missing(
+                        connected, "did not connect in {} seconds".format(
+                            self._accept_timeout
+                        )
+                    )
+                timeout = min(timeout or remaining, remaining)
+            if wait([sock], timeout):
+                return self._listener.accept()
+            exitcodes = [
+                process.exitcode for process in self._processes
+                if process.exitcode is not None
+            ]
+            if exitcodes:
+                self._raise_missing(
+                    connected,
+                    "did not connect (worker process exited with code {})"
+                    .format(", ".join(str(code) for code in exitcodes))
+                )
+
+    def _raise_missing(self, connected, reason):
+        missing = [
+            str(assignment["index"])
+            for assignment in self._assignments[connected:]
+        ]
+        raise DistributedBenchException(
+            "Workers {} {}".format(", ".join(missing), reason)
+        )
+
+    def _collect(self, conns):
+        result = BenchResult(duration=0)
+        errors = []
+        start = time.monotonic()
+        last_report = start
+        running = list(conns)
+        while running:
+            for conn in wait(running):
+                try:
+                    message = _recv(conn)
+                except EOFError:
+                    errors.append("worker disconnected")
+                    running.remove(conn)
+                    continue
+                if message["type"] == "interval":
+                    result.merge(BenchResult.from_dict(message["result"]))
+                elif message["type"] == "done":
+                    result.duration = max(
+                        result.duration, message["duration"]
+                    )
+                    running.remove(conn)
+                elif message["type"] == "error":
+                    errors.append(message["message"])
+                    running.remove(conn)
+
+            now = time.monotonic()
+            if now - last_report >= 1:
+                last_report = now
+                self._progress(result, now - start)
+
+        if errors:
+            raise DistributedBenchException(
+                "Workers failed: " + ", ".join(errors)
+            )
+        return result
+
+    def _progress(self, result, elapsed):
+        requests = result.total.count + result.total.error_count
+        p99 = result.total.percentile(99)
+        self._log(
+            "{:.0f}s: {} requests ({:.1f} rps), {} errors, p99 {}".format(
+                elapsed, requests, requests / elapsed,
+                result.total.error_count,
+                "-" if p99 is None else "{:.1f} ms".format(p99 * 1000)
+            )
+        )
+
+    def _log(self, text):
+        print(text, file=self._out)
+
+
+def run_worker(address, authkey, build_bench, connect_timeout=60):
+    """コーディネータに接続し、割り当てられた負荷試験を実行する
+
+    Args:
+        address (Tuple[str, int]): コーディネータのアドレス
+        authkey (bytes): 認証キー
+        build_bench (Callable[[Dict[str][Any]], Bench]):
+            割り当てから Bench を作成する関数
+        connect_timeout (float): コーディネータが待ち受けを始めるまで
+            接続を再試行する時間 (秒)
+    """
+    conn = _connect(address, authkey, connect_timeout)
+    try:
+        assignment = _recv(conn)
+        try:
+            bench = build_bench(assignment)
+            _recv(conn)
+            result = bench.run(
+                on_interval=lambda delta: _send(
+                    conn, {"type": "interval", "result": delta.to_dict()}
+                ),
+                interval=assignment["interval"]
+            )
+        except Exception as e:
+            _send(conn, {
+                "type": "error",
+                "message": "worker {}: {}".format(assignment["index"], e)
+            })
+            raise
+        _send(conn, {"type": "done", "duration": result.duration})
+    finally:
+        conn.close()
+
+
+def _connect(address, authkey, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
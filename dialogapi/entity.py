@@ -12,6 +12,8 @@ class User:
         self._access_token = access_token
         # access_token が指定された場合 authorized に True をセットする
         self._authorized = True if access_token else False
+        # アクセストークンが失効した場合に再ログインを行うオブジェクト
+        self._authenticator = None
 
     @property
     def name(self):
@@ -44,6 +46,29 @@ class User:
         self._authorized = True
         self._access_token = access_token
 
+    def set_authenticator(self, authenticator):
+        """アクセストークンの失効時に再ログインを行うオブジェクトを設定する
+
+        Args:
+            authenticator (auth.Authenticator): 再ログインを行うオブジェクト
+        """
+        self._authenticator = authenticator
+
+    def reauthorize(self, stale_access_token):
+        """失効したアクセストークンを更新する
+
+        Args:
+            stale_access_token (str): 失効したアクセストークン
+
+        Returns:
+            bool: アクセストークンを更新した場合は True を返す。
+                再ログインを行うオブジェクトが設定されていない場合は False を返す
+        """
+        if not self._authenticator:
+            return False
+        self._authenticator.reauthorize(stale_access_token)
+        return True
+
 
 class Project:
     """プロジェクト管理クラス"""
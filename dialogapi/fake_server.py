@@ -0,0 +1,570 @@
+"""NLU の Management API, Registration API, Dialogue API を模擬するサーバのモジュール
+
+実際のサーバに接続せずに、CLI 全体のデプロイやテストの動作確認・性能測定を行うために使う。
+状態はメモリ上に保持し、プロセスを終了すると失われる。
+操作毎に応答の遅延と失敗を設定できる。
+
+対話は、転送済みの AIML のうちワイルドカードを含まないパターンと
+「*」のみのパターンだけを解釈する最小限の実装であり、
+該当するパターンがない場合は NOMATCH を返す。
+テンプレートは srai と random のみを解釈し、その他のタグは内容のテキストとして扱う。
+"""
+
+
+import datetime
+import email.parser
+import email.policy
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+
+MANAGEMENT_PREFIX = "/NLPManagementAPI"
+REGISTRATION_PREFIX = "/UserRegistrationServer/users/applications"
+DIALOGUE_PREFIX = "/SpontaneousDialogueServer/dialogue"
+
+# 遅延と失敗を設定できる操作
+OPERATIONS = [
+    "login", "projects", "bots", "aiml", "sets", "maps", "properties",
+    "configs", "compile", "transfer", "registration", "dialogue",
+]
+
+NOMATCH = "NOMATCH"
+
+_BOT_PATH = r"projects/(?P<project>\d+)/bots/(?P<bot>[^/]+)"
+
+# メソッド, Management API のプレフィックス以降のパス, 操作, 処理するメソッド名
+_MANAGEMENT_ROUTES = [
+    ("POST", r"login", "login", "_login"),
+    ("GET", r"projects", "projects", "_get_projects"),
+    ("GET", r"projects/(?P<project>\d+)/bots", "bots", "_get_bots"),
+    ("POST", r"projects/(?P<project>\d+)/bots", "bots", "_add_bot"),
+    ("PUT", _BOT_PATH, "bots", "_update_bot"),
+    ("DELETE", _BOT_PATH, "bots", "_remove_bot"),
+    ("PUT", _BOT_PATH + r"/(?P<kind>aiml|sets|maps)", None, "_upload"),
+    ("GET", _BOT_PATH + r"/properties", "properties", "_get_property"),
+    ("POST", _BOT_PATH + r"/properties", "properties", "_add_property"),
+    ("PUT", _BOT_PATH + r"/properties", "properties", "_update_property"),
+    ("PUT", _BOT_PATH + r"/configs", "configs", "_update_config"),
+    ("POST", _BOT_PATH + r"/scenarios/compile", "compile", "_compile"),
+    ("GET", _BOT_PATH + r"/scenarios/compile/status", "compile",
+     "_compile_status"),
+    ("POST", _BOT_PATH + r"/scenarios/transfer", "transfer", "_transfer"),
+    ("GET", _BOT_PATH + r"/scenarios/transfer/status", "transfer",
+     "_transfer_status"),
+]
+
+
+def parse_operation_settings(values):
+    """「秒数」または「操作=秒数」形式の文字列のリストを操作毎の値に変換する
+
+    操作を指定しない値は全ての操作に適用し、操作を指定した値で上書きする。
+
+    Args:
+        values (List[str]): 設定値のリスト
+
+    Returns:
+        Dict[str][float]: 操作と値
+    """
+    settings = dict()
+    for value in sorted(values, key=lambda value: "=" in value):
+        operation, sep, number = value.rpartition("=")
+        if not sep:
+            settings.update({op: float(number) for op in OPERATIONS})
+            continue
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown operation: {}".format(operation))
+        settings[operation] = float(number)
+    return settings
+
+
+class FakeServer:
+    """NLU のサーバを模擬するクラス
+
+    With文で利用するか、start で起動し、使い終わったら stop を呼び出すこと。
+    """
+    def __init__(self, host="127.0.0.1", port=0, projects=None, users=None,
+                 latency=0, failure_rate=0, failure_status=503,
+                 compile_time=0, transfer_time=0, sraix=True, seed=None):
+        """
+        Args:
+            host (str): 待ち受けるホスト
+            port (int): 待ち受けるポート。0 の場合は空いているポートを使う
+            projects (List[str]): サーバに存在するプロジェクト名
+            users (Dict[str][str]): アカウント名とパスワード。
+                None の場合は任意のアカウントでログインできる
+            latency (float or Dict[str][float]): 応答の遅延 (秒)。
+                辞書の場合は操作毎に指定する
+            failure_rate (float or Dict[str][float]): 失敗させる割合。
+                辞書の場合は操作毎に指定する
+            failure_status (int): 失敗時のステータスコード
+            compile_time (float): コンパイルが完了するまでの時間 (秒)
+            transfer_time (float): 転送が完了するまでの時間 (秒)
+            sraix (bool): False の場合は sraix に対応しない NLU v2.5 を模擬する
+            seed (int): 失敗させるリクエストを選ぶ乱数のシード
+        """
+        self._users = users
+        self._latency = latency
+        self._failure_rate = failure_rate
+        self._failure_status = failure_status
+        self._compile_time = compile_time
+        self._transfer_time = transfer_time
+        self._sraix = sraix
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        # 操作と、次のリクエストから順に返すステータスコード
+        self._failures = dict()
+        self._tokens = set()
+        self._project_ids = itertools.count(1)
+        self._projects = dict()
+        for name in projects or []:
+            self.add_project(name)
+        self._thread = None
+
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake_server = self
+
+    @property
+    def host(self):
+        return self._httpd.server_address[0]
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """別スレッドでリクエストの受け付けを開始する"""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+        self._thread.start()
+
+    def serve_forever(self):
+        """現在のスレッドでリクエストを受け付ける"""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """リクエストの受け付けを終了する"""
+        if self._thread:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def add_project(self, name):
+        """プロジェクトを追加し、そのプロジェクト ID を返す"""
+        with self._lock:
+            project_id = next(self._project_ids)
+            self._projects[project_id] = {
+                "projectName": name,
+                "projectId": project_id,
+                "organizationId": 1,
+                "createDate": _now(),
+                "bots": dict(),
+            }
+            return project_id
+
+    def fail(self, operation, status=None, count=1):
+        """操作の次のリクエストから count 回を失敗させる
+
+        Args:
+            operation (str): 操作。OPERATIONS のいずれか
+            status (int): ステータスコード。None の場合は failure_status を使う
+            count (int): 失敗させる回数
+        """
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown operation: {}".format(operation))
+        with self._lock:
+            self._failures.setdefault(operation, []).extend(
+                [status or self._failure_status] * count
+            )
+
+    def expire_tokens(self):
+        """払い出したアクセストークンを全て失効させる"""
+        with self._lock:
+            self._tokens.clear()
+
+    def request_count(self, operation):
+        """操作へのリクエスト数を返す"""
+        with self._lock:
+            return self._counts[operation]
+
+    def handle(self, method, path, headers, body):
+        """リクエストを処理し、ステータスコードとレスポンスの JSON を返す"""
+        route = self._route(method, path)
+        if route is None:
+            return 404, {"message": "Not found: {} {}".format(method, path)}
+        operation, func, params = route
+
+        time.sleep(self._setting(self._latency, operation))
+        with self._lock:
+            self._counts[operation] += 1
+            status = self._injected_failure(operation)
+            if status:
+                return status, {"message": "Injected failure"}
+            if func not in ["_login", "_register", "_dialogue"] and \
+                    headers.get("Authorization") not in self._tokens:
+                return 401, {"message": "Unauthorized"}
+            return getattr(self, func)(
+                body=body, headers=headers, **params
+            )
+
+    def _route(self, method, path):
+        path = path.split("?")[0].rstrip("/")
+        if path == REGISTRATION_PREFIX and method == "POST":
+            return "registration", "_register", {}
+        if path == DIALOGUE_PREFIX and method == "POST":
+            return "dialogue", "_dialogue", {}
+        if not path.startswith(MANAGEMENT_PREFIX + "/"):
+            return None
+        point = path[len(MANAGEMENT_PREFIX) + 1:]
+        for method_, pattern, operation, func in _MANAGEMENT_ROUTES:
+            match = re.fullmatch(pattern, point)
+            if method_ == method and match:
+                params = match.groupdict()
+                return operation or params["kind"], func, params
+        return None
+
+    def _setting(self, value, operation):
+        if isinstance(value, dict):
+            return value.get(operation, 0)
+        return value
+
+    def _injected_failure(self, operation):
+        failures = self._failures.get(operation)
+        if failures:
+            return failures.pop(0)
+        rate = self._setting(self._failure_rate, operation)
+        if rate and self._random.random() < rate:
+            return self._failure_status
+        return None
+
+    # Management API #
+    def _login(self, body, headers):
+        data = _json(body)
+        name = data.get("accountName")
+        if self._users is not None and \
+                self._users.get(name) != data.get("password"):
+            return 401, {"message": "Invalid account or password"}
+        token = uuid.uuid4().hex
+        self._tokens.add(token)
+        return 200, {"accessToken": token}
+
+    def _get_projects(self, body, headers):
+        return 200, {"projects": [
+            {key: val for key, val in project.items() if key != "bots"}
+            for project in self._projects.values()
+        ]}
+
+    def _get_bots(self, body, headers, project):
+        bots = self._bots(project)
+        if bots is None:
+            return 404, {"message": "Project not found"}
+        return 200, {"bots": [bot["info"] for bot in bots.values()]}
+
+    def _add_bot(self, body, headers, project):
+        bots = self._bots(project)
+        if bots is None:
+            return 404, {"message": "Project not found"}
+        data = _json(body)
+        if "sraix" in data and not self._sraix:
+            return 400, {"message": "Unknown parameter: sraix"}
+        if data["botId"] in bots:
+            return 409, {"message": "Bot already exists"}
+        info = {
+            "botId": data["botId"],
+            "scenarioProjectId": data.get("scenarioProjectId", "DSU"),
+            "language": data.get("language", "ja-JP"),
+            "description": data.get("description", ""),
+        }
+        if self._sraix:
+            info["sraix"] = data.get("sraix", "null")
+        bots[data["botId"]] = {
+            "info": info,
+            "aiml": dict(), "sets": dict(), "maps": dict(),
+            "property": None, "config": None,
+            "compiled": dict(), "compiled_at": None,
+            "deployed": dict(), "transferred_at": None,
+        }
+        return 201, {}
+
+    def _update_bot(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        data = _json(body)
+        if "sraix" in data and not self._sraix:
+            return 400, {"message": "Unknown parameter: sraix"}
+        for key in ["language", "description", "sraix"]:
+            if key in data:
+                bot_["info"][key] = data[key]
+        return 204, None
+
+    def _remove_bot(self, body, headers, project, bot):
+        bots = self._bots(project)
+        if bots is None or bot not in bots:
+            return 404, {"message": "Bot not found"}
+        del bots[bot]
+        return 204, None
+
+    def _upload(self, body, headers, project, bot, kind):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        filename, content = _upload_file(headers, body)
+        if filename is None:
+            return 400, {"message": "uploadFile not found"}
+        bot_[kind][filename] = content
+        return 201, {}
+
+    def _get_property(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None or bot_["property"] is None:
+            return 404, {"message": "Property not found"}
+        return 200, bot_["property"]
+
+    def _add_property(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        if bot_["property"] is not None:
+            return 409, {"message": "Property already exists"}
+        bot_["property"] = _json(body)
+        return 201, {}
+
+    def _update_property(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None or bot_["property"] is None:
+            return 404, {"message": "Property not found"}
+        bot_["property"] = _json(body)
+        return 204, None
+
+    def _update_config(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        bot_["config"] = _json(body)
+        return 201, {}
+
+    def _compile(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        try:
+            bot_["compiled"] = _compile_aiml(bot_["aiml"].values())
+        except ET.ParseError as e:
+            return 400, {"message": "Invalid AIML: {}".format(e)}
+        bot_["compiled_at"] = time.monotonic()
+        return 202, {}
+
+    def _compile_status(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        return 200, {"status": self._status(
+            bot_["compiled_at"], self._compile_time
+        )}
+
+    def _transfer(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        bot_["deployed"] = bot_["compiled"]
+        bot_["transferred_at"] = time.monotonic()
+        return 202, {}
+
+    def _transfer_status(self, body, headers, project, bot):
+        bot_ = self._bot(project, bot)
+        if bot_ is None:
+            return 404, {"message": "Bot not found"}
+        return 200, {"transferStatusResponses": [{"status": self._status(
+            bot_["transferred_at"], self._transfer_time
+        )}]}
+
+    def _status(self, started_at, duration):
+        if started_at is None:
+            return "NotStarted"
+        if time.monotonic() < started_at + duration:
+            return "Running"
+        return "Completed"
+
+    def _bots(self, project):
+        project_ = self._projects.get(int(project))
+        return None if project_ is None else project_["bots"]
+
+    def _bot(self, project, bot):
+        return (self._bots(project) or {}).get(bot)
+
+    def _find_bot(self, bot_id):
+        for project in self._projects.values():
+            if bot_id in project["bots"]:
+                return project["bots"][bot_id]
+        return None
+
+    # Registration API, Dialogue API #
+    def _register(self, body, headers):
+        data = _json(body)
+        if self._find_bot(data.get("bot_id")) is None:
+            return 400, {"message": "Bot not found"}
+        return 200, {"app_id": data.get("app_id") or uuid.uuid4().hex}
+
+    def _dialogue(self, body, headers):
+        data = _json(body)
+        bot = self._find_bot(data.get("botId"))
+        if bot is None:
+            return 400, {"message": "Bot not found"}
+        text = _respond(
+            bot["deployed"], data.get("voiceText", ""), self._random
+        )
+        return 200, {
+            "systemText": {"expression": text, "utterance": text},
+            "dialogStatus": {},
+            "serverSendTime": _now(),
+        }
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # 多数のコネクションを同時に開くクライアントの接続を待たせない
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive で接続を再利用できるようにする
+    protocol_version = "HTTP/1.1"
+    # ヘッダとボディを別々に書き込むため、遅延 ACK で応答が遅れないようにする
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, response = self.server.fake_server.handle(
+            self.command, self.path, self.headers, body
+        )
+        content = b""
+        if response is not None:
+            content = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _json(body):
+    if not body:
+        return dict()
+    return json.loads(body.decode("utf-8"))
+
+
+def _upload_file(headers, body):
+    """multipart/form-data から uploadFile のファイル名と内容を取り出す"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        "Content-Type: {}\r\n\r\n".format(
+            headers.get("Content-Type", "")
+        ).encode("utf-8") + body
+    )
+    if not message.is_multipart():
+        return None, None
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == \
+                "uploadFile":
+            content = part.get_payload(decode=True).decode("utf-8")
+            return part.get_filename() or "uploadFile", content
+    return None, None
+
+
+def _normalize(text):
+    return "".join(text.split()).upper()
+
+
+def _local_name(element):
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _compile_aiml(contents):
+    """AIML からパターンとテンプレートの辞書を作成する
+
+    that を持つカテゴリと、「*」以外のワイルドカードを含むパターンは無視する。
+    """
+    patterns = dict()
+    for content in contents:
+        root = ET.fromstring(content.encode("utf-8"))
+        for category in root.iter():
+            if _local_name(category) != "category":
+                continue
+            children = {_local_name(child): child for child in category}
+            if "that" in children or "pattern" not in children \
+                    or "template" not in children:
+                continue
+            pattern = _normalize("".join(children["pattern"].itertext()))
+            if pattern != "*" and re.search(r"[*_#^]", pattern):
+                continue
+            patterns[pattern] = children["template"]
+    return patterns
+
+
+def _respond(patterns, text, random_, depth=0):
+    template = patterns.get(_normalize(text))
+    if template is None:
+        template = patterns.get("*")
+    if template is None or depth > 10:
+        return NOMATCH
+    return _evaluate(template, patterns, random_, depth)
+
+
+def _evaluate(element, patterns, random_, depth):
+    texts = [(element.text or "").strip()]
+    for child in element:
+        name = _local_name(child)
+        if name == "srai":
+            texts.append(_respond(
+                patterns, _evaluate(child, patterns, random_, depth),
+                random_, depth + 1
+            ))
+        elif name == "random":
+            items = [li for li in child if _local_name(li) == "li"]
+            if items:
+                texts.append(_evaluate(
+                    random_.choice(items), patterns, random_, depth
+                ))
+        else:
+            texts.append(_evaluate(child, patterns, random_, depth))
+        texts.append((child.tail or "").strip())
+    return "".join(texts)
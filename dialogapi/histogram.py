@@ -0,0 +1,192 @@
+"""レイテンシを記録するヒストグラムのモジュール
+
+HdrHistogram と同様に、値の桁毎に一定数のバケットを持つ対数・線形のバケットで値を数える。
+メモリ使用量はサンプル数によらずバケット数で抑えられ、
+指定した有効桁数の精度でパーセンタイルを求められる。
+同じ設定のヒストグラムは、スレッド・プロセス・マシンをまたいで誤差なくマージできる。
+"""
+
+
+import json
+import math
+
+
+class HistogramException(Exception):
+    """設定が異なるヒストグラムをマージしようとした場合などに送出される例外"""
+
+
+class Histogram:
+    """レイテンシ (秒) を記録するヒストグラム
+
+    値は unit 単位の整数に切り捨てて記録する。
+    2 ** sub_bucket_bits 未満の値は 1 単位毎に、
+    それ以上の値は 2 の冪毎に sub_bucket_count / 2 個のバケットに分けて数える。
+    """
+    VERSION = 1
+
+    def __init__(self, unit=1e-6, highest=3600, significant_figures=3):
+        """
+        Args:
+            unit (float): 記録する値の最小単位 (秒)
+            highest (float): 記録する値の上限 (秒)。上限を超える値は上限として記録する
+            significant_figures (int): パーセンタイルの有効桁数。1 から 5 まで
+        """
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self._unit = unit
+        self._highest = highest
+        self._significant_figures = significant_figures
+        self._sub_bucket_bits = math.ceil(
+            math.log2(2 * 10 ** significant_figures)
+        )
+        self._highest_units = int(highest / unit)
+        # バケットのインデックスとその値の数。記録がないバケットは持たない
+        self._counts = dict()
+        self._count = 0
+        self._sum = 0
+        self._min = None
+        self._max = None
+
+    @property
+    def count(self):
+        """記録した値の数"""
+        return self._count
+
+    @property
+    def min(self):
+        """記録した最小値 (秒)。記録がない場合は None"""
+        return None if self._min is None else self._min * self._unit
+
+    @property
+    def max(self):
+        """記録した最大値 (秒)。記録がない場合は None"""
+        return None if self._max is None else self._max * self._unit
+
+    @property
+    def mean(self):
+        """記録した値の平均 (秒)。記録がない場合は None"""
+        if not self._count:
+            return None
+        return self._sum / self._count * self._unit
+
+    def record(self, value, count=1):
+        """値を記録する
+
+        Args:
+            value (float): 値 (秒)
+            count (int): 値を記録する回数
+        """
+        units = min(max(int(value / self._unit), 0), self._highest_units)
+        index = self._index(units)
+        self._counts[index] = self._counts.get(index, 0) + count
+        self._count += count
+        self._sum += units * count
+        if self._min is None or units < self._min:
+            self._min = units
+        if self._max is None or units > self._max:
+            self._max = units
+
+    def merge(self, other):
+        """他のヒストグラムの記録を加える
+
+        Args:
+            other (Histogram): 同じ設定のヒストグラム
+
+        Raises:
+            HistogramException: 設定が異なる場合
+        """
+        if self._config() != other._config():
+            raise HistogramException(
+                "Cannot merge histograms with different settings: "
+                "{} and {}".format(self._config(), other._config())
+            )
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self._count += other._count
+        self._sum += other._sum
+        for units in [other._min, other._max]:
+            if units is None:
+                continue
+            if self._min is None or units < self._min:
+                self._min = units
+            if self._max is None or units > self._max:
+                self._max = units
+
+    def percentile(self, percentile):
+        """パーセンタイルを返す
+
+        値は該当するバケットに入る最大の値とする。ただし記録した最大値を超えない。
+
+        Args:
+            percentile (float): 0 から 100 までのパーセンタイル
+
+        Returns:
+            float: 値 (秒)。記録がない場合は None
+        """
+        if not self._count:
+            return None
+        target = max(math.ceil(percentile * self._count / 100), 1)
+        cumulative = 0
+        for index in sorted(self._counts):
+            cumulative += self._counts[index]
+            if cumulative >= target:
+                units = min(self._highest_equivalent(index), self._max)
+                return max(units, self._min) * self._unit
+        return self.max
+
+    def to_dict(self):
+        """JSON に変換可能な辞書を返す"""
+        return {
+            "version": self.VERSION,
+            "unit": self._unit,
+            "highest": self._highest,
+            "significant_figures": self._significant_figures,
+            "count": self._count,
+            "sum": self._sum,
+            "min": self._min,
+            "max": self._max,
+            "counts": sorted(self._counts.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, dic):
+        """to_dict で変換した辞書からヒストグラムを復元する"""
+        if dic.get("version") != cls.VERSION:
+            raise HistogramException(
+                "Unsupported histogram version: {}".format(dic.get("version"))
+            )
+        histogram = cls(
+            unit=dic["unit"],
+            highest=dic["highest"],
+            significant_figures=dic["significant_figures"]
+        )
+        histogram._counts = {index: count for index, count in dic["counts"]}
+        histogram._count = dic["count"]
+        histogram._sum = dic["sum"]
+        histogram._min = dic["min"]
+        histogram._max = dic["max"]
+        return histogram
+
+    def dump(self, filename):
+        """ファイルに保存する"""
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filename):
+        """dump で保存したファイルからヒストグラムを読み込む"""
+        with open(filename, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def _config(self):
+        return (self._unit, self._highest, self._significant_figures)
+
+    def _index(self, units):
+        shift = max(units.bit_length() - self._sub_bucket_bits, 0)
+        return (shift << (self._sub_bucket_bits - 1)) + (units >> shift)
+
+    def _highest_equivalent(self, index):
+        half_bits = self._sub_bucket_bits - 1
+        shift = max((index >> half_bits) - 1, 0)
+        top = index - (shift << half_bits)
+        return ((top + 1) << shift) - 1
@@ -1,15 +1,182 @@
+import asyncio
+import contextlib
+import multiprocessing
+import os
 import sys
 import click
 import dialogapi.command as command
+from dialogapi.bench import ARRIVALS
+from dialogapi.bench import build_corpus
+from dialogapi.cassette import Cassette
 from dialogapi.config_parser import build_entity_bucket
+from dialogapi.distributed_bench import Coordinator
+from dialogapi.distributed_bench import authkey_from_env
+from dialogapi.distributed_bench import build_assignments
+from dialogapi.distributed_bench import parse_address
+from dialogapi.distributed_bench import run_worker
+from dialogapi.distributed_bench import split_corpus
+from dialogapi.fake_server import FakeServer
+from dialogapi.fake_server import parse_operation_settings
 from dialogapi.repository_factory import RepositoryFactory
+from dialogapi.cache import FileCache
+from dialogapi.cache import cache_dir
+from dialogapi.manifest import ManifestStore
+from dialogapi.async_repository_factory import AsyncRepositoryFactory
+from dialogapi.pipeline import DeployTarget
+from dialogapi.pipeline import PipelinedDeployer
+from dialogapi.profile import Profiler
+from dialogapi.test.reporter import JSONLReporter
+from dialogapi.test.reporter import JUnitReporter
+from dialogapi.test.reporter import MultiReporter
+from dialogapi.test.shard import shard_tests
 
 # エラー時のトレースバック出力を制御する
 sys.tracebacklimit = 0
 
 
+def build_project_cache(server):
+    ttl = server.cache_config.project_ttl
+    if not ttl:
+        return None
+    return FileCache(os.path.join(cache_dir(), "projects.json"), ttl=ttl)
+
+
+def build_token_cache(server):
+    ttl = server.cache_config.token_ttl
+    if not ttl:
+        return None
+    return FileCache(os.path.join(cache_dir(), "tokens.json"), ttl=ttl)
+
+
+def build_capability_cache(server):
+    ttl = server.cache_config.capability_ttl
+    if not ttl:
+        return None
+    return FileCache(os.path.join(cache_dir(), "capabilities.json"), ttl=ttl)
+
+
+def build_app_id_cache(server):
+    ttl = server.cache_config.app_id_ttl
+    if not ttl:
+        return None
+    return FileCache(os.path.join(cache_dir(), "app_ids.json"), ttl=ttl)
+
+
+def open_cassette(record, replay):
+    """--record, --replay オプションからカセットを開く
+
+    どちらも指定されていない場合は何もしないコンテキストマネージャを返す。
+    """
+    if record and replay:
+        raise click.UsageError("--record and --replay are mutually exclusive")
+    if record:
+        return Cassette(record, mode="record")
+    if replay:
+        return Cassette(replay, mode="replay")
+    return contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def open_reporter(junit, jsonl):
+    """--junit, --jsonl オプションからレポーターを開く
+
+    どちらも指定されていない場合は None を返す。
+    """
+    with contextlib.ExitStack() as stack:
+        reporters = []
+        for filename, cls in [(junit, JUnitReporter), (jsonl, JSONLReporter)]:
+            if filename:
+                out = stack.enter_context(
+                    open(filename, "w", encoding="utf-8")
+                )
+                reporters.append(stack.enter_context(cls(out)))
+        if not reporters:
+            yield None
+        elif len(reporters) == 1:
+            yield reporters[0]
+        else:
+            yield MultiReporter(reporters)
+
+
+def select_shard(bot_tests, shard_index, shard_count):
+    """--shard-index, --shard-count オプションから、実行するテストを選ぶ
+
+    選んだタスク数を標準エラー出力に表示する。
+    """
+    if shard_index >= shard_count:
+        raise click.BadParameter(
+            "must be less than --shard-count", param_hint="--shard-index"
+        )
+    if shard_count == 1:
+        return bot_tests
+
+    def count(bot_tests):
+        return sum(len(manager.tasks)
+                   for _, tests in bot_tests for manager in tests)
+
+    sharded = shard_tests(bot_tests, shard_index, shard_count)
+    print(
+        "Running shard {} (of {}): {} of {} tasks".format(
+            shard_index, shard_count, count(sharded), count(bot_tests)
+        ),
+        file=sys.stderr
+    )
+    return sharded
+
+
+def build_test_repositories(repos_factory, cassette=None):
+    """テストで使う ApplicationRepository, DialogueRepository と
+    app_id のキャッシュを返す
+
+    カセットを指定した場合は、リポジトリをカセットで置き換える。
+    記録した app_id と再生時の app_id を一致させるため、
+    その場合は app_id のキャッシュを使わない。
+    """
+    application_repository = repos_factory.create_application_repository()
+    dialogue_repository = repos_factory.create_dialogue_repository()
+    if cassette is None:
+        return (application_repository, dialogue_repository,
+                build_app_id_cache(repos_factory.server))
+    return (
+        cassette.wrap_application_repository(application_repository),
+        cassette.wrap_dialogue_repository(dialogue_repository),
+        None
+    )
+
+
+@contextlib.contextmanager
+def profiling(server, filename):
+    """--profile オプションが指定された場合に、フェーズと HTTP リクエストを記録する
+
+    With ブロックを抜けると集計を標準エラー出力に表示し、
+    Chrome のトレースイベント形式で filename に保存する。
+    """
+    if not filename:
+        yield
+        return
+    profiler = Profiler()
+    hook = profiler.hook()
+    transports = [endpoint.transport for endpoint in server.endpoints]
+    for transport in transports:
+        transport.add_hook(hook)
+    try:
+        with profiler.activate():
+            yield
+    finally:
+        for transport in transports:
+            transport.remove_hook(hook)
+        profiler.report()
+        profiler.dump_chrome_trace(filename)
+        print("Wrote trace to {}".format(filename), file=sys.stderr)
+
+
 def build_repository_factory(server, auth=True):
-    return RepositoryFactory(server=server, auth=auth)
+    return RepositoryFactory(
+        server=server, auth=auth,
+        project_cache=build_project_cache(server),
+        token_cache=build_token_cache(server),
+        capability_cache=build_capability_cache(server)
+    )
 
 
 @click.group()
@@ -41,12 +208,76 @@ def project_list(config, server):
 @click.option('--config', help='config file', type=str, required=True)
 @click.option('--server', help="server", type=str, required=True)
 @click.option('--project', help="project", type=str, required=True)
-def project_setup(config, server, project):
+@click.option('--pipeline', help="deploy bots concurrently", is_flag=True)
+@click.option('--incremental', help="upload changed resources only",
+              is_flag=True)
+@click.option('--profile', help="record phases and HTTP calls and "
+              "write a Chrome trace to the file", type=str, default=None)
+def project_setup(config, server, project, pipeline, incremental, profile):
     """プロジェクトのボット作成・設定を行う"""
     server_, entity_bucket = build_entity_bucket(config, server)
-    repos_factory = build_repository_factory(server_)
-    for bot_name, _ in entity_bucket.iter_bots(project=project):
-        _bot_setup(entity_bucket, repos_factory, project, bot_name)
+    with profiling(server_, profile):
+        if pipeline:
+            _project_setup_pipelined(
+                server_, entity_bucket, project, incremental
+            )
+            return
+
+        repos_factory = build_repository_factory(server_)
+        for bot_name, _ in entity_bucket.iter_bots(project=project):
+            _bot_setup(
+                entity_bucket, repos_factory, project, bot_name, incremental
+            )
+
+
+def _project_setup_pipelined(server, entity_bucket, project, incremental):
+    project_ = entity_bucket.get_project(project=project)
+    manifest_store = ManifestStore(server)
+    repos = AsyncRepositoryFactory(
+        server=server,
+        project_cache=build_project_cache(server),
+        token_cache=build_token_cache(server),
+        capability_cache=build_capability_cache(server)
+    )
+    targets = []
+    for bot_name, bot_ in entity_bucket.iter_bots(project=project):
+        targets.append(DeployTarget(
+            bot_repository=repos.create_bot_repository(project=project_),
+            aiml_repository=repos.create_aiml_repository(
+                project=project_, bot=bot_
+            ),
+            set_repository=repos.create_set_repository(
+                project=project_, bot=bot_
+            ),
+            map_repository=repos.create_map_repository(
+                project=project_, bot=bot_
+            ),
+            config_repository=repos.create_config_repository(
+                project=project_, bot=bot_
+            ),
+            property_repository=repos.create_property_repository(
+                project=project_, bot=bot_
+            ),
+            bot=bot_,
+            aimls=entity_bucket.get_aimls(project=project, bot=bot_name),
+            sets=entity_bucket.get_sets(project=project, bot=bot_name),
+            maps=entity_bucket.get_maps(project=project, bot=bot_name),
+            configs=entity_bucket.get_configs(
+                project=project, bot=bot_name
+            ),
+            properties=entity_bucket.get_properties(
+                project=project, bot=bot_name
+            ),
+            manifest=manifest_store.get(project=project_, bot=bot_),
+            incremental=incremental
+        ))
+    deployer = PipelinedDeployer(deploy_config=server.deploy_config)
+
+    async def deploy():
+        async with repos:
+            await deployer.deploy_async(targets)
+
+    asyncio.run(deploy())
 
 
 @click.command()
@@ -60,22 +291,70 @@ def project_reset(config, server, project):
     project_ = entity_bucket.get_project(project=project)
     bot_repository = repos_factory.create_bot_repository(project=project_)
 
+    manifest_store = ManifestStore(server_)
     for bot in bot_repository.get_all():
         command.bot_remove(bot_repository=bot_repository, bot=bot)
+        manifest_store.get(project=project_, bot=bot).remove()
 
 
 @click.command()
 @click.option('--config', help='config file', type=str, required=True)
 @click.option('--server', help="server", type=str, required=True)
 @click.option('--project', help="project", type=str, required=True)
-def project_test(config, server, project):
+@click.option('--concurrency', help="number of concurrent tasks",
+              type=click.IntRange(min=1), default=1)
+@click.option('--workers', help="number of bots tested in parallel",
+              type=click.IntRange(min=1), default=1)
+@click.option('--record', help="record dialogue traffic to a cassette file",
+              type=str, default=None)
+@click.option('--replay', help="replay dialogue traffic from a cassette file",
+              type=str, default=None)
+@click.option('--profile', help="record phases and HTTP calls and "
+              "write a Chrome trace to the file", type=str, default=None)
+@click.option('--junit', help="write task results to the file as JUnit XML",
+              type=str, default=None)
+@click.option('--jsonl', help="write task results to the file as JSON Lines",
+              type=str, default=None)
+@click.option('--shard-index', help="0-based index of the shard to run",
+              type=click.IntRange(min=0), default=0)
+@click.option('--shard-count', help="number of shards to split tasks into",
+              type=click.IntRange(min=1), default=1)
+def project_test(config, server, project, concurrency, workers,
+                 record, replay, profile, junit, jsonl,
+                 shard_index, shard_count):
     """プロジェクトの全てのボットをテストする"""
     server_, entity_bucket = build_entity_bucket(config, server)
     repos_factory = build_repository_factory(server_, auth=False)
-    results = []
-    for bot_name, _ in entity_bucket.iter_bots(project=project):
-        res = _bot_test(entity_bucket, repos_factory, project, bot_name)
-        results.append(res)
+    bot_tests = select_shard(
+        [
+            (bot_, entity_bucket.get_tests(project=project, bot=name))
+            for name, bot_ in entity_bucket.iter_bots(project=project)
+        ],
+        shard_index, shard_count
+    )
+    with profiling(server_, profile), \
+            open_cassette(record, replay) as cassette, \
+            open_reporter(junit, jsonl) as reporter:
+        if workers > 1:
+            application_repository, dialogue_repository, app_id_cache = \
+                build_test_repositories(repos_factory, cassette)
+            results = command.project_test(
+                application_repository,
+                dialogue_repository,
+                bot_tests,
+                workers=workers,
+                concurrency=concurrency,
+                app_id_cache=app_id_cache,
+                reporter=reporter
+            )
+        else:
+            results = []
+            for bot_, tests in bot_tests:
+                res = _bot_test(
+                    repos_factory, bot_, tests, concurrency, cassette,
+                    reporter
+                )
+                results.append(res)
     _judge_test(results)
 
 
@@ -107,10 +386,12 @@ def bot_list(config, server, project):
     )
 
 
-def _bot_setup(entity_bucket, repos_factory, project, bot):
+def _bot_setup(entity_bucket, repos_factory, project, bot, incremental=False):
     repos = repos_factory  # rename repos_factory for shorthand
     project_ = entity_bucket.get_project(project=project)
     bot_ = entity_bucket.get_bot(project=project, bot=bot)
+    # 差分デプロイでない場合もマニフェストを更新し、次回の差分デプロイに備える
+    manifest = ManifestStore(repos.server).get(project=project_, bot=bot_)
     command.bot_setup(
         bot_repository=repos.create_bot_repository(project=project_),
         aiml_repository=repos.create_aiml_repository(
@@ -129,7 +410,10 @@ def _bot_setup(entity_bucket, repos_factory, project, bot):
         sets=entity_bucket.get_sets(project=project, bot=bot),
         maps=entity_bucket.get_maps(project=project, bot=bot),
         configs=entity_bucket.get_configs(project=project, bot=bot),
-        properties=entity_bucket.get_properties(project=project, bot=bot)
+        properties=entity_bucket.get_properties(project=project, bot=bot),
+        deploy_config=repos_factory.server.deploy_config,
+        manifest=manifest,
+        incremental=incremental
     )
 
 
@@ -138,21 +422,35 @@ def _bot_setup(entity_bucket, repos_factory, project, bot):
 @click.option('--server', help="server", type=str, required=True)
 @click.option('--project', help="project", type=str, required=True)
 @click.option('--bot', help="bot", type=str, required=True)
-def bot_setup(config, server, project, bot):
+@click.option('--incremental', help="upload changed resources only",
+              is_flag=True)
+@click.option('--profile', help="record phases and HTTP calls and "
+              "write a Chrome trace to the file", type=str, default=None)
+def bot_setup(config, server, project, bot, incremental, profile):
     """ボットを追加・設定する"""
     server_, entity_bucket = build_entity_bucket(config, server)
-    repos_factory = build_repository_factory(server_)
-    _bot_setup(entity_bucket, repos_factory, project, bot)
+    with profiling(server_, profile):
+        repos_factory = build_repository_factory(server_)
+        _bot_setup(entity_bucket, repos_factory, project, bot, incremental)
 
 
 def _bot_helper(action, config, server, project, bot):
     server_, entity_bucket = build_entity_bucket(config, server)
     repos_factory = build_repository_factory(server_)
     project_ = entity_bucket.get_project(project=project)
+    kwargs = dict()
+    # コンパイル・転送ではポーリングの設定を渡す
+    if action in {"bot_compile", "bot_transfer"}:
+        kwargs["deploy_config"] = server_.deploy_config
+    bot_ = entity_bucket.get_bot(project=project, bot=bot)
     getattr(command, action)(
         bot_repository=repos_factory.create_bot_repository(project=project_),
-        bot=entity_bucket.get_bot(project=project, bot=bot)
+        bot=bot_,
+        **kwargs
     )
+    # 削除したボットは次回のデプロイで全てのリソースをアップロードする
+    if action == "bot_remove":
+        ManifestStore(server_).get(project=project_, bot=bot_).remove()
 
 
 @click.command()
@@ -205,15 +503,17 @@ def bot_transfer(config, server, project, bot):
     _bot_helper("bot_transfer", config, server, project, bot)
 
 
-def _bot_test(entity_bucket, repos_factory, project, bot):
+def _bot_test(repos_factory, bot_, tests, concurrency=1, cassette=None,
+              reporter=None):
     """ボットをテストする"""
-    tests = entity_bucket.get_tests(project=project, bot=bot)
-    bot_ = entity_bucket.get_bot(project=project, bot=bot)
+    application_repository, dialogue_repository, app_id_cache = \
+        build_test_repositories(repos_factory, cassette)
 
     return command.bot_test(
-        repos_factory.create_application_repository(),
-        repos_factory.create_dialogue_repository(),
-        bot_, tests
+        application_repository,
+        dialogue_repository,
+        bot_, tests, concurrency=concurrency,
+        app_id_cache=app_id_cache, reporter=reporter
     )
 
 
@@ -228,13 +528,42 @@ def _judge_test(results):
 @click.option('--server', help="server", type=str, required=True)
 @click.option('--project', help="project", type=str, required=True)
 @click.option('--bot', help="bot", type=str, required=True)
-def bot_test(config, server, project, bot):
+@click.option('--concurrency', help="number of concurrent tasks",
+              type=click.IntRange(min=1), default=1)
+@click.option('--record', help="record dialogue traffic to a cassette file",
+              type=str, default=None)
+@click.option('--replay', help="replay dialogue traffic from a cassette file",
+              type=str, default=None)
+@click.option('--profile', help="record phases and HTTP calls and "
+              "write a Chrome trace to the file", type=str, default=None)
+@click.option('--junit', help="write task results to the file as JUnit XML",
+              type=str, default=None)
+@click.option('--jsonl', help="write task results to the file as JSON Lines",
+              type=str, default=None)
+@click.option('--shard-index', help="0-based index of the shard to run",
+              type=click.IntRange(min=0), default=0)
+@click.option('--shard-count', help="number of shards to split tasks into",
+              type=click.IntRange(min=1), default=1)
+def bot_test(config, server, project, bot, concurrency, record, replay,
+             profile, junit, jsonl, shard_index, shard_count):
     """ボットをテストする"""
     server_, entity_bucket = build_entity_bucket(config, server)
     # テスト時は Project オブジェクトに project_id を設定する必要がないため、
     # Management API の認証は行わない
     repos_factory = build_repository_factory(server_, auth=False)
-    test_result = _bot_test(entity_bucket, repos_factory, project, bot)
+    bot_ = entity_bucket.get_bot(project=project, bot=bot)
+    bot_tests = select_shard(
+        [(bot_, entity_bucket.get_tests(project=project, bot=bot))],
+        shard_index, shard_count
+    )
+    # このシャードにタスクがない場合も、空のテストとして実行する
+    tests = bot_tests[0][1] if bot_tests else []
+    with profiling(server_, profile), \
+            open_cassette(record, replay) as cassette, \
+            open_reporter(junit, jsonl) as reporter:
+        test_result = _bot_test(
+            repos_factory, bot_, tests, concurrency, cassette, reporter
+        )
     _judge_test([test_result])
 
 
@@ -260,6 +589,208 @@ def _bot_entity_helper(action_set, config, server, project, bot):
     getattr(command, action_set[2])(repos, items)
 
 
+# 負荷試験 #
+@click.command()
+@click.option('--config', help='config file', type=str, required=True)
+@click.option('--server', help="server", type=str, required=True)
+@click.option('--project', help="project", type=str, required=True)
+@click.option('--bot', help="bot", type=str, required=True)
+@click.option('--concurrency', help="number of concurrent requests",
+              type=click.IntRange(min=1), default=1)
+@click.option('--rate', help="target requests per second",
+              type=click.FloatRange(min=0, min_open=True), default=None)
+@click.option('--duration', help="duration in seconds",
+              type=click.FloatRange(min=0, min_open=True), default=10)
+@click.option('--open-loop', help="send requests on a fixed timetable",
+              is_flag=True)
+@click.option('--arrival', help="request arrival process for --open-loop",
+              type=click.Choice(ARRIVALS), default="constant")
+@click.option('--max-lag', help="seconds before a late request is dropped",
+              type=click.FloatRange(min=0), default=1.0)
+@click.option('--histogram', help="file to save the latency histogram",
+              type=str, default=None)
+@click.option('--processes', help="number of local worker processes",
+              type=click.IntRange(min=1), default=1)
+@click.option('--listen', help="host:port to wait for remote workers",
+              type=str, default=None)
+@click.option('--workers', help="number of remote workers for --listen",
+              type=click.IntRange(min=1), default=1)
+def bench(config, server, project, bot, concurrency, rate, duration,
+          open_loop, arrival, max_lag, histogram, processes, listen, workers):
+    """テストファイルのリクエストで Dialogue API の負荷試験を行う"""
+    if open_loop and not rate:
+        raise click.UsageError("--open-loop requires --rate")
+    if listen and processes > 1:
+        raise click.UsageError("--listen cannot be used with --processes")
+    if concurrency < (workers if listen else processes):
+        raise click.UsageError(
+            "--concurrency must be at least the number of workers"
+        )
+    server_, entity_bucket = build_entity_bucket(config, server)
+    if listen or processes > 1:
+        # 存在しないボットの指定はワーカーの起動前に検出する
+        entity_bucket.get_bot(project=project, bot=bot)
+        assignments = build_assignments(
+            workers if listen else processes, project, bot,
+            concurrency=concurrency, rate=rate, duration=duration,
+            open_loop=open_loop, arrival=arrival, max_lag=max_lag
+        )
+        if listen:
+            coordinator = Coordinator(
+                parse_address(listen), authkey_from_env(), assignments
+            )
+            command.bench_distributed(coordinator, histogram_file=histogram)
+        else:
+            _bench_local(config, server, assignments, histogram)
+        return
+
+    repos_factory = build_repository_factory(server_, auth=False)
+    command.bench(
+        repos_factory.create_application_repository(),
+        repos_factory.create_dialogue_repository(),
+        entity_bucket.get_bot(project=project, bot=bot),
+        entity_bucket.get_tests(project=project, bot=bot),
+        concurrency=concurrency, rate=rate, duration=duration,
+        open_loop=open_loop, arrival=arrival, max_lag=max_lag,
+        histogram_file=histogram
+    )
+
+
+# ローカルのワーカープロセスが起動して接続するまで待つ時間 (秒)
+_LOCAL_WORKER_ACCEPT_TIMEOUT = 60
+
+
+def _bench_local(config, server, assignments, histogram):
+    """ローカルのワーカープロセスで分散負荷試験を行う"""
+    authkey = os.urandom(32)
+    # ワーカーはコーディネータのアドレスを渡して起動し、後からリストに加える
+    processes = []
+    coordinator = Coordinator(
+        ("127.0.0.1", 0), authkey, assignments,
+        accept_timeout=_LOCAL_WORKER_ACCEPT_TIMEOUT, processes=processes
+    )
+    processes.extend(
+        multiprocessing.Process(
+            target=_bench_worker_process,
+            args=(coordinator.address, authkey, config, server),
+            daemon=True
+        )
+        for _ in assignments
+    )
+    for process in processes:
+        process.start()
+    try:
+        command.bench_distributed(coordinator, histogram_file=histogram)
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+
+
+def _bench_worker_process(address, authkey, config, server):
+    run_worker(
+        address, authkey,
+        lambda assignment: _build_worker_bench(config, server, assignment)
+    )
+
+
+def _build_worker_bench(config, server, assignment):
+    """コーディネータからの割り当てに従って Bench を作成する"""
+    server_, entity_bucket = build_entity_bucket(config, server)
+    repos_factory = build_repository_factory(server_, auth=False)
+    project, bot = assignment["project"], assignment["bot"]
+    corpus = split_corpus(
+        build_corpus(entity_bucket.get_tests(project=project, bot=bot)),
+        assignment["index"], assignment["workers"]
+    )
+    return command.build_bench(
+        repos_factory.create_application_repository(),
+        repos_factory.create_dialogue_repository(),
+        entity_bucket.get_bot(project=project, bot=bot),
+        corpus,
+        concurrency=assignment["concurrency"],
+        rate=assignment["rate"],
+        duration=assignment["duration"],
+        open_loop=assignment["open_loop"],
+        arrival=assignment["arrival"],
+        max_lag=assignment["max_lag"],
+        phase=assignment["phase"]
+    )
+
+
+@click.command()
+@click.option('--config', help='config file', type=str, required=True)
+@click.option('--server', help="server", type=str, required=True)
+@click.option('--coordinator', help="host:port of the coordinator",
+              type=str, required=True)
+def bench_worker(config, server, coordinator):
+    """bench --listen で待ち受けるコーディネータに接続して負荷をかける"""
+    print("Connecting to {}".format(coordinator), file=sys.stderr)
+    run_worker(
+        parse_address(coordinator), authkey_from_env(),
+        lambda assignment: _build_worker_bench(config, server, assignment)
+    )
+
+
+cmd.add_command(bench)
+cmd.add_command(bench_worker, name="bench-worker")
+
+
+# 模擬サーバ #
+@click.command()
+@click.option('--host', help="host to listen on", type=str,
+              default="127.0.0.1")
+@click.option('--port', help="port to listen on", type=int, default=18080)
+@click.option('--project', help="project name (repeatable)", type=str,
+              multiple=True, required=True)
+@click.option('--user', help="account name. accept any if omitted",
+              type=str, default=None)
+@click.option('--password', help="password of the account", type=str,
+              default="")
+@click.option('--latency', help="response delay in seconds, "
+              "SECONDS or OPERATION=SECONDS (repeatable)",
+              type=str, multiple=True)
+@click.option('--failure-rate', help="ratio of failed responses, "
+              "RATE or OPERATION=RATE (repeatable)",
+              type=str, multiple=True)
+@click.option('--failure-status', help="status code of failed responses",
+              type=int, default=503)
+@click.option('--compile-time', help="seconds until compile completes",
+              type=float, default=0)
+@click.option('--transfer-time', help="seconds until transfer completes",
+              type=float, default=0)
+@click.option('--no-sraix', help="emulate a server without sraix support",
+              is_flag=True)
+@click.option('--seed', help="random seed for failure injection",
+              type=int, default=None)
+def fake_server(host, port, project, user, password, latency, failure_rate,
+                failure_status, compile_time, transfer_time, no_sraix, seed):
+    """NLU のサーバを模擬するサーバを起動する"""
+    try:
+        latency_ = parse_operation_settings(latency)
+        failure_rate_ = parse_operation_settings(failure_rate)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    server_ = FakeServer(
+        host=host, port=port, projects=project,
+        users=None if user is None else {user: password},
+        latency=latency_, failure_rate=failure_rate_,
+        failure_status=failure_status,
+        compile_time=compile_time, transfer_time=transfer_time,
+        sraix=not no_sraix, seed=seed
+    )
+    print("Listening on {}:{}".format(server_.host, server_.port),
+          file=sys.stderr)
+    try:
+        server_.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_.stop()
+
+
+cmd.add_command(fake_server, name="fake-server")
+
+
 # AIML関連 #
 @click.group()
 def aiml():
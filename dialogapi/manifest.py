@@ -0,0 +1,164 @@
+"""前回デプロイに成功したリソースを記録し、差分デプロイを行うためのモジュール
+
+デプロイマニフェストはサーバ・プロジェクト・ボット毎に、
+ボット定義と各リソースファイルのハッシュ値を JSON ファイルに保存する。
+"""
+
+
+import hashlib
+import json
+import os
+from dialogapi.cache import cache_dir
+
+
+def file_hash(filename):
+    """ファイルの内容の SHA-256 ハッシュ値を返す"""
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def bot_hash(bot):
+    """ボット定義のハッシュ値を返す"""
+    dic = {
+        "id": bot.id_,
+        "scenario_project_id": bot.scenario_project_id,
+        "language": bot.language,
+        "description": bot.description,
+        "sraix": bot.sraix,
+    }
+    content = json.dumps(dic, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class DeployPlan:
+    """デプロイマニフェストと比較して、デプロイが必要なリソースを保持するクラス"""
+    def __init__(self, bot_changed, aimls, sets, maps, configs, properties,
+                 skipped, state):
+        """
+        Args:
+            bot_changed (bool): ボット定義が変更されている場合は True
+            aimls (List[AIML]): アップロードが必要な AIML
+            sets (List[Set]): アップロードが必要な Set
+            maps (List[Map]): アップロードが必要な Map
+            configs (List[Config]): アップロードが必要な Config
+            properties (List[Property]): アップロードが必要な Property
+            skipped (List[str]): 変更がないためアップロードしないファイル名
+            state (Dict[str][object]): デプロイ成功時にマニフェストへ保存する内容
+        """
+        self.bot_changed = bot_changed
+        self.aimls = aimls
+        self.sets = sets
+        self.maps = maps
+        self.configs = configs
+        self.properties = properties
+        self.skipped = skipped
+        self.state = state
+
+    @property
+    def up_to_date(self):
+        """変更が一つもない場合は True を返す"""
+        return not (self.bot_changed or self.aimls or self.sets or
+                    self.maps or self.configs or self.properties)
+
+
+class DeployManifest:
+    """一つのボットのデプロイマニフェストを管理するクラス"""
+    def __init__(self, filename):
+        """
+        Args:
+            filename (str): マニフェストファイル名
+        """
+        self._filename = filename
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def plan(self, bot, aimls, sets, maps, configs, properties):
+        """前回のデプロイから変更されたリソースを求める
+
+        Returns:
+            DeployPlan: デプロイが必要なリソース
+        """
+        previous = self._load()
+        previous_resources = previous.get("resources", {})
+        resources = dict()
+        changed = dict()
+        skipped = []
+        kinds = [("aiml", aimls), ("set", sets), ("map", maps),
+                 ("config", configs), ("property", properties)]
+        for kind, items in kinds:
+            changed[kind] = []
+            for item in items:
+                key = "{}:{}".format(kind, item.filename)
+                resources[key] = file_hash(item.filename)
+                if previous_resources.get(key) == resources[key]:
+                    skipped.append(item.filename)
+                else:
+                    changed[kind].append(item)
+
+        state = {"bot": bot_hash(bot), "resources": resources}
+        return DeployPlan(
+            bot_changed=previous.get("bot") != state["bot"],
+            aimls=changed["aiml"],
+            sets=changed["set"],
+            maps=changed["map"],
+            configs=changed["config"],
+            properties=changed["property"],
+            skipped=skipped,
+            state=state
+        )
+
+    def save(self, plan):
+        """デプロイに成功した内容をマニフェストに保存する"""
+        os.makedirs(os.path.dirname(os.path.abspath(self._filename)),
+                    exist_ok=True)
+        with open(self._filename, "w", encoding="utf-8") as f:
+            json.dump(plan.state, f, indent=2, sort_keys=True)
+
+    def remove(self):
+        """マニフェストを削除する。次回のデプロイでは全てのリソースをアップロードする"""
+        try:
+            os.remove(self._filename)
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        try:
+            with open(self._filename, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+class ManifestStore:
+    """サーバ・プロジェクト・ボット毎のデプロイマニフェストを生成するクラス"""
+    def __init__(self, server, directory=None):
+        """
+        Args:
+            server (Server): デプロイ先のサーバ
+            directory (str): マニフェストを保存するディレクトリ。
+                None の場合はキャッシュディレクトリ以下の manifests を使う
+        """
+        self._server = server
+        self._directory = directory or os.path.join(cache_dir(), "manifests")
+
+    def get(self, project, bot):
+        """
+        Args:
+            project (Project): プロジェクト
+            bot (Bot): ボット
+
+        Returns:
+            DeployManifest: デプロイマニフェスト
+        """
+        key = "{} {} {}".format(
+            self._server.management_endpoint.url(), project.name, bot.id_
+        )
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return DeployManifest(
+            os.path.join(self._directory, "{}.json".format(name))
+        )
@@ -0,0 +1,293 @@
+"""複数のボットのデプロイをパイプライン化して実行するモジュール
+
+あるボットがサーバ上でコンパイルされている間に、別のボットのアップロードを進める。
+コンパイル・転送状態のポーリングは全てのボットで一つのループを共有する。
+"""
+
+
+import asyncio
+import contextvars
+import sys
+from dialogapi import profile
+from dialogapi.command import report_plan
+from dialogapi.poller import PollingTimeoutException
+from dialogapi.poller import build_backoff
+from dialogapi.poller import check_status
+
+
+class DeployException(Exception):
+    """パイプラインデプロイで失敗したボットがある場合に送出される例外"""
+
+
+class _PollEntry:
+    def __init__(self, get_status, name, backoff, deadline, future, context):
+        self.get_status = get_status
+        self.name = name
+        self.backoff = backoff
+        self.deadline = deadline
+        self.future = future
+        self.context = context
+        self.next_time = 0
+
+
+class StatusPoller:
+    """複数の状態確認を一つのループでまとめてポーリングするクラス
+
+    ポーリング間隔と期限は状態確認毎に poller.wait_status と同じ規則で管理する。
+    """
+    def __init__(self, deploy_config):
+        """
+        Args:
+            deploy_config (DeployConfig): ポーリング間隔と期限の設定
+        """
+        self._deploy_config = deploy_config
+        self._pending = []
+        self._task = None
+        self._wakeup = None
+
+    async def wait(self, get_status, name):
+        """状態が完了するまで待機する
+
+        Args:
+            get_status (Callable[[], Awaitable[ScenarioStatus]]):
+                状態を取得するコルーチン関数
+            name (str): エラーメッセージに表示する名前
+
+        Raises:
+            ScenarioFailedException: サーバが失敗を返した場合
+            PollingTimeoutException: 期限内に完了しなかった場合
+        """
+        loop = asyncio.get_event_loop()
+        entry = _PollEntry(
+            get_status=get_status,
+            name=name,
+            backoff=build_backoff(self._deploy_config),
+            deadline=loop.time() + self._deploy_config.poll_timeout,
+            future=loop.create_future(),
+            context=contextvars.copy_context()
+        )
+        self._pending.append(entry)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        else:
+            self._wakeup.set()
+        return await entry.future
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            due = [
+                entry for entry in self._pending
+                if entry.next_time <= loop.time()
+            ]
+            # 状態確認は wait を呼び出したタスクのコンテキストで実行する
+            results = await asyncio.gather(
+                *[
+                    entry.context.run(
+                        asyncio.ensure_future, entry.get_status()
+                    )
+                    for entry in due
+                ],
+                return_exceptions=True
+            )
+            for entry, res in zip(due, results):
+                self._update(entry, res, loop.time())
+            self._pending = [
+                entry for entry in self._pending if not entry.future.done()
+            ]
+            if not self._pending:
+                break
+
+            # 次に期限が来る状態確認か、新しい状態確認の追加まで待機する
+            delay = min(entry.next_time for entry in self._pending)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), max(delay - loop.time(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def _update(self, entry, res, now):
+        try:
+            if isinstance(res, Exception):
+                raise res
+            if check_status(res, entry.name):
+                entry.future.set_result(True)
+                return
+            interval = entry.backoff.next()
+            if now >= entry.deadline:
+                raise PollingTimeoutException(
+                    "{} did not complete in {} seconds".format(
+                        entry.name, self._deploy_config.poll_timeout
+                    )
+                )
+            # 期限を過ぎる場合は期限に最後のポーリングを行う
+            entry.next_time = min(now + interval, entry.deadline)
+        except Exception as exc:
+            entry.future.set_exception(exc)
+
+
+class DeployTarget:
+    """パイプラインでデプロイするボットとそのリソースを保持するクラス"""
+    def __init__(
+        self, bot_repository, aiml_repository, set_repository,
+        map_repository, config_repository, property_repository,
+        bot, aimls, sets, maps, configs, properties, manifest=None,
+        incremental=False
+    ):
+        """
+        各リポジトリは async_repository の asyncio 版リポジトリを指定する。
+        manifest と incremental は command.bot_setup と同様に扱う
+        """
+        self.bot_repository = bot_repository
+        self.aiml_repository = aiml_repository
+        self.set_repository = set_repository
+        self.map_repository = map_repository
+        self.config_repository = config_repository
+        self.property_repository = property_repository
+        self.bot = bot
+        self.aimls = aimls
+        self.sets = sets
+        self.maps = maps
+        self.configs = configs
+        self.properties = properties
+        self.manifest = manifest
+        self.incremental = incremental
+
+
+class PipelinedDeployer:
+    """複数のボットを並行してデプロイするクラス"""
+    def __init__(self, deploy_config):
+        """
+        Args:
+            deploy_config (DeployConfig): 同時にコンパイルするボット数の上限と
+                コンパイル・転送状態のポーリングの設定
+        """
+        self._deploy_config = deploy_config
+
+    def deploy(self, targets):
+        """全てのボットをデプロイする
+
+        Args:
+            targets (List[DeployTarget]): デプロイするボット
+
+        Raises:
+            DeployException: デプロイに失敗したボットがある場合
+        """
+        asyncio.run(self.deploy_async(targets))
+
+    async def deploy_async(self, targets):
+        """deploy のコルーチン版。リポジトリを使うイベントループ上で呼び出す"""
+        results = await self._deploy_all(targets)
+        failed = [
+            (target.bot.id_, res)
+            for target, res in zip(targets, results)
+            if isinstance(res, Exception)
+        ]
+        if failed:
+            raise DeployException(
+                "Setup failed: " + ", ".join(
+                    "{} ({})".format(bot_id, exc) for bot_id, exc in failed
+                )
+            )
+
+    async def _deploy_all(self, targets):
+        # Semaphore と StatusPoller はイベントループ内で生成する
+        self._compile_semaphore = asyncio.Semaphore(
+            self._deploy_config.max_concurrent_compiles
+        )
+        self._poller = StatusPoller(deploy_config=self._deploy_config)
+        return await asyncio.gather(
+            *[self._deploy(target) for target in targets],
+            return_exceptions=True
+        )
+
+    async def _deploy(self, target):
+        bot = target.bot
+        plan = None
+        changed = target
+        bot_changed = True
+        if target.manifest:
+            plan = target.manifest.plan(
+                bot, target.aimls, target.sets, target.maps,
+                target.configs, target.properties
+            )
+        if target.manifest and target.incremental:
+            report_plan(bot, plan)
+            if plan.up_to_date:
+                return
+            changed = plan
+            bot_changed = plan.bot_changed
+        if target.manifest:
+            # 途中で失敗した場合に古いマニフェストが残らないよう、先に削除する
+            target.manifest.remove()
+
+        with profile.span("setup", bot=bot.id_):
+            await self._setup(target, changed, bot_changed)
+
+        if target.manifest:
+            target.manifest.save(plan)
+
+    async def _setup(self, target, changed, bot_changed):
+        bot = target.bot
+        if bot_changed:
+            with profile.span("bot upsert"):
+                await self._bot_upsert(target)
+        uploads = [
+            ("AIML", target.aiml_repository, "aiml", changed.aimls),
+            ("Set", target.set_repository, "set", changed.sets),
+            ("Map", target.map_repository, "map", changed.maps),
+            ("Config", target.config_repository, "config", changed.configs),
+            ("Property", target.property_repository, "property",
+             changed.properties),
+        ]
+        for label, repository, arg, items in uploads:
+            for item in items:
+                with profile.span(
+                    "upload {}".format(arg), filename=item.filename
+                ):
+                    await repository.upsert(**{arg: item})
+                _log("Uploading {} {} ... done".format(label, item.filename))
+
+        bot_repository = target.bot_repository
+        with profile.span("compile queue"):
+            await self._compile_semaphore.acquire()
+        try:
+            with profile.span("compile request"):
+                await bot_repository.compile(bot=bot)
+            with profile.span("compile wait"):
+                await self._poller.wait(
+                    lambda: bot_repository.compile_state(bot=bot),
+                    "Compiling bot {}".format(bot.id_)
+                )
+        finally:
+            self._compile_semaphore.release()
+        _log("Compiling bot {} ... done".format(bot.id_))
+
+        with profile.span("transfer request"):
+            await bot_repository.transfer(bot=bot)
+        with profile.span("transfer wait"):
+            await self._poller.wait(
+                lambda: bot_repository.transfer_state(bot=bot),
+                "Transfering bot {}".format(bot.id_)
+            )
+        _log("Transfering: bot {} ... done".format(bot.id_))
+
+    async def _bot_upsert(self, target):
+        bot = target.bot
+        if await target.bot_repository.exists(bot=bot):
+            await target.bot_repository.update(bot=bot)
+            _log("Updating bot {} ... done".format(bot.id_))
+            return
+        try:
+            await target.bot_repository.add(bot=bot)
+            _log("Adding bot {} ... done".format(bot.id_))
+        except Exception:
+            await target.bot_repository.update(bot=bot)
+            _log("Updating bot {} ... done".format(bot.id_))
+
+
+def _log(text):
+    print(text, file=sys.stderr)
@@ -0,0 +1,104 @@
+"""コンパイル・転送状態をポーリングするモジュール
+
+ポーリング間隔は短い間隔から始めて、ジッタを加えながら徐々に長くする。
+期限を過ぎた場合やサーバが失敗を返した場合は例外を送出する。
+"""
+
+
+import random
+import time
+
+
+class PollingTimeoutException(Exception):
+    """ポーリングが期限内に完了しなかった場合に送出される例外"""
+
+
+class ScenarioFailedException(Exception):
+    """サーバがコンパイル・転送の失敗を返した場合に送出される例外"""
+
+
+class Backoff:
+    """ポーリング間隔を計算するクラス"""
+    def __init__(self, initial_interval, max_interval,
+                 multiplier=1.5, jitter=0.2):
+        """
+        Args:
+            initial_interval (float): 最初のポーリング間隔 (秒)
+            max_interval (float): ポーリング間隔の上限 (秒)
+            multiplier (float): ポーリング毎に間隔を何倍にするか
+            jitter (float): 間隔に加えるゆらぎの割合
+        """
+        self._interval = initial_interval
+        self._max_interval = max_interval
+        self._multiplier = multiplier
+        self._jitter = jitter
+
+    def next(self):
+        """次のポーリングまでの待機時間 (秒) を返す
+
+        ゆらぎを加えた後も上限を超えない。
+        """
+        interval = self._interval
+        self._interval = min(
+            self._interval * self._multiplier, self._max_interval
+        )
+        return min(
+            interval * random.uniform(1 - self._jitter, 1 + self._jitter),
+            self._max_interval
+        )
+
+
+def build_backoff(deploy_config):
+    """DeployConfig から Backoff を生成する"""
+    return Backoff(
+        initial_interval=deploy_config.poll_initial_interval,
+        max_interval=deploy_config.poll_max_interval
+    )
+
+
+def check_status(status, name):
+    """ScenarioStatus が失敗を表す場合に例外を送出する
+
+    Args:
+        status (ScenarioStatus): 状態
+        name (str): エラーメッセージに表示する名前
+
+    Returns:
+        bool: 完了している場合は True を返す
+    """
+    if status.failed:
+        raise ScenarioFailedException(
+            "{} failed: {}".format(name, status.message)
+        )
+    return status.completed
+
+
+def wait_status(get_status, name, deploy_config, on_tick=None):
+    """状態が完了するまでポーリングする
+
+    次のポーリングが期限を過ぎる場合は期限まで待機し、最後に一度ポーリングする。
+
+    Args:
+        get_status (Callable[[], ScenarioStatus]): 状態を取得する関数
+        name (str): エラーメッセージに表示する名前
+        deploy_config (DeployConfig): ポーリング間隔と期限の設定
+        on_tick (Callable[[], None]): 完了していない場合に毎回呼び出す関数
+
+    Raises:
+        ScenarioFailedException: サーバが失敗を返した場合
+        PollingTimeoutException: 期限内に完了しなかった場合
+    """
+    backoff = build_backoff(deploy_config)
+    deadline = time.monotonic() + deploy_config.poll_timeout
+    while not check_status(get_status(), name):
+        if on_tick:
+            on_tick()
+        interval = backoff.next()
+        now = time.monotonic()
+        if now >= deadline:
+            raise PollingTimeoutException(
+                "{} did not complete in {} seconds".format(
+                    name, deploy_config.poll_timeout
+                )
+            )
+        time.sleep(min(interval, deadline - now))
@@ -0,0 +1,223 @@
+"""デプロイやテストの各フェーズと HTTP リクエストの所要時間を記録するモジュール
+
+Profiler を activate している間、span で囲んだフェーズと、
+フックを登録したトランスポートが送信した HTTP リクエストを記録する。
+HTTP リクエストは送信時のボットとフェーズに紐づける。
+ボットとフェーズはコンテキスト変数で保持するため、
+Executor で実行する処理には contextvars.copy_context で引き継ぐこと。
+
+記録はボット・フェーズ毎の集計と、Chrome のトレースイベント形式の JSON で出力する。
+"""
+
+
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections import namedtuple
+from urllib.parse import urlparse
+from dialogapi.transport import TransportHook
+
+
+# category は phase か http
+Span = namedtuple(
+    "Span", ["name", "category", "bot", "phase", "start", "end", "thread",
+             "args"]
+)
+
+# 現在のボットとフェーズ
+_Scope = namedtuple("_Scope", ["bot", "phase"])
+
+_scope = contextvars.ContextVar("profile_scope", default=_Scope(None, None))
+
+# 記録中の Profiler
+_active = None
+
+
+def span(name, bot=None, **args):
+    """フェーズを記録するコンテキストマネージャを返す
+
+    記録中の Profiler がない場合は何もしない。
+
+    Args:
+        name (str): フェーズ名
+        bot (str): ボットID。None の場合は外側のフェーズのボットを引き継ぐ
+        args: トレースに記録する値
+    """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.span(name, bot=bot, **args)
+
+
+class Profiler:
+    """フェーズと HTTP リクエストの記録を保持するクラス"""
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+        self._origin = time.monotonic()
+
+    @property
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """With ブロックの間、このインスタンスに記録する"""
+        global _active
+        previous = _active
+        _active = self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    @contextlib.contextmanager
+    def span(self, name, bot=None, **args):
+        """フェーズを記録するコンテキストマネージャ。引数は span 関数を参照"""
+        scope = _scope.get()
+        bot = scope.bot if bot is None else bot
+        token = _scope.set(_Scope(bot, name))
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+            self._record(Span(
+                name=name, category="phase", bot=bot, phase=scope.phase,
+                start=start, end=time.monotonic(),
+                thread=threading.get_ident(), args=args
+            ))
+
+    def hook(self):
+        """HTTP リクエストを記録するトランスポートのフックを返す"""
+        return _ProfileHook(self)
+
+    def report(self, out=None):
+        """ボット・フェーズ毎の回数と所要時間を表示する
+
+        フェーズの時間は内側のフェーズと HTTP リクエストの時間を含む。
+        HTTP の列はそのフェーズの直下で送信したリクエストの回数と時間を表す。
+
+        Args:
+            out (file): 出力先。None の場合は標準エラー出力に出力する
+        """
+        out = out or sys.stderr
+        rows = OrderedDict()
+        phases = OrderedDict()
+        for span_ in sorted(self.spans, key=lambda span_: span_.start):
+            if span_.category == "phase":
+                key = (span_.bot, span_.name)
+                totals = [phases.setdefault(span_.name, [0, 0, 0, 0])]
+            else:
+                key = (span_.bot, span_.phase)
+                totals = []
+                if span_.phase is not None:
+                    totals.append(phases.setdefault(span_.phase, [0, 0, 0, 0]))
+            totals.append(rows.setdefault(key, [0, 0, 0, 0]))
+            duration = span_.end - span_.start
+            for total in totals:
+                if span_.category == "phase":
+                    total[0] += 1
+                    total[1] += duration
+                else:
+                    total[2] += 1
+                    total[3] += duration
+
+        header = "{:<32} {:<20} {:>6} {:>11} {:>6} {:>11}".format(
+            "bot", "phase", "count", "total(ms)", "http", "http(ms)"
+        )
+        print("Profile by bot and phase", file=out)
+        print(header, file=out)
+        for (bot, phase), total in rows.items():
+            _print_row(out, bot, phase, total)
+        print("Profile by phase", file=out)
+        print(header, file=out)
+        for phase, total in phases.items():
+            _print_row(out, "(all)", phase, total)
+
+    def chrome_trace(self):
+        """Chrome のトレースイベント形式の辞書を返す
+
+        フェーズはボット毎、HTTP リクエストはスレッド毎の行に表示する。
+        """
+        pid = os.getpid()
+        tids = dict()
+        events = []
+
+        def tid(key, name):
+            if key not in tids:
+                tids[key] = len(tids) + 1
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": pid,
+                    "tid": tids[key], "args": {"name": name},
+                })
+            return tids[key]
+
+        for span_ in sorted(self.spans, key=lambda span_: span_.start):
+            if span_.category == "phase":
+                row = tid(("bot", span_.bot), "bot {}".format(
+                    span_.bot or "-"
+                ))
+            else:
+                row = tid(("thread", span_.thread), "http {}".format(
+                    span_.thread
+                ))
+            args = dict(span_.args)
+            args.update(bot=span_.bot, phase=span_.phase)
+            events.append({
+                "name": span_.name,
+                "cat": span_.category,
+                "ph": "X",
+                "ts": (span_.start - self._origin) * 1e6,
+                "dur": (span_.end - span_.start) * 1e6,
+                "pid": pid,
+                "tid": row,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, filename):
+        """Chrome のトレースイベント形式でファイルに保存する"""
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def _record(self, span_):
+        with self._lock:
+            self._spans.append(span_)
+
+
+class _ProfileHook(TransportHook):
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def after_response(self, request, response):
+        end = time.monotonic()
+        scope = _scope.get()
+        args = {
+            "url": request.url,
+            "status": response.status_code,
+            "payload_size": request.payload_size,
+            "size": response.size,
+        }
+        args.update(response.timings._asdict())
+        if response.error is not None:
+            args["error"] = type(response.error).__name__
+        self._profiler._record(Span(
+            name="{} {}".format(request.method, urlparse(request.url).path),
+            category="http", bot=scope.bot, phase=scope.phase,
+            start=end - response.timings.total, end=end,
+            thread=threading.get_ident(), args=args
+        ))
+
+
+def _print_row(out, bot, phase, total):
+    count, duration, http_count, http_duration = total
+    print("{:<32} {:<20} {:>6} {:>11.1f} {:>6} {:>11.1f}".format(
+        bot or "-", phase or "-", count, duration * 1000,
+        http_count, http_duration * 1000
+    ), file=out)
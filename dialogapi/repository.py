@@ -6,6 +6,8 @@
 """
 
 
+import threading
+from collections import namedtuple
 from dialogapi.entity import Project
 from dialogapi.entity import Bot
 from dialogapi.entity import Application
@@ -22,6 +24,32 @@ def authorizer_header(user):
     return headers
 
 
+def authorized_request(endpoint, user, method, url, **kwargs):
+    """アクセストークンを付与して Management API にリクエストを送信する
+
+    ステータスコード 401 が返った場合は一度だけ再ログインして再送する。
+
+    Args:
+        endpoint (Endpoint): エンドポイント
+        user (User): 認証済みのユーザ
+        method (str): get, post, put, delete のいずれか
+        url (str): URL
+        kwargs: requests に渡す引数
+
+    Returns:
+        requests.Response: レスポンス
+    """
+    access_token = user.access_token
+    send = getattr(endpoint.transport, method)
+    res = send(url, headers=authorizer_header(user), **kwargs)
+    if res.status_code == 401 and user.reauthorize(access_token):
+        # アップロードするファイルは先頭から送り直す
+        for f in kwargs.get("files", {}).values():
+            f.seek(0)
+        res = send(url, headers=authorizer_header(user), **kwargs)
+    return res
+
+
 def assert_status_code(expected_code, actual_code):
     """status code が期待した値と一致しない場合に例外を送出する関数"""
     if expected_code != actual_code:
@@ -32,6 +60,93 @@ def assert_status_code(expected_code, actual_code):
         raise exc
 
 
+def _raise_status_code(status_code):
+    """ステータスコードを設定した StatusCodeException を送出する"""
+    exc = StatusCodeException("Status code {}".format(status_code))
+    exc.set_status_code(status_code)
+    raise exc
+
+
+def _upload_status_code(res):
+    """ファイルのアップロードのレスポンスを確認し、ステータスコードを返す
+
+    201 以外の場合はレスポンスの JSON を表示して例外を送出する。
+    """
+    if res.status_code != 201:
+        try:
+            print(res.json())
+        except Exception:
+            pass
+        _raise_status_code(res.status_code)
+    return res.status_code
+
+
+def _warn_sraix_unsupported(capabilities, bot):
+    """sraix に対応しないサーバで、ボットの sraix を反映しないことを一度だけ警告する"""
+    if bot.sraix != "null" and capabilities.warn_once("sraix"):
+        print(
+            " Your platform does not support sraix option."
+            " Setup bots without sraix option."
+            " Set capabilities.sraix in the project file"
+            " if your platform has been updated."
+        )
+
+
+def _warn_sraix_rejected(capabilities):
+    """sraix を指定して 400 が返ったことを一度だけ警告する"""
+    if capabilities is None or capabilities.warn_once("sraix"):
+        print(
+            " Your platform seems to be NLU v2.5."
+            "Continue to setup bots without sraix option."
+        )
+
+
+def _bot_data(bot, ignore_sraix, add):
+    """ボットの追加・更新で送信するデータを返す
+
+    Args:
+        add (bool): True の場合は追加、False の場合は更新のデータを返す
+    """
+    data = {"language": bot.language, "description": bot.description}
+    if add:
+        data["botId"] = bot.id_
+        data["scenarioProjectId"] = bot.scenario_project_id
+    if not ignore_sraix:
+        data["sraix"] = bot.sraix
+    return data
+
+
+def _bots(res, project, capabilities):
+    """ボット一覧のレスポンスから Bot のリストを生成する"""
+    bots = res.json()["bots"]
+    if not bots:
+        bots = []
+    # sraix を含むボットがあれば対応していると判定する。
+    # 値によっては対応していても含まれない可能性があるため、
+    # 含まれないことからは判定しない
+    if capabilities and any("sraix" in item for item in bots):
+        capabilities.set_sraix(True)
+    return [Bot(id_=item["botId"],
+                project=project,
+                scenario_project_id=item["scenarioProjectId"],
+                language=item["language"],
+                description=item["description"],
+                sraix=item.get("sraix", "null"))
+            for item in bots]
+
+
+def _application(bot, res):
+    """アプリケーション登録のレスポンスから Application を生成する"""
+    res_json = res.json()
+    if "app_id" in res_json:
+        app_id_ = res_json["app_id"]
+    elif "appId" in res_json:
+        app_id_ = res_json["appId"]
+    else:
+        raise Exception("appId not found in response json")
+    return Application(bot=bot, app_id=app_id_)
+
+
 def _show_response(res):
     """デバッグ用関数"""
     print("request:")
@@ -68,7 +183,7 @@ class UserRepository:
 
         # ログイン
         data = {"accountName": user.name, "password": user.password}
-        res = self._endpoint.requests.post(
+        res = self._endpoint.transport.post(
             endpoint,
             json=data,
             headers=self._endpoint.header,
@@ -97,9 +212,8 @@ class ProjectRepository:
             List[project.Project]: サーバが管理するプロジェクト管理オブジェクトのリスト
         """
         endpoint = self._endpoint.url("projects")
-        res = self._endpoint.requests.get(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "get", endpoint
         )
         assert_status_code(200, res.status_code)
         projects = [Project(name=item["projectName"],
@@ -118,38 +232,32 @@ class ProjectRepository:
 
 
 class BotRepository:
-    def __init__(self, endpoint, user, project):
+    def __init__(self, endpoint, user, project, capabilities=None):
         """
         Args:
             endpoint (str):
             user (User):
             project (Project):
+            capabilities (Capabilities): サーバが対応する機能。
+                指定した場合はボットの追加・更新時に参照・記録する
         """
         self._endpoint = endpoint
         self._user = user
         self._project = project
+        self._capabilities = capabilities
+        # サーバに存在するボットIDの集合。exists の初回呼び出し時に取得する
+        self._bot_ids = None
+        self._bot_ids_lock = threading.Lock()
 
     def get_all(self):
         endpoint = self._endpoint.url(
             "projects/{}/bots".format(self._project.id_)
         )
-        res = self._endpoint.requests.get(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "get", endpoint
         )
         assert_status_code(200, res.status_code)
-
-        bots = res.json()["bots"]
-        if not bots:
-            bots = []
-        bots_ = [Bot(id_=item["botId"],
-                     project=self,
-                     scenario_project_id=item["scenarioProjectId"],
-                     language=item["language"],
-                     description=item["description"],
-                     sraix=item["sraix"])
-                 for item in bots]
-        return bots_
+        return _bots(res, self, self._capabilities)
 
     def get(self, bot):
         bots = self.get_all()
@@ -158,38 +266,108 @@ class BotRepository:
                 return bot_
         raise Exception("Bot {} not found".format(bot.id_))
 
-    def add(self, bot, ignore_sraix=False):
+    def exists(self, bot):
+        """ボットがサーバに存在するかを返す
+
+        ボット一覧は初回のみサーバから取得し、以降は add, remove の結果で更新する。
+
+        Args:
+            bot (dialogapi.bot.Bot): ボット
+
+        Returns:
+            bool: 存在する場合は True
+        """
+        with self._bot_ids_lock:
+            if self._bot_ids is None:
+                self._bot_ids = {bot_.id_ for bot_ in self.get_all()}
+            return bot.id_ in self._bot_ids
+
+    def _set_exists(self, bot, exists):
+        with self._bot_ids_lock:
+            if self._bot_ids is None:
+                return
+            if exists:
+                self._bot_ids.add(bot.id_)
+            else:
+                self._bot_ids.discard(bot.id_)
+
+    def add(self, bot, ignore_sraix=None):
+        """ボットを追加する
+
+        Args:
+            bot (dialogapi.bot.Bot): 追加するボット
+            ignore_sraix: (bool) True の場合、sraixの設定を反映しない。
+                None の場合はサーバが sraix に対応しているかどうかで決める。
+
+        Returns:
+            None
+        """
+        self._send_with_sraix(self._add, bot, ignore_sraix)
+        self._set_exists(bot, True)
+
+    def _send_with_sraix(self, send, bot, ignore_sraix):
+        """sraix を指定するか決めて、ボットの追加・更新を送信する
+
+        Management API にはバージョンを問い合わせる API がないため、
+        sraix への対応は最初のボットの追加・更新で判定する。
+        判定するまでは送信を一つずつ行い、sraix を指定して 400 が返った場合は
+        sraix を指定せずに再送して、その結果を記録する。
+        判定後は、対応していなければ sraix を指定せずに直接送信し、
+        ボットの sraix が反映されない場合は実行毎に一度だけ警告する。
+        対応しているとキャッシュしていた場合は、400 の再送で訂正する。
+        ignore_sraix を指定した場合と、プロジェクト構成ファイルで
+        sraix への対応を指定した場合はそのとおりに送信する。
+
+        Args:
+            send (Callable): bot, ignore_sraix を受け取り送信する関数
+            bot (dialogapi.bot.Bot): ボット
+            ignore_sraix (bool): add を参照
+        """
+        capabilities = self._capabilities
+        if ignore_sraix is not None:
+            send(bot=bot, ignore_sraix=ignore_sraix)
+            return
+        if capabilities is None:
+            self._send_detecting_sraix(send, bot)
+            return
+        if capabilities.sraix is None:
+            with capabilities.detecting():
+                if capabilities.sraix is None:
+                    self._send_detecting_sraix(send, bot)
+                    return
+
+        if capabilities.sraix is False:
+            _warn_sraix_unsupported(capabilities, bot)
+            send(bot=bot, ignore_sraix=True)
+        elif capabilities.configured:
+            send(bot=bot, ignore_sraix=False)
+        else:
+            self._send_detecting_sraix(send, bot)
+
+    def _send_detecting_sraix(self, send, bot):
+        capabilities = self._capabilities
         try:
-            self._add(bot=bot, ignore_sraix=False)
+            send(bot=bot, ignore_sraix=False)
         except StatusCodeException as e:
-            if e.status_code == 400:
-                # v2.5を使っている場合はsraixを指定すると400のエラーが返る
-                # # その場合に対応した処理
-                print(
-                    " Your platform seems to be NLU v2.5."
-                    "Continue to setup bots without sraix option."
-                )
-                self._add(bot=bot, ignore_sraix=True)
-            else:
+            if e.status_code != 400:
                 raise
+            # v2.5を使っている場合はsraixを指定すると400のエラーが返る
+            # # その場合に対応した処理
+            _warn_sraix_rejected(capabilities)
+            send(bot=bot, ignore_sraix=True)
+            if capabilities:
+                capabilities.set_sraix(False)
+        else:
+            if capabilities:
+                capabilities.set_sraix(True)
 
     def _add(self, bot, ignore_sraix=False):
         endpoint = self._endpoint.url(
             "projects/{}/bots".format(self._project.id_)
         )
-        data = {"botId": bot.id_,
-                "scenarioProjectId": bot.scenario_project_id,
-                "language": bot.language,
-                "description": bot.description
-                }
-
-        if not ignore_sraix:
-            data["sraix"] = bot.sraix
-
-        res = self._endpoint.requests.post(
-            endpoint,
-            headers=authorizer_header(self._user),
-            json=data
+        res = authorized_request(
+            self._endpoint, self._user, "post", endpoint,
+            json=_bot_data(bot, ignore_sraix, add=True)
         )
         assert_status_code(201, res.status_code)
 
@@ -197,34 +375,33 @@ class BotRepository:
         endpoint = self._endpoint.url(
             "projects/{}/bots/{}".format(self._project.id_, bot.id_)
         )
-        res = self._endpoint.requests.delete(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "delete", endpoint
         )
         assert_status_code(204, res.status_code)
+        self._set_exists(bot, False)
 
-    def update(self, bot, ignore_sraix=False):
+    def update(self, bot, ignore_sraix=None):
         """ボットの情報を更新する
 
         Args:
             bot (dialogapi.bot.Bot): 更新するボット
             ignore_sraix: (bool) True の場合、sraixの設定を反映しない。
-                注意: NLU v2.5 の場合、sraixパラメータを付与するとエラーが発生するため、Falseに設定すること。
+                注意: NLU v2.5 の場合、sraixパラメータを付与するとエラーが発生するため、Trueに設定すること。
+                None の場合はサーバが sraix に対応しているかどうかで決める。
 
         Returns:
             None
         """
+        self._send_with_sraix(self._update, bot, ignore_sraix)
+
+    def _update(self, bot, ignore_sraix=False):
         endpoint = self._endpoint.url(
             "projects/{}/bots/{}".format(self._project.id_, bot.id_)
         )
-        data = {"language": bot.language, "description": bot.description}
-        if not ignore_sraix:
-            data["sraix"] = bot.sraix
-
-        res = self._endpoint.requests.put(
-            endpoint,
-            headers=authorizer_header(self._user),
-            json=data
+        res = authorized_request(
+            self._endpoint, self._user, "put", endpoint,
+            json=_bot_data(bot, ignore_sraix, add=False)
         )
         assert_status_code(204, res.status_code)
 
@@ -241,9 +418,8 @@ class BotRepository:
                 self._project.id_, bot.id_
             )
         )
-        res = self._endpoint.requests.post(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "post", endpoint
         )
         assert_status_code(202, res.status_code)
         return res.json()
@@ -256,18 +432,26 @@ class BotRepository:
         Returns:
             bool: コンパイルが完了している場合は True を返す。
         """
+        return self.compile_state(bot=bot).completed
+
+    def compile_state(self, bot):
+        """ボットのコンパイル状態を、失敗したかどうかとサーバのメッセージと共に取得する
+
+        Args:
+
+        Returns:
+            ScenarioStatus: コンパイル状態
+        """
         endpoint = self._endpoint.url(
             "projects/{}/bots/{}/scenarios/compile/status".format(
                 self._project.id_, bot.id_
             )
         )
-        res = self._endpoint.requests.get(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "get", endpoint
         )
         assert_status_code(200, res.status_code)
-        completed = res.json()["status"] == "Completed"
-        return completed
+        return _scenario_status([res.json()])
 
     def transfer(self, bot):
         """ボットを転送する
@@ -282,9 +466,8 @@ class BotRepository:
                 self._project.id_, bot.id_
             )
         )
-        res = self._endpoint.requests.post(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "post", endpoint
         )
         assert_status_code(202, res.status_code)
         return res.json()
@@ -295,23 +478,59 @@ class BotRepository:
         Args:
 
         Returns:
-            Dict[str][object]: HTTPレスポンスのJSONに対応する辞書オブジェクト
+            bool: 転送が完了している場合は True を返す。
+        """
+        return self.transfer_state(bot=bot).completed
+
+    def transfer_state(self, bot):
+        """ボットの転送状態を、失敗したかどうかとサーバのメッセージと共に取得する
+
+        Args:
+
+        Returns:
+            ScenarioStatus: 転送状態
         """
         endpoint = self._endpoint.url(
             "projects/{}/bots/{}/scenarios/transfer/status".format(
                 self._project.id_, bot.id_
             )
         )
-        res = self._endpoint.requests.get(
-            endpoint,
-            headers=authorizer_header(self._user)
+        res = authorized_request(
+            self._endpoint, self._user, "get", endpoint
         )
         assert_status_code(200, res.status_code)
-        completed = all(
-            item["status"] == "Completed"
-            for item in res.json()["transferStatusResponses"]
-        )
-        return completed
+        return _scenario_status(res.json()["transferStatusResponses"])
+
+
+ScenarioStatus = namedtuple(
+    "ScenarioStatus", ["completed", "failed", "message"]
+)
+
+
+def _scenario_status(items):
+    """コンパイル・転送状態のレスポンスから ScenarioStatus を生成する
+
+    全ての status が Completed の場合は完了、
+    いずれかの status が Error や Failed を含む場合は失敗とみなす。
+    """
+    completed = all(item["status"] == "Completed" for item in items)
+    failed_items = [
+        item for item in items
+        if "error" in item["status"].lower()
+        or "fail" in item["status"].lower()
+    ]
+    return ScenarioStatus(
+        completed=completed,
+        failed=bool(failed_items),
+        message="; ".join(_status_message(item) for item in failed_items)
+    )
+
+
+def _status_message(item):
+    message = item.get("message") or item.get("errorMessage")
+    if message:
+        return "{}: {}".format(item["status"], message)
+    return item["status"]
 
 
 class AIMLRepository:
@@ -332,19 +551,11 @@ class AIMLRepository:
 
         with open(aiml.filename, encoding="utf-8") as f:
             files = {"uploadFile": f}
-            res = self._endpoint.requests.put(
-                endpoint,
-                headers=authorizer_header(self._user),
+            res = authorized_request(
+                self._endpoint, self._user, "put", endpoint,
                 files=files
             )
-
-        if res.status_code != 201:
-            try:
-                print(res.json())
-            except Exception:
-                pass
-            raise Exception("Status code {}".format(res.status_code))
-        return res.status_code
+        return _upload_status_code(res)
 
 
 class SetRepository:
@@ -365,19 +576,11 @@ class SetRepository:
 
         with open(set.filename, encoding="utf-8") as f:
             files = {"uploadFile": f}
-            res = self._endpoint.requests.put(
-                endpoint,
-                headers=authorizer_header(self._user),
+            res = authorized_request(
+                self._endpoint, self._user, "put", endpoint,
                 files=files
             )
-
-        if res.status_code != 201:
-            try:
-                print(res.json())
-            except Exception:
-                pass
-            raise Exception("Status code {}".format(res.status_code))
-        return res.status_code
+        return _upload_status_code(res)
 
 
 class MapRepository:
@@ -398,19 +601,11 @@ class MapRepository:
 
         with open(map.filename, encoding="utf-8") as f:
             files = {"uploadFile": f}
-            res = self._endpoint.requests.put(
-                endpoint,
-                headers=authorizer_header(self._user),
+            res = authorized_request(
+                self._endpoint, self._user, "put", endpoint,
                 files=files
             )
-
-        if res.status_code != 201:
-            try:
-                print(res.json())
-            except Exception:
-                pass
-            raise Exception("Status code {}".format(res.status_code))
-        return res.status_code
+        return _upload_status_code(res)
 
 
 class PropertyRepository:
@@ -419,6 +614,32 @@ class PropertyRepository:
         self._user = user
         self._project = project
         self._bot = bot
+        # ボットプロパティが登録済みか。exists の初回呼び出し時に取得する
+        self._exists = None
+
+    def exists(self):
+        """ボットプロパティがサーバに登録済みかを返す
+
+        サーバへの問い合わせは初回のみ行う。
+
+        Returns:
+            bool: 登録済みの場合は True。判定できない場合は None
+        """
+        if self._exists is not None:
+            return self._exists
+        endpoint = self._endpoint.url(
+            "projects/{}/bots/{}/properties".format(
+                self._project.id_, self._bot.id_
+            )
+        )
+        res = authorized_request(
+            self._endpoint, self._user, "get", endpoint
+        )
+        if res.status_code == 200:
+            self._exists = True
+        elif res.status_code == 404:
+            self._exists = False
+        return self._exists
 
     def _add(self, property):
         endpoint = self._endpoint.url(
@@ -426,9 +647,8 @@ class PropertyRepository:
                 self._project.id_, self._bot.id_
             )
         )
-        res = self._endpoint.requests.post(
-            endpoint,
-            headers=authorizer_header(self._user),
+        res = authorized_request(
+            self._endpoint, self._user, "post", endpoint,
             json=property.dict()
         )
         assert_status_code(201, res.status_code)
@@ -439,14 +659,23 @@ class PropertyRepository:
                 self._project.id_, self._bot.id_
             )
         )
-        res = self._endpoint.requests.put(
-            endpoint,
-            headers=authorizer_header(self._user),
+        res = authorized_request(
+            self._endpoint, self._user, "put", endpoint,
             json=property.dict()
         )
         assert_status_code(204, res.status_code)
 
     def upsert(self, property):
+        if self.exists():
+            try:
+                self._update(property)
+            except StatusCodeException as e:
+                # 登録済みと判定した後に削除された場合は 404 がかえる
+                if e.status_code == 404:
+                    self._add(property)
+                else:
+                    raise
+        else:
             try:
                 self._add(property)
             except StatusCodeException as e:
@@ -455,6 +684,7 @@ class PropertyRepository:
                     self._update(property)
                 else:
                     raise
+        self._exists = True
 
 
 class ConfigRepository:
@@ -478,9 +708,8 @@ class ConfigRepository:
             )
         )
 
-        res = self._endpoint.requests.put(
-            endpoint,
-            headers=authorizer_header(self._user),
+        res = authorized_request(
+            self._endpoint, self._user, "put", endpoint,
             json=config.dict()
         )
         assert_status_code(201, res.status_code)
@@ -490,6 +719,10 @@ class ApplicationRepository:
     def __init__(self, endpoint):
         self._endpoint = endpoint
 
+    @property
+    def endpoint(self):
+        return self._endpoint
+
     def register(self, bot,
                  app_id=None, app_kind="dialogapi", notification="false"):
         endpoint = self._endpoint.url()
@@ -501,22 +734,13 @@ class ApplicationRepository:
         if app_id:
             data["app_id"] = app_id
 
-        res = self._endpoint.requests.post(
+        res = self._endpoint.transport.post(
             endpoint,
             headers=self._endpoint.header,
             json=data
         )
         assert_status_code(200, res.status_code)
-
-        res_json = res.json()
-        if "app_id" in res_json:
-            app_id_ = res_json["app_id"]
-        elif "appId" in res_json:
-            app_id_ = res_json["appId"]
-        else:
-            raise Exception("appId not found in response json")
-
-        return Application(bot=bot, app_id=app_id_)
+        return _application(bot, res)
 
 
 class DialogueRepository:
@@ -525,7 +749,7 @@ class DialogueRepository:
 
     def dialogue(self, request):
         endpoint = self._endpoint.url()
-        res = self._endpoint.requests.post(
+        res = self._endpoint.transport.post(
             endpoint,
             headers=self._endpoint.header,
             json=request.dict()
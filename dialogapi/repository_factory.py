@@ -1,3 +1,7 @@
+import functools
+import threading
+from dialogapi.auth import Authenticator
+from dialogapi.entity import Project
 from dialogapi.repository import ProjectRepository
 from dialogapi.repository import UserRepository
 from dialogapi.repository import BotRepository
@@ -8,6 +12,56 @@ from dialogapi.repository import SetRepository
 from dialogapi.repository import MapRepository
 from dialogapi.repository import ConfigRepository
 from dialogapi.repository import PropertyRepository
+from dialogapi.repository import StatusCodeException
+
+
+# キャッシュしたプロジェクトIDが古い場合に返るステータスコード
+_STALE_PROJECT_STATUS_CODES = (403, 404)
+
+
+class _ProjectScopedRepository:
+    """プロジェクトIDを使うリポジトリのプロキシ
+
+    ファイルキャッシュから読み込んだプロジェクトIDでリクエストして
+    403 または 404 が返った場合は、プロジェクトIDのキャッシュを破棄し、
+    サーバに問い合わせたプロジェクトIDでリポジトリを作り直して一度だけ再送する。
+    """
+    def __init__(self, factory, project, build):
+        """
+        Args:
+            factory (RepositoryFactory): プロジェクトIDを解決するファクトリ
+            project (Project): プロジェクト名を設定した Project
+            build (Callable[[Project], object]):
+                プロジェクトIDを設定した Project からリポジトリを作成する関数
+        """
+        self._factory = factory
+        self._project = project
+        self._build = build
+        self._resolved = factory.get_project(project=project)
+        self._repository = build(self._resolved)
+
+    def __getattr__(self, name):
+        attr = getattr(self._repository, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            resolved = self._resolved
+            try:
+                return getattr(self._repository, name)(*args, **kwargs)
+            except StatusCodeException as e:
+                if e.status_code not in _STALE_PROJECT_STATUS_CODES:
+                    raise
+                project_ = self._factory.refresh_project(
+                    self._project, resolved
+                )
+                if project_ is None:
+                    raise
+            self._resolved = project_
+            self._repository = self._build(project_)
+            return getattr(self._repository, name)(*args, **kwargs)
+        return call
 
 
 class RepositoryFactory:
@@ -15,9 +69,33 @@ class RepositoryFactory:
 
     Abstract factrory パターンにしたがって、RepositoryFactory を実装する
     """
-    def __init__(self, server, auth=True):
+    def __init__(self, server, auth=True, project_cache=None,
+                 token_cache=None, capability_cache=None):
+        """
+        Args:
+            server (Server): サーバ
+            auth (bool): True の場合は Management API の認証を行う
+            project_cache (FileCache): プロジェクトIDを CLI の実行をまたいで
+                保持するキャッシュ。None の場合はこのファクトリ内でのみ保持する
+            token_cache (FileCache): アクセストークンを CLI の実行をまたいで
+                保持するキャッシュ。None の場合は毎回ログインする
+            capability_cache (FileCache): サーバが対応する機能を CLI の実行を
+                またいで保持するキャッシュ。None の場合はこのプロセス内でのみ保持する
+        """
         self._server = server
         self._user = server.user
+        self._project_cache = project_cache
+        self._token_cache = token_cache
+        # プロジェクト名をキーとした、プロジェクトIDを解決済みの Project
+        self._projects = dict()
+        # ファイルキャッシュから読み込み、サーバに確認していないプロジェクト名
+        self._cached_projects = set()
+        self._projects_lock = threading.Lock()
+
+        if capability_cache:
+            server.capabilities.bind_cache(
+                capability_cache, server.management_endpoint.url()
+            )
 
         if auth:
             self._auth()
@@ -26,7 +104,20 @@ class RepositoryFactory:
         user_repository = UserRepository(
             endpoint=self._server.management_endpoint
         )
-        user_repository.login(user=self._user)
+        key = "{} {}".format(
+            self._server.management_endpoint.url(), self._user.name
+        )
+        authenticator = Authenticator(
+            user_repository=user_repository,
+            user=self._user,
+            key=key,
+            token_cache=self._token_cache
+        )
+        authenticator.authorize()
+
+    @property
+    def server(self):
+        return self._server
 
     def create_project_repository(self):
         repos = ProjectRepository(
@@ -35,14 +126,103 @@ class RepositoryFactory:
         )
         return repos
 
+    def get_project(self, project):
+        """プロジェクトIDを設定した Project を返す
+
+        一度解決したプロジェクトはキャッシュし、サーバへは問い合わせない。
+        キャッシュしたプロジェクトIDが古い場合、プロジェクトIDを使う
+        リポジトリはキャッシュを破棄して一度だけ再送する。
+
+        Args:
+            project (Project): プロジェクト名を設定した Project
+
+        Returns:
+            Project: プロジェクトIDを設定した Project
+        """
+        with self._projects_lock:
+            project_ = self._projects.get(project.name)
+            if project_:
+                return project_
+
+            key = self._project_cache_key(project)
+            cached = None
+            if self._project_cache:
+                cached = self._project_cache.get(key)
+            if cached:
+                project_ = Project(name=project.name, id_=cached["id"])
+                self._cached_projects.add(project.name)
+            else:
+                # project id を取得するために一度サーバに問い合わせる
+                project_ = self.create_project_repository().get(
+                    project=project
+                )
+                if self._project_cache:
+                    self._project_cache.set(key, {"id": project_.id_})
+            self._projects[project.name] = project_
+            return project_
+
+    def invalidate_project_cache(self, project=None):
+        """キャッシュしたプロジェクトIDを破棄する
+
+        Args:
+            project (Project): 破棄するプロジェクト。None の場合は全て破棄する
+        """
+        with self._projects_lock:
+            if project is None:
+                self._projects.clear()
+                self._cached_projects.clear()
+            else:
+                self._projects.pop(project.name, None)
+                self._cached_projects.discard(project.name)
+            if not self._project_cache:
+                return
+            if project is None:
+                self._project_cache.invalidate()
+            else:
+                self._project_cache.invalidate(
+                    self._project_cache_key(project)
+                )
+
+    def refresh_project(self, project, stale):
+        """古い可能性があるプロジェクトIDを解決し直す
+
+        ファイルキャッシュから読み込んだプロジェクトIDはキャッシュを破棄して
+        サーバに問い合わせる。他のリポジトリが既に解決し直した場合はその値を使う。
+
+        Args:
+            project (Project): プロジェクト名を設定した Project
+            stale (Project): リクエストに失敗したプロジェクトIDを設定した Project
+
+        Returns:
+            Project: 新しいプロジェクトIDを設定した Project。
+                プロジェクトIDが変わらない場合は None
+        """
+        with self._projects_lock:
+            cached = project.name in self._cached_projects
+        if cached:
+            self.invalidate_project_cache(project)
+        project_ = self.get_project(project=project)
+        if project_.id_ == stale.id_:
+            return None
+        return project_
+
+    def _project_cache_key(self, project):
+        return "{} {} {}".format(
+            self._server.management_endpoint.url(),
+            self._user.name,
+            project.name
+        )
+
     def create_bot_repository(self, project):
-        project_ = self.create_project_repository().get(project=project)
-        bot_repository = BotRepository(
-            endpoint=self._server.management_endpoint,
-            user=self._user,
-            project=project_,
+        return _ProjectScopedRepository(
+            self, project,
+            lambda project_: BotRepository(
+                endpoint=self._server.management_endpoint,
+                user=self._user,
+                project=project_,
+                capabilities=self._server.capabilities,
+            )
         )
-        return bot_repository
 
     def create_aiml_repository(self, project, bot):
         return self._bot_repos(AIMLRepository, project, bot)
@@ -68,9 +248,8 @@ class RepositoryFactory:
         return DialogueRepository(endpoint=self._server.dialogue_endpoint)
 
     def _bot_repos(self, cls, project, bot):
-        # project id を取得するために一度サーバに問い合わせる
         endpoint = self._server._management_endpoint
-        project = self.create_project_repository().get(project=project)
-        args = (endpoint, self._user, project, bot)
-        repository = cls(*args)
-        return repository
+        return _ProjectScopedRepository(
+            self, project,
+            lambda project_: cls(endpoint, self._user, project_, bot)
+        )
@@ -1,22 +1,149 @@
+import threading
+import time
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+from dialogapi.transport import Timings
+from dialogapi.transport import Transport
 
 # SSLでの検証を無効化した場合に Warning を非表示にする
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# コネクションプールのデフォルト値 (requests のデフォルトと同じ)
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
 
-class Requests:
-    def __init__(self, verify):
+
+# requests.Session.send に渡す引数。その他の引数はリクエストの準備に使う
+_SEND_KWARGS = {
+    "timeout", "allow_redirects", "stream", "proxies", "verify", "cert"
+}
+
+# 送信中のリクエストの接続にかかった時間。リクエストはスレッド毎に逐次送信する
+_connect_timings = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        start = time.monotonic()
+        conn = super()._new_conn()
+        _connect_timings.connect = time.monotonic() - start
+        return conn
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.monotonic()
+        conn = super()._new_conn()
+        _connect_timings.connect = time.monotonic() - start
+        return conn
+
+    def connect(self):
+        start = time.monotonic()
+        super().connect()
+        _connect_timings.tls = \
+            time.monotonic() - start - (_connect_timings.connect or 0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """接続と TLS ハンドシェイクの時間を計測するアダプタ"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class Requests(Transport):
+    """keep-alive なコネクションプールを持つ requests.Session のトランスポート
+
+    インスタンスは長期間保持して使い回すこと。
+    同一ホストへのリクエストは TCP/TLS コネクションを再利用する。
+    """
+    def __init__(self, verify,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, hooks=None):
+        """
+        Args:
+            verify (bool): SSL 検証を行うかどうか
+            pool_connections (int): キャッシュするホスト毎のコネクションプール数
+            pool_maxsize (int): ホスト毎に保持するコネクションの最大数
+            hooks (List[TransportHook]): 登録するフック
+        """
+        super().__init__(hooks=hooks)
         self._verify = verify
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+
+        # verify はセッションに一度だけ設定する。
+        # リクエスト毎に verify を指定した場合はその値を優先する
+        self._session = requests.Session()
+        self._session.verify = verify
+        adapter = _TimedHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
     @property
     def verify(self):
         return self._verify
 
-    def __getattr__(self, name):
-        def decorate(callble):
-            def func(*args, **kwargs):
-                return callble(*args, **kwargs, verify=self._verify)
-            return func
+    @property
+    def pool_connections(self):
+        return self._pool_connections
+
+    @property
+    def pool_maxsize(self):
+        return self._pool_maxsize
+
+    def close(self):
+        """プール中のコネクションを全て閉じる"""
+        self._session.close()
+
+    def _prepare(self, method, url, kwargs):
+        send_kwargs = {
+            key: val for key, val in kwargs.items() if key in _SEND_KWARGS
+        }
+        request = requests.Request(method=method, url=url, **{
+            key: val for key, val in kwargs.items()
+            if key not in _SEND_KWARGS
+        })
+        prepared = self._session.prepare_request(request)
+        body = prepared.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return (prepared, send_kwargs), len(body)
 
-        return decorate(getattr(requests, name))
+    def _send(self, prepared):
+        prepared, send_kwargs = prepared
+        send_kwargs.update(self._session.merge_environment_settings(
+            prepared.url, send_kwargs.pop("proxies", {}),
+            send_kwargs.pop("stream", None),
+            send_kwargs.pop("verify", self._verify),
+            send_kwargs.pop("cert", None)
+        ))
+        _connect_timings.connect = None
+        _connect_timings.tls = None
+        res = self._session.send(prepared, **send_kwargs)
+        # requests は elapsed をレスポンスヘッダの受信までの時間とする
+        return res, Timings(
+            connect=_connect_timings.connect,
+            tls=_connect_timings.tls,
+            ttfb=res.elapsed.total_seconds(),
+            total=None
+        )
@@ -1,6 +1,12 @@
 """APIのエンドポイントとユーザを管理するモジュール"""
 
+import asyncio
+import threading
+from dialogapi.async_http import AsyncHTTP
+from dialogapi.async_http import DEFAULT_LIMIT
 from dialogapi.requests import Requests
+from dialogapi.requests import DEFAULT_POOL_CONNECTIONS
+from dialogapi.requests import DEFAULT_POOL_MAXSIZE
 
 
 class EndpointException(Exception):
@@ -9,13 +15,33 @@ class EndpointException(Exception):
 
 class Endpoint:
     """APIのエンドポイントを表すクラス"""
-    def __init__(self, host, port, protocol, prefix, header, ssl_verify):
+    def __init__(self, host, port, protocol, prefix, header, ssl_verify,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, transport=None):
+        """
+        Args:
+            transport (Transport): リクエストを送信するトランスポート。
+                None の場合は requests の keep-alive セッションを使う。
+                指定した場合は ssl_verify, pool_connections, pool_maxsize を
+                使わない
+        """
         self._host = host
         self._port = port
         self._protocol = protocol
         self._prefix = prefix
         self._header = header
         self._ssl_verify = ssl_verify
+        self._pool_maxsize = pool_maxsize
+
+        # URL の prefix とセッションはエンドポイント生成時に一度だけ構築する
+        self._base_url = "{}://{}:{}{}".format(protocol, host, port, prefix)
+        if transport is None:
+            transport = Requests(
+                verify=ssl_verify,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize
+            )
+        self._transport = transport
 
     @property
     def header(self):
@@ -26,33 +52,233 @@ class Endpoint:
         return self._ssl_verify
 
     @property
-    def requests(self, *args, **argv):
-        return Requests(verify=self._ssl_verify)
+    def pool_maxsize(self):
+        """設定されたホスト毎のコネクションの最大数"""
+        return self._pool_maxsize
+
+    @property
+    def transport(self):
+        """エンドポイントが保持するトランスポートを返す"""
+        return self._transport
+
+    @property
+    def requests(self):
+        """transport の別名。以前のバージョンとの互換性のために残す"""
+        return self._transport
 
     def url(self, point=None):
-        args = (self._protocol, self._host, self._port, self._prefix)
-        path = "{}://{}:{}{}".format(*args)
         if point:
-            path = "{}/{}".format(path, point)
-        return path
+            return "{}/{}".format(self._base_url, point)
+        return self._base_url
+
+
+class AsyncEndpoint:
+    """Endpoint と同じ URL とヘッダに、asyncio のトランスポートで送信するエンドポイント"""
+    def __init__(self, endpoint, transport=None, limit=DEFAULT_LIMIT):
+        """
+        Args:
+            endpoint (Endpoint): URL とヘッダを参照するエンドポイント
+            transport (AsyncTransport): リクエストを送信するトランスポート。
+                None の場合は endpoint のトランスポートと同じフックを登録した
+                AsyncHTTP を使う
+            limit (int): transport が None の場合に AsyncHTTP に渡す、
+                ホスト毎に同時に開くコネクションの最大数
+        """
+        self._endpoint = endpoint
+        if transport is None:
+            transport = AsyncHTTP(
+                verify=endpoint.ssl_verify, limit=limit,
+                hooks=endpoint.transport.hooks
+            )
+        self._transport = transport
+
+    @property
+    def header(self):
+        return self._endpoint.header
+
+    @property
+    def ssl_verify(self):
+        return self._endpoint.ssl_verify
+
+    @property
+    def transport(self):
+        """エンドポイントが保持する asyncio のトランスポートを返す"""
+        return self._transport
+
+    def url(self, point=None):
+        return self._endpoint.url(point)
+
+
+class DeployConfig:
+    """デプロイ時の動作を設定するクラス"""
+    def __init__(self, max_concurrent_compiles=4,
+                 poll_initial_interval=0.2, poll_max_interval=5,
+                 poll_timeout=1800):
+        """
+        Args:
+            max_concurrent_compiles (int):
+                パイプラインデプロイで同時にコンパイルするボット数の上限
+            poll_initial_interval (float):
+                コンパイル・転送状態を最初にポーリングするまでの間隔 (秒)
+            poll_max_interval (float): ポーリング間隔の上限 (秒)
+            poll_timeout (float): コンパイル・転送それぞれの完了を待つ期限 (秒)
+        """
+        self.max_concurrent_compiles = max_concurrent_compiles
+        self.poll_initial_interval = poll_initial_interval
+        self.poll_max_interval = poll_max_interval
+        self.poll_timeout = poll_timeout
+
+
+class CacheConfig:
+    """CLI の実行をまたいだキャッシュを設定するクラス"""
+    def __init__(self, project_ttl=300, token_ttl=1800,
+                 capability_ttl=86400, app_id_ttl=0):
+        """
+        Args:
+            project_ttl (float): プロジェクトIDをキャッシュする期間 (秒)。
+                0 の場合はファイルにキャッシュしない
+            token_ttl (float): アクセストークンをキャッシュする期間 (秒)。
+                0 の場合はファイルにキャッシュしない
+            capability_ttl (float): サーバが対応する機能をキャッシュする期間 (秒)。
+                0 の場合はファイルにキャッシュしない
+            app_id_ttl (float): テストで使わなかった app_id をキャッシュする期間 (秒)。
+                0 の場合はファイルにキャッシュしない
+        """
+        self.project_ttl = project_ttl
+        self.token_ttl = token_ttl
+        self.capability_ttl = capability_ttl
+        self.app_id_ttl = app_id_ttl
+
+
+class Capabilities:
+    """サーバが対応する機能を保持するクラス
+
+    各機能は対応している場合は True、対応していない場合は False、
+    まだ分からない場合は None を持つ。
+    キャッシュを設定した場合は、判明した値を CLI の実行をまたいで保持する。
+    """
+    def __init__(self, sraix=None):
+        """
+        Args:
+            sraix (bool): ボットの sraix パラメータに対応しているか。
+                NLU v2.5 は対応していない。
+                None 以外を指定した場合はサーバへの問い合わせ結果より優先する
+        """
+        self._sraix = sraix
+        self._fixed = sraix is not None
+        self._cache = None
+        self._key = None
+        self._lock = threading.Lock()
+        self._detect_lock = threading.Lock()
+        self._async_detect_lock = None
+        self._async_detect_loop = None
+        self._warned = set()
+
+    @property
+    def sraix(self):
+        return self._sraix
+
+    @property
+    def configured(self):
+        """sraix がプロジェクト構成ファイルで指定されている場合は True"""
+        return self._fixed
+
+    def detecting(self):
+        """機能を判定する間、他の判定を待たせるロックを返す
+
+        With文で利用し、ロックを取得した後に値が判明していないか確認すること。
+        """
+        return self._detect_lock
+
+    def async_detecting(self):
+        """detecting の asyncio 版。実行中のイベントループで使うロックを返す
+
+        Async With文で利用し、ロックを取得した後に値が判明していないか確認すること。
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_detect_loop is not loop:
+                self._async_detect_lock = asyncio.Lock()
+                self._async_detect_loop = loop
+            return self._async_detect_lock
+
+    def warn_once(self, key):
+        """警告を一度だけ表示するために、まだ表示していないかを返す
+
+        Args:
+            key (str): 警告を識別するキー
+
+        Returns:
+            bool: 初めて呼び出した場合は True
+        """
+        with self._lock:
+            if key in self._warned:
+                return False
+            self._warned.add(key)
+            return True
+
+    def bind_cache(self, cache, key):
+        """判明した値を保存するキャッシュを設定し、保存済みの値を読み込む
+
+        Args:
+            cache (FileCache): キャッシュ
+            key (str): サーバを識別するキャッシュのキー
+        """
+        with self._lock:
+            self._cache = cache
+            self._key = key
+            if self._fixed or self._sraix is not None:
+                return
+            cached = cache.get(key)
+            if cached:
+                self._sraix = cached.get("sraix")
+
+    def set_sraix(self, supported):
+        """sraix パラメータに対応しているかを記録する
+
+        Args:
+            supported (bool): 対応している場合は True
+        """
+        with self._lock:
+            if self._fixed or self._sraix == supported:
+                return
+            self._sraix = supported
+            if self._cache:
+                self._cache.set(self._key, {"sraix": supported})
 
 
 class Server:
     """APIのエンドポイントとユーザを管理するクラス"""
     def __init__(
         self, management_endpoint, registration_endpoint, dialogue_endpoint,
-        user, ssl_verify
+        user, ssl_verify, deploy_config=None, cache_config=None,
+        capabilities=None
     ):
         self._management_endpoint = management_endpoint
         self._registration_endpoint = registration_endpoint
         self._dialogue_endpoint = dialogue_endpoint
         self._user = user
         self._ssl_verify = ssl_verify
+        self._deploy_config = deploy_config or DeployConfig()
+        self._cache_config = cache_config or CacheConfig()
+        self._capabilities = capabilities or Capabilities()
 
     @property
     def user(self):
         return self._user
 
+    @property
+    def deploy_config(self):
+        return self._deploy_config
+
+    @property
+    def cache_config(self):
+        return self._cache_config
+
+    @property
+    def capabilities(self):
+        return self._capabilities
+
     @property
     def management_endpoint(self):
         return self._verify_exist(self._management_endpoint, "management")
@@ -65,6 +291,16 @@ class Server:
     def dialogue_endpoint(self):
         return self._verify_exist(self._dialogue_endpoint, "dialogue")
 
+    @property
+    def endpoints(self):
+        """設定されている全てのエンドポイント"""
+        return [
+            endpoint for endpoint in [
+                self._management_endpoint, self._registration_endpoint,
+                self._dialogue_endpoint
+            ] if endpoint
+        ]
+
     def _verify_exist(self, endpoint, type_):
         if not endpoint:
             raise EndpointException(
@@ -0,0 +1,143 @@
+"""対話レスポンスから param で指定した値を取り出すモジュール
+
+param は「.」でキーをつなげて記述する。
+キーの後ろに [N] と書くとリストの N 番目の要素を、
+[*] と書くとリストの全ての要素を参照する。
+[*] を含む場合、取り出した値は該当する全ての値のリストとなる。
+
+    response.systemText.utterance
+    response.items[0].id
+    response.items[*].id
+"""
+
+
+import functools
+import re
+
+
+_SEGMENT = re.compile(r"^([^\[\]]+)((?:\[(?:\*|-?\d+)\])*)$")
+_INDEX = re.compile(r"\[(\*|-?\d+)\]")
+
+# ステップの種類
+_KEY = "key"
+_INDEX_AT = "index"
+_ALL = "all"
+
+
+class MissingValueException(Exception):
+    """param で指定した値がレスポンスに存在しない場合の例外"""
+    def __init__(self, path, reason):
+        super().__init__('"{}" is missing: {}'.format(path, reason))
+        self.path = path
+        self.reason = reason
+
+
+class ResponseAccessor:
+    def __init__(self, path, steps):
+        """
+        Args:
+            path (str): param の文字列
+            steps (List[Tuple[str, Any]]): 種類と、キーまたはインデックスの組のリスト
+        """
+        self._path = path
+        self._steps = steps
+        self._many = any(kind == _ALL for kind, _ in steps)
+
+    @property
+    def path(self):
+        return self._path
+
+    def get(self, response):
+        """
+        Args:
+            response (dict): dialogue API の応答辞書
+        Returns:
+            param で指定した値
+        Raises:
+            MissingValueException: 値が存在しない場合
+        """
+        values = [response]
+        for kind, arg in self._steps:
+            if kind == _KEY:
+                values = [self._get_key(value, arg) for value in values]
+            elif kind == _INDEX_AT:
+                values = [self._get_index(value, arg) for value in values]
+            else:
+                values = [item for value in values
+                          for item in self._get_all(value)]
+        if self._many:
+            return values
+        return values[0]
+
+    def _get_key(self, value, key):
+        if not isinstance(value, dict):
+            raise MissingValueException(
+                self._path, 'cannot get key "{}" from {}'.format(
+                    key, type(value).__name__
+                )
+            )
+        try:
+            return value[key]
+        except KeyError:
+            raise MissingValueException(
+                self._path, 'key "{}" not found'.format(key)
+            ) from None
+
+    def _get_index(self, value, index):
+        if not isinstance(value, list):
+            raise MissingValueException(
+                self._path, "cannot get index {} from {}".format(
+                    index, type(value).__name__
+                )
+            )
+        try:
+            return value[index]
+        except IndexError:
+            raise MissingValueException(
+                self._path, "index {} out of range for length {}".format(
+                    index, len(value)
+                )
+            ) from None
+
+    def _get_all(self, value):
+        if not isinstance(value, list):
+            raise MissingValueException(
+                self._path, "cannot get [*] from {}".format(
+                    type(value).__name__
+                )
+            )
+        return value
+
+
+@functools.lru_cache(maxsize=None)
+def compile_accessor(param):
+    """param を解析して ResponseAccessor を返す
+
+    同じ param には同じインスタンスを返す。
+
+    Args:
+        param (str): response から始まるパラメータキー
+    Returns:
+        ResponseAccessor
+    Raises:
+        ValueError: param の書式が正しくない場合
+    """
+    steps = []
+    for i, segment in enumerate(param.split(".")):
+        match = _SEGMENT.match(segment)
+        if not match:
+            raise ValueError('invalid param "{}"'.format(param))
+        name, indexes = match.groups()
+        if i == 0:
+            if name != "response":
+                raise ValueError(
+                    'param "{}" must start with "response"'.format(param)
+                )
+        else:
+            steps.append((_KEY, name))
+        for index in _INDEX.findall(indexes):
+            if index == "*":
+                steps.append((_ALL, None))
+            else:
+                steps.append((_INDEX_AT, int(index)))
+    return ResponseAccessor(param, steps)
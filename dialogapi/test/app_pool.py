@@ -0,0 +1,144 @@
+"""対話テストで使う app_id を事前に登録して払い出すモジュール
+
+app_id の登録はテスト実行時間の多くを占めるため、
+必要な数の登録を Executor 上で並行して先行させ、タスクには登録済みの app_id を渡す。
+"""
+
+
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dialogapi.entity import Application
+
+
+DEFAULT_WORKERS = 8
+
+
+class AppIdPool:
+    """app_id を事前に登録し、タスクに一つずつ払い出すクラス
+
+    With文で利用するか、使い終わったら close を呼び出すこと。
+    キャッシュを指定した場合は、使われなかった app_id を close 時に保存し、
+    次回の実行で再利用する。キャッシュからは reserve で不足する数だけ取り出し、
+    残りは同時に実行している他のプールのために残す。
+    """
+    def __init__(self, application_repository, bot,
+                 workers=DEFAULT_WORKERS, cache=None):
+        """
+        Args:
+            application_repository (ApplicationRepository)
+            bot (Bot): app_id を登録するボット
+            workers (int): 同時に登録する app_id の数
+            cache (FileCache): 使われなかった app_id を保存するキャッシュ。
+                None の場合は保存しない
+        """
+        self._repository = application_repository
+        self._bot = bot
+        self._workers = workers
+        self._cache = cache
+        self._executor = None
+        # 登録済みの Application または登録時の例外
+        self._ready = queue.Queue()
+        # 払い出し可能な数。登録中のものを含む
+        self._available = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def reserve(self, count):
+        """少なくとも count 個の app_id を払い出せるように登録を開始する
+
+        Args:
+            count (int): 必要な app_id の数
+        """
+        with self._lock:
+            shortfall = count - self._available
+            if shortfall > 0 and self._cache:
+                for app_id in self._take_cached(shortfall):
+                    self._ready.put(Application(bot=self._bot, app_id=app_id))
+                    self._available += 1
+                    shortfall -= 1
+            if shortfall <= 0:
+                return
+            self._available += shortfall
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers
+                )
+            for _ in range(shortfall):
+                # プロファイルのボットとフェーズを引き継ぐ
+                self._executor.submit(
+                    contextvars.copy_context().run, self._register
+                )
+
+    def acquire(self):
+        """app_id を一つ払い出す
+
+        登録済みの app_id があればすぐに返す。
+        払い出し可能な app_id がない場合は、その場で登録する。
+
+        Returns:
+            Application: 未使用の app_id を持つアプリケーション
+        """
+        with self._lock:
+            claimed = self._available > 0
+            if claimed:
+                self._available -= 1
+        if not claimed:
+            return self._repository.register(bot=self._bot)
+
+        item = self._ready.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        """登録中の app_id を待ち、未使用の app_id をキャッシュに保存する"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if not self._cache:
+            return
+
+        app_ids = []
+        while True:
+            try:
+                item = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, Exception):
+                app_ids.append(item.app_id)
+        self._available = 0
+        if app_ids:
+            self._cache.update(
+                self._cache_key(), lambda cached: (cached or []) + app_ids
+            )
+
+    def _register(self):
+        try:
+            item = self._repository.register(bot=self._bot)
+        except Exception as exc:
+            item = exc
+        self._ready.put(item)
+
+    def _take_cached(self, count):
+        # 他の実行と同じ app_id を使わないように、取り出した値は削除する
+        taken = []
+
+        def take(cached):
+            cached = cached or []
+            taken.extend(cached[:count])
+            return cached[count:] or None
+
+        self._cache.update(self._cache_key(), take)
+        return taken
+
+    def _cache_key(self):
+        return "{} {}".format(
+            self._repository.endpoint.url(), self._bot.id_
+        )
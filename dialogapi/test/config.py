@@ -42,12 +42,13 @@ class Parser:
     def parse(self, filename):
         with open(filename, encoding="utf-8") as f:
             content = f.read()
-        return self.parse_fd(content)
+        return self.parse_fd(content, name=filename)
 
-    def parse_fd(self, content):
+    def parse_fd(self, content, name=None):
         """
         Args:
             content (str): YAML文字列
+            name (str): テストファイル名
         Returns:
             (TaskManager): タスクマネージャ
         """
@@ -61,7 +62,7 @@ class Parser:
             tests = []
             for testdic in taskdic["tests"]:
                 test = Test(method=factory.build(testdic["method"]),
-                            param=testdic["param"],
+                            param=testdic.get("param"),
                             expected=testdic["expected"])
                 tests.append(test)
             task = Task(name=task_name, request=task_request, tests=tests)
@@ -70,6 +71,7 @@ class Parser:
         # タスクマネージャの定義
         manager = TaskManager(
             tasks=tasks,
-            config=TaskConfig(**yaml_dic["config"])
+            config=TaskConfig(**yaml_dic["config"]),
+            name=name
         )
         return manager
@@ -5,7 +5,7 @@ class AssertionMethodFactory:
     def __init__(self):
         clses = [AssertEqual, AssertIn, AssertRegexEqual, AssertRegexIn,
                  AssertNotEqual, AssertNotIn, AssertRegexNotEqual,
-                 AssertRegexNotIn,
+                 AssertRegexNotIn, AssertLatencyLessThan,
                  ]
         self._mapper = {mt.name: mt for mt in clses}
 
@@ -17,65 +17,185 @@ class AssertionMethodFactory:
         return self._mapper[method_name]()
 
 
-class AssertEqual:
+class AssertionMethod:
+    """assertion メソッドの基底クラス
+
+    compile はテストの生成時に一度だけ呼び出され、
+    その戻り値が execute の second に渡される。
+    execute は compile していない期待値も受け付ける。
+    target が "response" のメソッドは param で指定したレスポンスの値を、
+    "latency" のメソッドは対話リクエストの所要時間 (ミリ秒) をテストする。
+    """
+    name = None
+    target = "response"
+
+    def compile(self, expected):
+        """
+        Args:
+            expected: テストファイルに記述された期待値
+        Returns:
+            execute に渡す期待値
+        """
+        return expected
+
+    def execute(self, first, second):
+        raise NotImplementedError()
+
+
+class AssertEqual(AssertionMethod):
     name = "equal"
 
     def execute(self, first, second):
         return first == second
 
 
-class AssertIn:
+class AssertIn(AssertionMethod):
     name = "in"
 
+    def compile(self, expected):
+        return _compile_membership(expected)
+
     def execute(self, first, second):
         return first in second
 
 
-class AssertRegexEqual:
+class AssertRegexEqual(AssertionMethod):
     name = "regex_equal"
 
+    def compile(self, expected):
+        return re.compile(expected)
+
     def execute(self, first, second):
-        match = re.search(second, first)
+        match = _search(second, first)
         return bool(match)
 
 
-class AssertRegexIn:
+class AssertRegexIn(AssertionMethod):
     name = "regex_in"
 
+    def compile(self, expected):
+        return _compile_regex_list(expected)
+
     def execute(self, first, second):
         for regex in second:
-            if bool(re.search(regex, first)):
+            if bool(_search(regex, first)):
                 return True
         return False
 
 
-class AssertNotEqual:
+class AssertNotEqual(AssertionMethod):
     name = "not_equal"
 
     def execute(self, first, second):
         return first != second
 
 
-class AssertNotIn:
+class AssertNotIn(AssertionMethod):
     name = "not_in"
 
+    def compile(self, expected):
+        return _compile_membership(expected)
+
     def execute(self, first, second):
         return first not in second
 
 
-class AssertRegexNotEqual:
+class AssertRegexNotEqual(AssertionMethod):
     name = "regex_not_equal"
 
+    def compile(self, expected):
+        return re.compile(expected)
+
     def execute(self, first, second):
-        match = re.search(second, first)
+        match = _search(second, first)
         return not bool(match)
 
 
-class AssertRegexNotIn:
+class AssertRegexNotIn(AssertionMethod):
     name = "regex_not_in"
 
+    def compile(self, expected):
+        return _compile_regex_list(expected)
+
     def execute(self, first, second):
         for regex in second:
-            if bool(re.search(regex, first)):
+            if bool(_search(regex, first)):
                 return False
         return True
+
+
+class AssertLatencyLessThan(AssertionMethod):
+    name = "latency_lt"
+    target = "latency"
+
+    def compile(self, expected):
+        if isinstance(expected, bool) or \
+                not isinstance(expected, (int, float)):
+            raise ValueError(
+                'expected of "{}" must be milliseconds: {!r}'.format(
+                    self.name, expected
+                )
+            )
+        return expected
+
+    def execute(self, first, second):
+        return first < second
+
+
+class _Membership:
+    """リストの要素をハッシュ集合で検索するクラス
+
+    ハッシュ化できない値はリストを線形探索する。
+    """
+    def __init__(self, values):
+        self._values = values
+        self._set = frozenset(values)
+
+    def __contains__(self, value):
+        try:
+            return value in self._set
+        except TypeError:
+            return value in self._values
+
+
+def _compile_membership(expected):
+    # 文字列の in は部分文字列の検索のためそのまま使う
+    if not isinstance(expected, (list, tuple)):
+        return expected
+    try:
+        return _Membership(expected)
+    except TypeError:
+        return expected
+
+
+# 選択に結合すると意味が変わる後方参照・条件分岐
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+def _compile_regex_list(expected):
+    """正規表現のリストを一つの選択にまとめてコンパイルする
+
+    インラインフラグや後方参照を含む場合、グループ名が重複する場合は
+    結合せずに個別にコンパイルしたリストを返す。
+    """
+    regexes = [re.compile(regex) for regex in expected]
+    if len(regexes) <= 1:
+        return regexes
+    if any(regex.flags != _DEFAULT_FLAGS or
+           _BACKREFERENCE.search(regex.pattern)
+           for regex in regexes):
+        return regexes
+    try:
+        return [re.compile("|".join(
+            "(?:{})".format(regex.pattern) for regex in regexes
+        ))]
+    except re.error:
+        return regexes
+
+
+def _search(regex, string):
+    if isinstance(regex, str):
+        return re.search(regex, string)
+    return regex.search(string)
@@ -0,0 +1,205 @@
+"""テスト結果をタスク毎に機械可読な形式で出力するモジュール
+
+レポーターはタスクが終了する度に結果を受け取り、すぐにファイルへ書き出す。
+結果は保持しないため、タスク数によらずメモリ使用量は一定となる。
+タスクは複数のスレッドから報告されるため、書き出しはロックで保護する。
+"""
+
+
+import json
+import threading
+from collections import namedtuple
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+
+# タスクの結果
+# suite: テストファイル名。不明な場合は None
+# request: テストファイルに記述したリクエスト。
+#   所要時間のパーセンタイルの判定など、対話しない結果では request と app_id は None
+# latency: 対話リクエストの所要時間 (秒)
+# tests: TestRecord のリスト
+TaskResult = namedtuple(
+    "TaskResult",
+    ["name", "bot", "suite", "request", "app_id", "latency", "passed",
+     "tests"]
+)
+
+# テストの結果
+# value: param で取り出した値
+# error: 値が取り出せなかった場合の理由
+TestRecord = namedtuple(
+    "TestRecord",
+    ["method", "param", "expected", "value", "passed", "error"]
+)
+
+
+class Reporter:
+    """レポーターの基底クラス
+
+    With文で利用するか、報告が終わったら close を呼び出すこと。
+    サブクラスは _write と _close を実装する。
+    """
+    def __init__(self, out):
+        """
+        Args:
+            out (file): 出力先のテキストファイル
+        """
+        self._out = out
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def report(self, result):
+        """タスクの結果を書き出す
+
+        Args:
+            result (TaskResult): タスクの結果
+        """
+        with self._lock:
+            self._write(result)
+            self._out.flush()
+
+    def close(self):
+        with self._lock:
+            self._close()
+            self._out.flush()
+
+    def _write(self, result):
+        raise NotImplementedError()
+
+    def _close(self):
+        pass
+
+
+class JSONLReporter(Reporter):
+    """タスクの結果を一行に一つの JSON として書き出すレポーター"""
+    def _write(self, result):
+        dic = result._asdict()
+        dic["tests"] = [test._asdict() for test in result.tests]
+        # レスポンスや期待値の JSON にできない値は文字列にする
+        self._out.write(
+            json.dumps(dic, ensure_ascii=False, default=str) + "\n"
+        )
+
+
+# 集計値で上書きするため、ヘッダの後ろに空白を確保しておく
+_JUNIT_HEADER_WIDTH = 128
+
+
+class JUnitReporter(Reporter):
+    """タスクを testcase として JUnit XML 形式で書き出すレポーター
+
+    testcase の classname はボットID、file はテストファイル名、
+    time は対話リクエストの所要時間とする。失敗した assertion は一つずつ failure 要素に書き出す。
+    出力先がシーク可能な場合は、close 時に testsuite 要素のテスト数と
+    失敗数を書き込む。
+    """
+    def __init__(self, out, name="dialogapi"):
+        """
+        Args:
+            out (file): 出力先のテキストファイル
+            name (str): testsuite の名前
+        """
+        super().__init__(out)
+        self._name = name
+        self._tests = 0
+        self._failures = 0
+        self._time = 0.0
+
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._header_pos = out.tell() if out.seekable() else None
+        header = self._header()
+        self._header_width = max(len(header), _JUNIT_HEADER_WIDTH)
+        out.write(header.ljust(self._header_width) + "\n")
+
+    def _header(self):
+        return '<testsuite name={} tests="{}" failures="{}" time="{:.3f}">'\
+            .format(quoteattr(self._name), self._tests, self._failures,
+                    self._time)
+
+    def _write(self, result):
+        self._tests += 1
+        self._time += result.latency
+        attrs = ''
+        if result.suite is not None:
+            attrs = ' file={}'.format(quoteattr(result.suite))
+
+        lines = ['  <testcase classname={} name={}{} time="{:.3f}">'.format(
+            quoteattr(str(result.bot)), quoteattr(result.name), attrs,
+            result.latency
+        )]
+        lines.append("    <properties>")
+        if result.app_id is not None:
+            lines.append("      <property name=\"app_id\" value={} />"
+                         .format(quoteattr(str(result.app_id))))
+        if result.request is not None:
+            lines.append("      <property name=\"request\" value={} />"
+                         .format(quoteattr(json.dumps(
+                             result.request, ensure_ascii=False, default=str
+                         ))))
+        params = set()
+        for test in result.tests:
+            if test.param in params:
+                continue
+            params.add(test.param)
+            lines.append("      <property name={} value={} />".format(
+                quoteattr(test.param),
+                quoteattr(json.dumps(
+                    test.value, ensure_ascii=False, default=str
+                ))
+            ))
+        lines.append("    </properties>")
+        if not result.passed:
+            self._failures += 1
+        for test in result.tests:
+            if test.passed:
+                continue
+            if test.error is not None:
+                message = 'param {}'.format(test.error)
+            else:
+                message = 'result "{}" != expected "{}"'.format(
+                    test.value, test.expected
+                )
+            lines.append("    <failure message={} type={}>{}</failure>".format(
+                quoteattr(message), quoteattr(test.method),
+                escape(message)
+            ))
+        lines.append("  </testcase>")
+        self._out.write("\n".join(lines) + "\n")
+
+    def _close(self):
+        self._out.write("</testsuite>\n")
+        if self._header_pos is None:
+            return
+        header = self._header()
+        if len(header) > self._header_width:
+            return
+        end = self._out.tell()
+        self._out.seek(self._header_pos)
+        self._out.write(header.ljust(self._header_width))
+        self._out.seek(end)
+
+
+class MultiReporter:
+    """複数のレポーターに同じ結果を報告するレポーター"""
+    def __init__(self, reporters):
+        self._reporters = reporters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def report(self, result):
+        for reporter in self._reporters:
+            reporter.report(result)
+
+    def close(self):
+        for reporter in self._reporters:
+            reporter.close()
@@ -0,0 +1,88 @@
+"""テストのタスクを複数のシャードに分割するモジュール
+
+同じテストファイルを使う限り、どのマシン・プロセスで分割しても同じ結果となる。
+keep_app_id を指定したテストファイルは定義順に実行する必要があるため、
+ファイル全体を一つの単位として同じシャードに割り当てる。
+それ以外のテストファイルはタスク毎に割り当てる。
+"""
+
+
+import hashlib
+import heapq
+
+
+def shard_tests(bot_tests, shard_index, shard_count):
+    """ボット毎のテストから、指定したシャードで実行するタスクを取り出す
+
+    単位をタスク数の多い順に、その時点でタスク数が最も少ないシャードへ割り当てる。
+    タスク数が同じ単位の順序は、ボットID・テストファイルの位置・タスク名の
+    ハッシュ値で決める。テストファイルのパスはマシン毎に異なり得るため使わない。
+
+    Args:
+        bot_tests (List[Tuple[Bot, List[TaskManager]]]):
+            ボットとそのテストのリスト
+        shard_index (int): 実行するシャードの番号。0 から始まる
+        shard_count (int): シャードの数
+
+    Returns:
+        List[Tuple[Bot, List[TaskManager]]]: このシャードで実行するタスクのみを
+            持つテストのリスト。タスクの順序は元の順序を保つ。
+            タスクがないテストファイルとボットは含まない
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            "shard index must be between 0 and {}: {}".format(
+                shard_count - 1, shard_index
+            )
+        )
+
+    # 単位は (タスク数, ハッシュ値, ボット・テストファイル・タスクの位置)
+    units = []
+    for bot_pos, (bot, tests) in enumerate(bot_tests):
+        for manager_pos, manager in enumerate(tests):
+            if manager.config.keep_app_id:
+                units.append((
+                    len(manager.tasks),
+                    _digest(bot.id_, manager_pos),
+                    (bot_pos, manager_pos, None)
+                ))
+                continue
+            for task_pos, task in enumerate(manager.tasks):
+                units.append((
+                    1,
+                    _digest(bot.id_, manager_pos, task.name),
+                    (bot_pos, manager_pos, task_pos)
+                ))
+    units.sort(key=lambda unit: (-unit[0], unit[1], unit[2]))
+
+    # (割り当てたタスク数, シャードの番号)
+    loads = [(0, i) for i in range(shard_count)]
+    selected = set()
+    for size, _, position in units:
+        load, shard = heapq.heappop(loads)
+        heapq.heappush(loads, (load + size, shard))
+        if shard == shard_index:
+            selected.add(position)
+
+    sharded = []
+    for bot_pos, (bot, tests) in enumerate(bot_tests):
+        managers = []
+        for manager_pos, manager in enumerate(tests):
+            if (bot_pos, manager_pos, None) in selected:
+                managers.append(manager)
+                continue
+            tasks = [
+                task for task_pos, task in enumerate(manager.tasks)
+                if (bot_pos, manager_pos, task_pos) in selected
+            ]
+            if tasks:
+                managers.append(manager.with_tasks(tasks))
+        if managers:
+            sharded.append((bot, managers))
+    return sharded
+
+
+def _digest(*values):
+    # Python の hash はプロセス毎に異なるため、マシン間で同じ値となる sha1 を使う
+    text = "\0".join(str(value) for value in values)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
@@ -1,51 +1,319 @@
+import contextvars
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dialogapi.entity import Request
+from dialogapi.histogram import Histogram
+from dialogapi.test.accessor import MissingValueException
+from dialogapi.test.accessor import compile_accessor
+from dialogapi.test.app_pool import AppIdPool
+from dialogapi.test.reporter import TaskResult
+from dialogapi.test.reporter import TestRecord
+from collections import deque
 from collections import namedtuple
 
 
+# 所要時間をテストするメソッドの param
+LATENCY_PARAM = "latency"
+
+# テストファイル全体の所要時間の上限 (ミリ秒) を指定するキーとパーセンタイル
+LATENCY_BUDGET_KEYS = {
+    "latency_p50": 50,
+    "latency_p90": 90,
+    "latency_p95": 95,
+    "latency_p99": 99,
+}
+
+
 class TaskConfig:
     def __init__(self, **argv):
         # パラメータのチェック
-        keys = {"keep_app_id"}
+        keys = {"keep_app_id"} | set(LATENCY_BUDGET_KEYS)
         for key in argv:
             assert key in keys
 
         self.keep_app_id = argv.get("keep_app_id", False)
+        # パーセンタイルと所要時間の上限 (ミリ秒)
+        self.latency_budgets = dict()
+        for key, percentile in LATENCY_BUDGET_KEYS.items():
+            if key not in argv:
+                continue
+            budget = argv[key]
+            if isinstance(budget, bool) or \
+                    not isinstance(budget, (int, float)):
+                raise ValueError(
+                    "{} must be milliseconds: {!r}".format(key, budget)
+                )
+            self.latency_budgets[percentile] = budget
+
+
+class LatencyBudget:
+    """タスクの所要時間のパーセンタイルが上限を超えていないか判定するクラス
+
+    所要時間はヒストグラムに記録するため、タスク数によらずメモリ使用量は一定となる。
+    """
+    def __init__(self, budgets):
+        """
+        Args:
+            budgets (Dict[int, float]): パーセンタイルと所要時間の上限 (ミリ秒)
+        """
+        self._budgets = budgets
+        self._histogram = Histogram()
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        """
+        Args:
+            latency (float): 対話リクエストの所要時間 (秒)
+        """
+        with self._lock:
+            self._histogram.record(latency)
+
+    def judge(self, out=None, reporter=None, bot=None, suite=None):
+        """パーセンタイル毎に判定し、結果を出力する
+
+        Args:
+            out (file): 結果の出力先。None の場合は標準出力に出力する
+            reporter (Reporter): 指定した場合、パーセンタイル毎の判定を
+                "latency p95" のような名前のタスクの結果として報告する
+            bot (Bot): 報告するボット
+            suite (str): 報告するテストファイル名
+        Returns:
+            bool: 全てのパーセンタイルが上限以下の場合は True を返す
+        """
+        result = True
+        for percentile, budget in sorted(self._budgets.items()):
+            name = "latency p{}".format(percentile)
+            print("- {} ...".format(name), end=" ", file=out)
+            value = self._histogram.percentile(percentile)
+            passed = value is None or value * 1000 <= budget
+            if value is not None:
+                value = round(value * 1000, 1)
+            if passed:
+                print("ok.", file=out)
+            else:
+                print(
+                    "fail. p{} latency {:.1f} ms exceeds budget {} ms."
+                    .format(percentile, value, budget),
+                    file=out
+                )
+                result = False
+            if reporter is not None:
+                reporter.report(TaskResult(
+                    name=name,
+                    bot=bot.id_ if bot is not None else None,
+                    suite=suite,
+                    request=None,
+                    app_id=None,
+                    latency=0.0,
+                    passed=passed,
+                    tests=[TestRecord(
+                        method="latency_p{}".format(percentile),
+                        param=LATENCY_PARAM,
+                        expected=budget,
+                        value=value,
+                        passed=passed,
+                        error=None,
+                    )]
+                ))
+        return result
 
 
 class TaskManager:
     """
     複数のタスクを制御するクラス
     """
-    def __init__(self, tasks, config):
+    def __init__(self, tasks, config, name=None):
+        """
+        Args:
+            tasks (List[Task]): タスクのリスト
+            config (TaskConfig): テストの設定
+            name (str): テストファイル名。レポーターの出力に使う
+        """
         self._tasks = tasks
         self._config = config
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def config(self):
+        return self._config
 
     @property
     def tasks(self):
         return self._tasks
 
+    def with_tasks(self, tasks):
+        """同じ設定とファイル名で、タスクを置き換えたタスクマネージャを返す"""
+        return TaskManager(tasks=tasks, config=self._config, name=self._name)
+
+    @property
+    def app_id_count(self):
+        """タスクの実行に必要な app_id の数"""
+        if self._config.keep_app_id:
+            return 1
+        return len(self._tasks)
+
     def execute_tasks(
         self, bot, application_repository,
-        dialogue_repository
+        dialogue_repository, concurrency=1, out=None, app_pool=None,
+        reporter=None
     ):
-        results = []
-        app = application_repository.register(bot=bot)
+        """
+        Args:
+            bot (Bot): テスト対象のボット
+            application_repository (ApplicationRepository)
+            dialogue_repository (DialogueRepository)
+            concurrency (int): 同時に実行するタスク数。
+                keep_app_id が指定されている場合は app_id を共有するため、
+                タスクは常に定義順に一つずつ実行する
+            out (file): 結果の出力先。None の場合は標準出力に出力する
+            app_pool (AppIdPool): app_id の払い出しに使うプール。
+                None の場合はこのタスクマネージャ内でプールを作成する
+            reporter (Reporter): タスクの終了毎に結果を報告するレポーター
+
+        Returns:
+            bool: 全てのタスクが成功した場合は True を返す
+        """
+        if app_pool is None:
+            with AppIdPool(application_repository, bot) as app_pool:
+                return self.execute_tasks(
+                    bot, application_repository, dialogue_repository,
+                    concurrency=concurrency, out=out, app_pool=app_pool,
+                    reporter=reporter
+                )
+
+        latencies = None
+        if self._config.latency_budgets:
+            latencies = LatencyBudget(self._config.latency_budgets)
+        app_pool.reserve(self.app_id_count)
+        if self._config.keep_app_id or concurrency <= 1:
+            result = self._execute_tasks_serial(
+                bot, app_pool, dialogue_repository, out, reporter, latencies
+            )
+        else:
+            result = self._execute_tasks_concurrent(
+                bot, app_pool, dialogue_repository, concurrency, out,
+                reporter, latencies
+            )
+        if latencies is not None:
+            result = latencies.judge(
+                out=out, reporter=reporter, bot=bot, suite=self._name
+            ) and result
+        return result
+
+    def _execute_tasks_serial(
+        self, bot, app_pool, dialogue_repository, out, reporter, latencies
+    ):
+        result = True
+        app = None
         for task in self._tasks:
-            # keep_app_id が指定されていない場合、毎回app_idを新しく払い出す
-            if not self._config.keep_app_id:
-                app = application_repository.register(bot=bot)
-            # dbot の app_id から新しくリクエストを生成する
-            # - task.request に app_id が指定されていたら、そちらが優先される
-            request = Request(
-                application=app,
-                voice_text=task.request["voiceText"],
-                **{key: val for key, val in task.request.items()
-                   if key != "voiceText"}
+            # keep_app_id が指定されていない場合、毎回新しい app_id を使う
+            if app is None or not self._config.keep_app_id:
+                app = app_pool.acquire()
+            res_bool = self._execute_task(
+                task, app, dialogue_repository, out=out, bot=bot,
+                reporter=reporter, latencies=latencies
+            )
+            result = result and res_bool
+        return result
+
+    def _execute_tasks_concurrent(
+        self, bot, app_pool, dialogue_repository, concurrency, out, reporter,
+        latencies
+    ):
+        def run(task):
+            # 出力はタスク毎にバッファし、定義順に書き出す
+            out = io.StringIO()
+            app = app_pool.acquire()
+            res_bool = self._execute_task(
+                task, app, dialogue_repository, out=out, bot=bot,
+                reporter=reporter, latencies=latencies
             )
-            response = dialogue_repository.dialogue(request=request)
-            res_bool = task.execute_tests(response=response)
-            results.append(res_bool)
-        return all(results)
+            return res_bool, out.getvalue()
+
+        if out is None:
+            out = sys.stdout
+        result = True
+        # 出力待ちのバッファが溜まらないよう、投入するタスク数を制限する
+        window = concurrency * 2
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for task in self._tasks:
+                    if len(futures) >= window:
+                        res_bool = self._write_result(futures.popleft(), out)
+                        result = result and res_bool
+                    # プロファイルのボットとフェーズを引き継ぐ
+                    futures.append(executor.submit(
+                        contextvars.copy_context().run, run, task
+                    ))
+                while futures:
+                    res_bool = self._write_result(futures.popleft(), out)
+                    result = result and res_bool
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        return result
+
+    def _write_result(self, future, out):
+        res_bool, text = future.result()
+        out.write(text)
+        return res_bool
+
+    def _execute_task(
+        self, task, app, dialogue_repository, out, bot=None, reporter=None,
+        latencies=None
+    ):
+        # dbot の app_id から新しくリクエストを生成する
+        # - task.request に app_id が指定されていたら、そちらが優先される
+        request = Request(
+            application=app,
+            voice_text=task.request["voiceText"],
+            **{key: val for key, val in task.request.items()
+               if key != "voiceText"}
+        )
+        start = time.monotonic()
+        response = dialogue_repository.dialogue(request=request)
+        latency = time.monotonic() - start
+        if latencies is not None:
+            latencies.record(latency)
+        if reporter is None:
+            return task.execute_tests(
+                response=response, out=out, latency=latency
+            )
+
+        results = []
+        res_bool = task.execute_tests(
+            response=response, out=out, results=results, latency=latency
+        )
+        reporter.report(TaskResult(
+            name=task.name,
+            bot=bot.id_ if bot is not None else None,
+            suite=self._name,
+            request=task.request,
+            app_id=app.app_id,
+            latency=latency,
+            passed=res_bool,
+            tests=[
+                TestRecord(
+                    method=test.method.name,
+                    param=test.param,
+                    expected=res.expected,
+                    value=res.result,
+                    passed=res.bool,
+                    error=None if res.error is None else str(res.error),
+                )
+                for test, res in results
+            ]
+        ))
+        return res_bool
 
 
 class Task:
@@ -72,31 +340,54 @@ class Task:
     def tests(self):
         return self._tests
 
-    def execute_tests(self, response):
+    def execute_tests(self, response, out=None, results=None, latency=None):
         """
         Args:
             response (dict[str][Any]): 対話レスポンス
+            out (file): 結果の出力先。None の場合は標準出力に出力する
+            results (list): 指定した場合、テストと TestResult の組を追加する
+            latency (float): 対話リクエストの所要時間 (秒)
         """
         total_result = True
+        # 同じ param を参照するテストは一度だけ値を取り出す
+        values = dict()
         for test in self._tests:
-            print("- {} ...".format(self._name), end=" ")
-            res = test.execute(response=response)
+            print("- {} ...".format(self._name), end=" ", file=out)
+            res = test.execute(
+                response=response, values=values, latency=latency
+            )
+            if results is not None:
+                results.append((test, res))
             if res.bool:
-                print("ok.")
+                print("ok.", file=out)
+                continue
+
+            print("fail.", end=" ", file=out)
+            if res.error is not None:
+                print(
+                    'In assertion method "{}", param {}.'.format(
+                        test.method.name, res.error
+                    ),
+                    file=out
+                )
             else:
-                print("fail.", end=" ")
                 print(
                     ('In assertion method "{}", '
                      'result "{}" != expected "{}".').format(
                         test.method.name, res.result, res.expected
-                    )
+                    ),
+                    file=out
                 )
-                total_result = False
+            total_result = False
 
         return total_result
 
 
-TestResult = namedtuple("TestResult", ["bool", "result", "expected"])
+# error は param の値がレスポンスに存在しない場合の MissingValueException
+TestResult = namedtuple(
+    "TestResult", ["bool", "result", "expected", "error"],
+    defaults=[None]
+)
 
 
 class Test:
@@ -106,31 +397,78 @@ class Test:
             method (Assert): assertionメソッドクラスを指定する
             param (str): 利用するパラメータキー
                 response.systemText.utterance
-                のように、「.」でキーを指定する
+                のように、「.」でキーを指定する。
+                response.items[*].id のようにリストの要素も指定できる。
+                所要時間をテストするメソッドでは None か "latency" を指定する
             expected (str): 期待する応答
         """
         self._method = method
-        self._param = param
+        if method.target == "latency":
+            if param not in (None, LATENCY_PARAM):
+                raise ValueError(
+                    'param of method "{}" must be "{}": {}'.format(
+                        method.name, LATENCY_PARAM, param
+                    )
+                )
+            self._param = LATENCY_PARAM
+            self._accessor = None
+        elif param is None:
+            raise ValueError(
+                'param is required for method "{}"'.format(method.name)
+            )
+        else:
+            self._param = param
+            self._accessor = compile_accessor(param)
         self._expected = expected
+        # 正規表現や集合への変換はテストの生成時に一度だけ行う
+        self._compiled = method.compile(expected)
 
     @property
     def method(self):
         return self._method
 
-    def execute(self, response):
+    @property
+    def param(self):
+        return self._param
+
+    def execute(self, response, values=None, latency=None):
         """
         Args:
             response (dict): dialogue API の応答辞書
+            values (dict): param 毎に取り出した値のキャッシュ。
+                同じレスポンスに対するテスト間で共有する
+            latency (float): 対話リクエストの所要時間 (秒)
         """
-        keys = self._param.split(".")
-        assert keys[0] == "response"
-        keys = keys[1:]
+        if self._accessor is None:
+            val = self._latency(latency)
+        else:
+            val = self._get(response, values)
 
-        val = response
-        for key in keys:
-            val = val[key]
+        if isinstance(val, MissingValueException):
+            return TestResult(
+                bool=False, result=None, expected=self._expected, error=val
+            )
         return TestResult(
-            bool=self._method.execute(val, self._expected),
+            bool=self._method.execute(val, self._compiled),
             result=val,
             expected=self._expected
             )
+
+    def _latency(self, latency):
+        if latency is None:
+            return MissingValueException(self._param, "not measured")
+        # ミリ秒単位で比較・表示する
+        return round(latency * 1000, 1)
+
+    def _get(self, response, values):
+        path = self._accessor.path
+        if values is not None and path in values:
+            val = values[path]
+        else:
+            try:
+                val = self._accessor.get(response)
+            except MissingValueException as e:
+                val = e
+            if values is not None:
+                values[path] = val
+        return val
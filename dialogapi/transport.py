@@ -0,0 +1,208 @@
+"""エンドポイントが HTTP リクエストを送信するトランスポートのインターフェースを定義するモジュール
+
+リポジトリはエンドポイントのトランスポートを通してリクエストを送信する。
+トランスポートにはフックを登録でき、リクエストの送信前と応答の受信後に
+メソッド・URL・ペイロードサイズ・ステータスコード・所要時間を受け取れる。
+別の HTTP クライアントやテスト用の偽物を使う場合は Transport を継承して実装する。
+asyncio のイベントループ上で送信する場合は AsyncTransport を継承して実装する。
+"""
+
+
+import time
+from collections import namedtuple
+
+
+# リクエストの情報。payload_size はボディのバイト数
+RequestInfo = namedtuple("RequestInfo", ["method", "url", "payload_size"])
+
+# 所要時間 (秒)
+# connect: TCP 接続。既存の接続を再利用した場合は None
+# tls: TLS ハンドシェイク。TLS を使わないか既存の接続を再利用した場合は None
+# ttfb: 送信開始からレスポンスヘッダを受信するまで
+# total: 送信開始からレスポンスボディを受信し終えるまで
+Timings = namedtuple("Timings", ["connect", "tls", "ttfb", "total"])
+
+# 応答の情報。送信に失敗した場合は status_code が None で error に例外を持つ
+ResponseInfo = namedtuple(
+    "ResponseInfo", ["status_code", "size", "timings", "error"]
+)
+
+
+class TransportHook:
+    """トランスポートのフック。継承して必要なメソッドを実装する
+
+    フックはリクエストを送信したスレッドで呼び出される。
+    """
+    def before_request(self, request):
+        """リクエストの送信前に呼び出される
+
+        Args:
+            request (RequestInfo): リクエストの情報
+        """
+
+    def after_response(self, request, response):
+        """応答の受信後、または送信の失敗時に呼び出される
+
+        Args:
+            request (RequestInfo): リクエストの情報
+            response (ResponseInfo): 応答の情報
+        """
+
+
+class _HookedTransport:
+    """フックの登録と呼び出しを行う Transport と AsyncTransport の基底クラス"""
+    def __init__(self, hooks=None):
+        """
+        Args:
+            hooks (List[TransportHook]): 登録するフック
+        """
+        self._hooks = list(hooks or [])
+
+    @property
+    def hooks(self):
+        """登録されているフック"""
+        return list(self._hooks)
+
+    def add_hook(self, hook):
+        """フックを登録する"""
+        self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook):
+        """登録したフックを削除する"""
+        self._hooks = [hook_ for hook_ in self._hooks if hook_ is not hook]
+
+    def _before_request(self, method, url, kwargs):
+        """リクエストを準備し、フックの before_request を呼び出す
+
+        Returns:
+            Tuple[Any, RequestInfo, List[TransportHook]]:
+                _send に渡すリクエスト、リクエストの情報、呼び出すフック
+        """
+        prepared, payload_size = self._prepare(method.upper(), url, kwargs)
+        request = RequestInfo(
+            method=method.upper(), url=url, payload_size=payload_size
+        )
+        hooks = self._hooks
+        for hook in hooks:
+            hook.before_request(request)
+        return prepared, request, hooks
+
+    def _after_response(self, request, hooks, res, timings, start):
+        timings = timings._replace(total=time.monotonic() - start)
+        size = len(res.content or b"")
+        for hook in hooks:
+            hook.after_response(
+                request, ResponseInfo(res.status_code, size, timings, None)
+            )
+
+    def _after_error(self, request, hooks, error, start):
+        timings = Timings(None, None, None, time.monotonic() - start)
+        for hook in hooks:
+            hook.after_response(
+                request, ResponseInfo(None, 0, timings, error)
+            )
+
+    def _prepare(self, method, url, kwargs):
+        """送信するリクエストを準備する
+
+        Returns:
+            Tuple[Any, int]: _send に渡すリクエストとペイロードのバイト数
+        """
+        raise NotImplementedError()
+
+
+class Transport(_HookedTransport):
+    """HTTP リクエストを送信するトランスポート。継承して利用する
+
+    サブクラスは _prepare と _send を実装する。
+    レスポンスは status_code, content 属性と json メソッドを持つこと。
+    """
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """リクエストを送信してレスポンスを返す
+
+        Args:
+            method (str): HTTP メソッド
+            url (str): URL
+            kwargs: headers, json, files, timeout など送信に使う引数
+
+        Returns:
+            レスポンス
+        """
+        prepared, request, hooks = self._before_request(method, url, kwargs)
+        start = time.monotonic()
+        try:
+            res, timings = self._send(prepared)
+        except Exception as e:
+            self._after_error(request, hooks, e, start)
+            raise
+        self._after_response(request, hooks, res, timings, start)
+        return res
+
+    def close(self):
+        """保持している接続などを解放する"""
+
+    def _send(self, prepared):
+        """リクエストを送信する
+
+        Returns:
+            Tuple[Any, Timings]: レスポンスと所要時間。total は呼び出し元で設定する
+        """
+        raise NotImplementedError()
+
+
+class AsyncTransport(_HookedTransport):
+    """asyncio のイベントループ上で HTTP リクエストを送信するトランスポート
+
+    Transport の各メソッドをコルーチンとして提供する。継承して利用する。
+    サブクラスは _prepare とコルーチンの _send を実装する。
+    フックは送信したタスクのコンテキストで呼び出される。
+    """
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def request(self, method, url, **kwargs):
+        """リクエストを送信してレスポンスを返す
+
+        引数と戻り値は Transport.request と同じ。
+        """
+        prepared, request, hooks = self._before_request(method, url, kwargs)
+        start = time.monotonic()
+        try:
+            res, timings = await self._send(prepared)
+        except Exception as e:
+            self._after_error(request, hooks, e, start)
+            raise
+        self._after_response(request, hooks, res, timings, start)
+        return res
+
+    async def close(self):
+        """保持している接続などを解放する"""
+
+    async def _send(self, prepared):
+        """リクエストを送信する
+
+        Returns:
+            Tuple[Any, Timings]: レスポンスと所要時間。total は呼び出し元で設定する
+        """
+        raise NotImplementedError()
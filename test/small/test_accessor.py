@@ -0,0 +1,68 @@
+import unittest
+from dialogapi.test.accessor import MissingValueException
+from dialogapi.test.accessor import compile_accessor
+
+
+RESPONSE = {
+    "systemText": {"expression": "こんにちは", "utterance": "こんにちは"},
+    "items": [
+        {"id": "a", "tags": ["x", "y"]},
+        {"id": "b", "tags": ["z"]},
+    ],
+}
+
+
+class ResponseAccessorTest(unittest.TestCase):
+    def test_key(self):
+        accessor = compile_accessor("response.systemText.expression")
+        self.assertEqual(accessor.path, "response.systemText.expression")
+        self.assertEqual(accessor.get(RESPONSE), "こんにちは")
+
+    def test_response(self):
+        self.assertEqual(compile_accessor("response").get(RESPONSE), RESPONSE)
+
+    def test_index(self):
+        self.assertEqual(
+            compile_accessor("response.items[1].id").get(RESPONSE), "b"
+        )
+        self.assertEqual(
+            compile_accessor("response.items[-1].tags[0]").get(RESPONSE), "z"
+        )
+
+    def test_wildcard(self):
+        self.assertEqual(
+            compile_accessor("response.items[*].id").get(RESPONSE), ["a", "b"]
+        )
+        self.assertEqual(
+            compile_accessor("response.items[*].tags[*]").get(RESPONSE),
+            ["x", "y", "z"]
+        )
+        self.assertEqual(
+            compile_accessor("response.items[*].tags[0]").get(RESPONSE),
+            ["x", "z"]
+        )
+
+    def test_cache(self):
+        self.assertIs(compile_accessor("response.items[*].id"),
+                      compile_accessor("response.items[*].id"))
+
+    def test_missing(self):
+        for param, reason in [
+            ("response.systemText.command", 'key "command" not found'),
+            ("response.systemText.expression.text",
+             'cannot get key "text" from str'),
+            ("response.items[2]", "index 2 out of range for length 2"),
+            ("response.systemText[0]", "cannot get index 0 from dict"),
+            ("response.systemText[*]", "cannot get [*] from dict"),
+            ("response.items[*].name", 'key "name" not found'),
+        ]:
+            with self.assertRaises(MissingValueException) as cm:
+                compile_accessor(param).get(RESPONSE)
+            self.assertEqual(cm.exception.path, param)
+            self.assertEqual(cm.exception.reason, reason)
+
+    def test_invalid(self):
+        for param in ["systemText.expression", "response..expression",
+                      "response.items[a]", "response.items[*"]:
+            with self.assertRaises(ValueError):
+                compile_accessor(param)
@@ -0,0 +1,225 @@
+import unittest
+import asyncio
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from dialogapi.async_repository_factory import AsyncRepositoryFactory
+from dialogapi.repository_factory import RepositoryFactory
+from dialogapi.fake_server import FakeServer
+from dialogapi.fake_server import MANAGEMENT_PREFIX
+from dialogapi.fake_server import REGISTRATION_PREFIX
+from dialogapi.fake_server import DIALOGUE_PREFIX
+from dialogapi.server import Endpoint
+from dialogapi.server import Server
+from dialogapi.transport import TransportHook
+from dialogapi.entity import User
+from dialogapi.entity import Project
+from dialogapi.entity import Bot
+from dialogapi.entity import AIML
+from dialogapi.entity import Property
+from dialogapi.entity import Config
+from dialogapi.entity import Request
+
+
+AIML_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<aiml version="2.4.0" xmlns="http://www.nttdocomo.com/aiml/schema">
+<topic name="conv">
+    <category>
+        <pattern>ハロー</pattern>
+        <template>ワールド</template>
+    </category>
+</topic>
+</aiml>
+"""
+
+
+class ConnectHook(TransportHook):
+    """新しく開いたコネクションの数を数えるフック"""
+    def __init__(self):
+        self.requests = 0
+        self.connects = 0
+
+    def after_response(self, request, response):
+        self.requests += 1
+        if response.timings.connect is not None:
+            self.connects += 1
+
+
+def build_server(fake_server):
+    def endpoint(prefix):
+        return Endpoint(
+            host=fake_server.host, port=fake_server.port, protocol="http",
+            prefix=prefix,
+            header={"content-type": "application/json;charset=utf-8"},
+            ssl_verify=False
+        )
+    return Server(
+        management_endpoint=endpoint(MANAGEMENT_PREFIX),
+        registration_endpoint=endpoint(REGISTRATION_PREFIX),
+        dialogue_endpoint=endpoint(DIALOGUE_PREFIX),
+        user=User(name="user", password="password"),
+        ssl_verify=False
+    )
+
+
+class AsyncRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fake_server = None
+
+    def tearDown(self):
+        if self.fake_server:
+            self.fake_server.stop()
+        self.tmpdir.cleanup()
+
+    def start(self, **kwargs):
+        self.fake_server = FakeServer(
+            projects=["TestProject"], users={"user": "password"}, **kwargs
+        )
+        self.fake_server.start()
+        return build_server(self.fake_server)
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(content)
+        return filename
+
+    def _deploy(self, server, bot):
+        """同期版リポジトリでボットをデプロイする"""
+        repos = RepositoryFactory(server=server)
+        project = Project(name="TestProject")
+        bot_repository = repos.create_bot_repository(project=project)
+        bot_repository.add(bot)
+        repos.create_aiml_repository(project=project, bot=bot).upsert(
+            AIML(self._write("test.aiml", AIML_CONTENT))
+        )
+        bot_repository.compile(bot)
+        bot_repository.transfer(bot)
+
+    def test_setup_and_dialogue(self):
+        repos = AsyncRepositoryFactory(server=self.start())
+        project = Project(name="TestProject")
+        bot = Bot(id_="TestBot")
+        bot_repository = repos.create_bot_repository(project=project)
+        aiml = AIML(self._write("test.aiml", AIML_CONTENT))
+        property_ = Property(self._write("test.property", "name=テスト\n"))
+        config = Config(self._write("test.config", "key=value\n"))
+
+        async def run():
+            async with repos:
+                self.assertFalse(await bot_repository.exists(bot))
+                await bot_repository.add(bot)
+                self.assertTrue(await bot_repository.exists(bot))
+                await repos.create_aiml_repository(
+                    project=project, bot=bot
+                ).upsert(aiml)
+                await repos.create_property_repository(
+                    project=project, bot=bot
+                ).upsert(property_)
+                await repos.create_config_repository(
+                    project=project, bot=bot
+                ).upsert(config)
+                await bot_repository.compile(bot)
+                self.assertTrue(await bot_repository.compile_status(bot))
+                await bot_repository.transfer(bot)
+                self.assertTrue(await bot_repository.transfer_status(bot))
+
+                app = await repos.create_application_repository().register(
+                    bot=bot
+                )
+                return await repos.create_dialogue_repository().dialogue(
+                    Request(app, "ハロー")
+                )
+
+        res = asyncio.run(run())
+        self.assertEqual(res["systemText"]["expression"], "ワールド")
+
+    def test_dialogue_in_flight(self):
+        # 全ての対話リクエストを同時に送信し、遅延は重ならない
+        n = 200
+        server = self.start(latency={"dialogue": 0.5})
+        self._deploy(server, Bot(id_="TestBot"))
+        hook = ConnectHook()
+        server.dialogue_endpoint.transport.add_hook(hook)
+        repos = AsyncRepositoryFactory(server=server, auth=False, limit=None)
+        dialogue_repository = repos.create_dialogue_repository()
+
+        async def run():
+            async with repos:
+                app = await repos.create_application_repository().register(
+                    bot=Bot(id_="TestBot")
+                )
+                return await asyncio.gather(*[
+                    dialogue_repository.dialogue(Request(app, "ハロー"))
+                    for _ in range(n)
+                ])
+
+        start = time.monotonic()
+        responses = asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 0.5 * 5)
+        self.assertEqual(len(responses), n)
+        self.assertEqual(hook.connects, n)
+
+    def test_limit(self):
+        server = self.start(latency={"dialogue": 0.05})
+        self._deploy(server, Bot(id_="TestBot"))
+        hook = ConnectHook()
+        server.dialogue_endpoint.transport.add_hook(hook)
+        repos = AsyncRepositoryFactory(server=server, auth=False, limit=4)
+        dialogue_repository = repos.create_dialogue_repository()
+
+        async def run():
+            async with repos:
+                app = await repos.create_application_repository().register(
+                    bot=Bot(id_="TestBot")
+                )
+                await asyncio.gather(*[
+                    dialogue_repository.dialogue(Request(app, "ハロー"))
+                    for _ in range(20)
+                ])
+
+        asyncio.run(run())
+        # コネクションは limit を超えて開かず、keep-alive で再利用する
+        self.assertEqual(hook.requests, 20)
+        self.assertEqual(hook.connects, 4)
+
+    def test_reauthorize(self):
+        repos = AsyncRepositoryFactory(server=self.start())
+        project_repository = repos.create_project_repository()
+        self.fake_server.expire_tokens()
+
+        async def run():
+            async with repos:
+                return await project_repository.get(
+                    project=Project(name="TestProject")
+                )
+
+        self.assertEqual(asyncio.run(run()).name, "TestProject")
+        self.assertEqual(self.fake_server.request_count("login"), 2)
+
+    def test_without_sraix(self):
+        server = self.start(sraix=False)
+        repos = AsyncRepositoryFactory(server=server)
+        bot_repository = repos.create_bot_repository(
+            project=Project(name="TestProject")
+        )
+        bot_ids = ["TestBot{}".format(i) for i in range(4)]
+
+        async def run():
+            async with repos:
+                await asyncio.gather(*[
+                    bot_repository.add(Bot(id_=bot_id)) for bot_id in bot_ids
+                ])
+                return await bot_repository.get_all()
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bots = asyncio.run(run())
+        # sraix への対応は最初の一つで判定し、警告は一度だけ表示する
+        self.assertFalse(server.capabilities.sraix)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        self.assertEqual(sorted(bot.id_ for bot in bots), bot_ids)
+        self.assertEqual(self.fake_server.request_count("bots"), 4 + 1 + 1)
@@ -0,0 +1,99 @@
+import unittest
+import os
+import tempfile
+import threading
+from dialogapi.auth import Authenticator
+from dialogapi.cache import FileCache
+from dialogapi.entity import User
+from dialogapi.repository import authorized_request
+
+
+class UserRepositoryMock:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def login(self, user):
+        with self._lock:
+            self.count += 1
+            user.set_authorized(access_token="token{}".format(self.count))
+        return user
+
+
+class ResponseMock:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class EndpointMock:
+    """有効なアクセストークン以外には 401 を返すエンドポイントのモック"""
+    def __init__(self, valid_token):
+        self.valid_token = valid_token
+        self.transport = self
+        self.tokens = []
+
+    def get(self, url, headers):
+        self.tokens.append(headers["Authorization"])
+        if headers["Authorization"] == self.valid_token:
+            return ResponseMock(200)
+        return ResponseMock(401)
+
+
+class AuthenticatorTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.cache = FileCache(
+            os.path.join(self._dir.name, "tokens.json"), ttl=60
+        )
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_authorize_cached(self):
+        repository = UserRepositoryMock()
+        user = User(name="TestUser", password="P")
+        Authenticator(repository, user, "key", self.cache).authorize()
+        self.assertEqual(user.access_token, "token1")
+
+        # 二回目はキャッシュしたアクセストークンを使う
+        user2 = User(name="TestUser", password="P")
+        Authenticator(repository, user2, "key", self.cache).authorize()
+        self.assertEqual(user2.access_token, "token1")
+        self.assertTrue(user2.authorized)
+        self.assertEqual(repository.count, 1)
+
+    def test_reauthorize_once(self):
+        repository = UserRepositoryMock()
+        user = User(name="TestUser", password="P")
+        Authenticator(repository, user, "key", self.cache).authorize()
+
+        threads = [
+            threading.Thread(target=user.reauthorize, args=("token1",))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(repository.count, 2)
+        self.assertEqual(user.access_token, "token2")
+        self.assertEqual(self.cache.get("key"), "token2")
+
+    def test_authorized_request_retry(self):
+        repository = UserRepositoryMock()
+        user = User(name="TestUser", password="P", access_token="expired")
+        Authenticator(repository, user, "key").authorize()
+        user.set_authorized(access_token="expired")
+
+        endpoint = EndpointMock(valid_token="token2")
+        res = authorized_request(endpoint, user, "get", "http://example.jp")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(endpoint.tokens, ["expired", "token2"])
+
+    def test_authorized_request_without_authenticator(self):
+        user = User(name="TestUser", access_token="expired")
+        endpoint = EndpointMock(valid_token="token")
+        res = authorized_request(endpoint, user, "get", "http://example.jp")
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(endpoint.tokens, ["expired"])
@@ -0,0 +1,151 @@
+import unittest
+import io
+import threading
+import time
+from dialogapi.bench import Bench
+from dialogapi.bench import BenchRequest
+from dialogapi.bench import LatencyStats
+from dialogapi.bench import OpenLoopBench
+from dialogapi.bench import build_schedule
+from dialogapi.entity import Application
+from dialogapi.entity import Bot
+from dialogapi.repository import StatusCodeException
+
+
+class ApplicationRepositoryMock:
+    def register(self, bot):
+        return Application(bot=bot, app_id="test_app_id")
+
+
+class DialogueRepositoryMock:
+    """「エラー」に対しては 500 を返すモック"""
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def dialogue(self, request):
+        with self._lock:
+            self.count += 1
+        if request.dict()["voiceText"] == "エラー":
+            exc = StatusCodeException()
+            exc.set_status_code(500)
+            raise exc
+        return {"systemText": {"expression": "ok"}}
+
+
+class StallingDialogueRepositoryMock:
+    """最初のリクエストにだけ時間をかけて応答するモック"""
+    def __init__(self, stall):
+        self.stall = stall
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def dialogue(self, request):
+        with self._lock:
+            self.count += 1
+            first = self.count == 1
+        if first:
+            time.sleep(self.stall)
+        return {}
+
+
+class LatencyStatsTest(unittest.TestCase):
+    def test_percentile(self):
+        stats = LatencyStats()
+        self.assertIsNone(stats.percentile(50))
+        for i in range(1, 101):
+            stats.record(i / 1000)
+        self.assertAlmostEqual(stats.percentile(50), 0.05, places=4)
+        self.assertAlmostEqual(stats.percentile(99.9), 0.1, places=4)
+
+        other = LatencyStats()
+        other.record_error("status 500")
+        stats.merge(other)
+        self.assertEqual(stats.count, 100)
+        self.assertEqual(stats.error_count, 1)
+
+
+class BenchTest(unittest.TestCase):
+    def build_bench(self, repository, **kwargs):
+        corpus = [
+            BenchRequest(name="hello", request={"voiceText": "こんにちは"}),
+            BenchRequest(name="error", request={"voiceText": "エラー"}),
+        ]
+        return Bench(
+            ApplicationRepositoryMock(), repository,
+            Bot(id_="JP_testBot"), corpus, **kwargs
+        )
+
+    def test_run(self):
+        repository = DialogueRepositoryMock()
+        result = self.build_bench(
+            repository, concurrency=4, duration=0.2
+        ).run()
+
+        self.assertEqual(list(result.tasks), ["hello", "error"])
+        self.assertEqual(
+            result.total.count + result.total.error_count, repository.count
+        )
+        self.assertEqual(result.tasks["error"].count, 0)
+        self.assertEqual(
+            result.tasks["error"].errors["status 500"],
+            result.total.error_count
+        )
+
+        out = io.StringIO()
+        result.report(out=out)
+        self.assertIn("p99.9", out.getvalue())
+        self.assertIn("error status 500", out.getvalue())
+
+    def test_rate(self):
+        repository = DialogueRepositoryMock()
+        self.build_bench(
+            repository, concurrency=4, rate=50, duration=0.5
+        ).run()
+        self.assertLessEqual(repository.count, 30)
+        self.assertGreaterEqual(repository.count, 15)
+
+
+class OpenLoopBenchTest(unittest.TestCase):
+    def test_build_schedule(self):
+        schedule = list(build_schedule(rate=10, duration=1))
+        self.assertEqual(len(schedule), 10)
+        self.assertEqual(schedule[0], 0)
+        self.assertAlmostEqual(schedule[-1], 0.9)
+
+        schedule = list(build_schedule(
+            rate=1000, duration=1, arrival="poisson"
+        ))
+        self.assertTrue(800 < len(schedule) < 1200)
+        self.assertEqual(schedule, sorted(schedule))
+
+    def test_build_schedule_phase(self):
+        schedule = list(build_schedule(rate=10, duration=1, phase=0.05))
+        self.assertEqual(len(schedule), 10)
+        self.assertEqual(schedule[0], 0.05)
+        self.assertAlmostEqual(schedule[-1], 0.95)
+
+    def test_run_stall(self):
+        # 一つのワーカーが 0.3 秒停滞する間に予定したリクエストは遅れ、
+        # そのレイテンシは送信予定時刻から計測される
+        repository = StallingDialogueRepositoryMock(stall=0.3)
+        corpus = [BenchRequest(name="hello", request={"voiceText": "a"})]
+        result = OpenLoopBench(
+            ApplicationRepositoryMock(), repository,
+            Bot(id_="JP_testBot"), corpus,
+            rate=50, concurrency=1, duration=0.6, max_lag=0.2
+        ).run()
+
+        self.assertTrue(result.open_loop)
+        self.assertGreater(result.dropped, 0)
+        self.assertGreater(result.late, 0)
+        self.assertEqual(
+            result.total.count + result.dropped,
+            len(list(build_schedule(rate=50, duration=0.6)))
+        )
+        self.assertGreaterEqual(result.total.percentile(100), 0.3)
+        self.assertGreaterEqual(result.lag.percentile(100), 0.1)
+
+        out = io.StringIO()
+        result.report(out=out)
+        self.assertIn("dropped {}".format(result.dropped), out.getvalue())
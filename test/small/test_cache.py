@@ -0,0 +1,201 @@
+import unittest
+import os
+import stat
+import tempfile
+import threading
+from dialogapi.cache import FileCache
+from dialogapi.entity import Project
+from dialogapi.entity import User
+from dialogapi.repository import StatusCodeException
+from dialogapi.repository_factory import RepositoryFactory
+from dialogapi.server import Endpoint
+from dialogapi.server import Server
+
+
+class FileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self._dir.name, "cache", "test.json")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_get_set(self):
+        cache = FileCache(self.filename, ttl=60)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", {"id": 1})
+        # 別のインスタンスからも参照できる
+        self.assertEqual(FileCache(self.filename, ttl=60).get("key"),
+                         {"id": 1})
+        mode = stat.S_IMODE(os.stat(self.filename).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_expired(self):
+        cache = FileCache(self.filename, ttl=60)
+        cache.set("key", "value", ttl=-1)
+        self.assertIsNone(cache.get("key"))
+
+    def test_invalidate(self):
+        cache = FileCache(self.filename, ttl=60)
+        cache.set("key1", "value1")
+        cache.set("key2", "value2")
+        cache.invalidate("key1")
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.get("key2"), "value2")
+        cache.invalidate()
+        self.assertIsNone(cache.get("key2"))
+
+    def test_update(self):
+        cache = FileCache(self.filename, ttl=60)
+        cache.update("key", lambda value: (value or []) + [1])
+        cache.update("key", lambda value: (value or []) + [2])
+        self.assertEqual(cache.get("key"), [1, 2])
+        # None を返した場合は削除する
+        cache.update("key", lambda value: None)
+        self.assertIsNone(cache.get("key"))
+
+    def test_update_concurrent(self):
+        # 同時に更新しても値は失われない
+        def append(i):
+            FileCache(self.filename, ttl=60).update(
+                "key", lambda value: (value or []) + [i]
+            )
+
+        threads = [threading.Thread(target=append, args=(i,))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(FileCache(self.filename, ttl=60).get("key")),
+            list(range(20))
+        )
+
+    def test_broken_file(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, "w") as f:
+            f.write("{")
+        cache = FileCache(self.filename, ttl=60)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+
+
+class ProjectRepositoryMock:
+    def __init__(self):
+        self.count = 0
+
+    def get(self, project):
+        self.count += 1
+        return Project(name=project.name, id_=754)
+
+
+class ProjectScopedRepositoryMock:
+    """プロジェクトID 754 以外には 404 を返すリポジトリのモック"""
+    def __init__(self, endpoint, user, project, bot):
+        self._project = project
+
+    def upsert(self, aiml):
+        if self._project.id_ != 754:
+            exc = StatusCodeException("not found")
+            exc.set_status_code(404)
+            raise exc
+        return aiml
+
+
+class MissingRepositoryMock(ProjectScopedRepositoryMock):
+    """常に 404 を返すリポジトリのモック"""
+    def upsert(self, aiml):
+        exc = StatusCodeException("not found")
+        exc.set_status_code(404)
+        raise exc
+
+
+class RepositoryFactoryProjectCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.cache = FileCache(
+            os.path.join(self._dir.name, "projects.json"), ttl=60
+        )
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def build_factory(self, repository):
+        endpoint = Endpoint(
+            host="host.example.jp", port=443, protocol="https",
+            prefix="/management", header={}, ssl_verify=True
+        )
+        server = Server(
+            management_endpoint=endpoint, registration_endpoint=None,
+            dialogue_endpoint=None, user=User(name="TestUser"),
+            ssl_verify=True
+        )
+        factory = RepositoryFactory(
+            server=server, auth=False, project_cache=self.cache
+        )
+        factory.create_project_repository = lambda: repository
+        return factory
+
+    def test_get_project(self):
+        repository = ProjectRepositoryMock()
+        factory = self.build_factory(repository)
+        for _ in range(3):
+            project = factory.get_project(Project(name="DA"))
+            self.assertEqual(project.id_, 754)
+        self.assertEqual(repository.count, 1)
+
+        # 別のファクトリからはファイルキャッシュを参照する
+        repository2 = ProjectRepositoryMock()
+        project = self.build_factory(repository2).get_project(
+            Project(name="DA")
+        )
+        self.assertEqual(project.id_, 754)
+        self.assertEqual(repository2.count, 0)
+
+    def test_invalidate_project_cache(self):
+        repository = ProjectRepositoryMock()
+        factory = self.build_factory(repository)
+        factory.get_project(Project(name="DA"))
+        factory.invalidate_project_cache(Project(name="DA"))
+        factory.get_project(Project(name="DA"))
+        self.assertEqual(repository.count, 2)
+
+    def test_stale_project_cache(self):
+        # 古いプロジェクトIDをキャッシュしている場合は一度だけ再送する
+        factory = self.build_factory(ProjectRepositoryMock())
+        key = factory._project_cache_key(Project(name="DA"))
+        self.cache.set(key, {"id": 1})
+
+        repository = ProjectRepositoryMock()
+        factory = self.build_factory(repository)
+        aiml, set_ = [
+            factory._bot_repos(
+                ProjectScopedRepositoryMock, Project(name="DA"), None
+            )
+            for _ in range(2)
+        ]
+        self.assertEqual(aiml.upsert(aiml="a.aiml"), "a.aiml")
+        self.assertEqual(repository.count, 1)
+        self.assertEqual(self.cache.get(key), {"id": 754})
+        # 同じ古いプロジェクトIDで作成した他のリポジトリは解決済みの値で再送する
+        self.assertEqual(set_.upsert(aiml="b.aiml"), "b.aiml")
+        self.assertEqual(repository.count, 1)
+
+    def test_not_found_after_retry(self):
+        # 再送しても 404 の場合と、サーバに問い合わせたプロジェクトIDでの
+        # 404 はそのまま送出する
+        factory = self.build_factory(ProjectRepositoryMock())
+        key = factory._project_cache_key(Project(name="DA"))
+        self.cache.set(key, {"id": 1})
+
+        repository = ProjectRepositoryMock()
+        factory = self.build_factory(repository)
+        aiml = factory._bot_repos(
+            MissingRepositoryMock, Project(name="DA"), None
+        )
+        for _ in range(2):
+            with self.assertRaises(StatusCodeException):
+                aiml.upsert(aiml="a.aiml")
+        self.assertEqual(repository.count, 1)
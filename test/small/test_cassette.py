@@ -0,0 +1,149 @@
+import unittest
+import os
+import tempfile
+from dialogapi.cassette import Cassette
+from dialogapi.cassette import CassetteMissException
+from dialogapi.entity import Application
+from dialogapi.entity import Bot
+from dialogapi.entity import Request
+from dialogapi.repository import StatusCodeException
+from dialogapi.repository import assert_status_code
+
+
+class ApplicationRepositoryMock:
+    def __init__(self):
+        self.count = 0
+
+    def register(self, bot,
+                 app_id=None, app_kind="dialogapi", notification="false"):
+        self.count += 1
+        return Application(bot=bot, app_id="app{}".format(self.count))
+
+
+class DialogRepositoryMock:
+    """発話と対話の回数を返すモック。"エラー" に対しては 500 を返す"""
+    def __init__(self):
+        self.count = 0
+
+    def dialogue(self, request):
+        self.count += 1
+        voice_text = request.dict()["voiceText"]
+        if voice_text == "エラー":
+            assert_status_code(200, 500)
+        return {"systemText": {
+            "expression": "{}{}".format(voice_text, self.count)
+        }}
+
+
+class NetworkRepositoryMock:
+    """再生時に呼び出されないことを確認するモック"""
+    def register(self, bot, **argv):
+        raise AssertionError("network access")
+
+    def dialogue(self, request):
+        raise AssertionError("network access")
+
+
+class CassetteTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot = Bot(id_="bot")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _record(self, filename):
+        with Cassette(filename, mode="record") as cassette:
+            app_repo = cassette.wrap_application_repository(
+                ApplicationRepositoryMock()
+            )
+            dialogue_repo = cassette.wrap_dialogue_repository(
+                DialogRepositoryMock()
+            )
+            responses = []
+            for _ in range(2):
+                app = app_repo.register(bot=self.bot)
+                for text in ["こんにちは", "こんにちは"]:
+                    responses.append(dialogue_repo.dialogue(
+                        Request(app, text, appRecvTime="2020-01-01 00:00:00")
+                    ))
+            with self.assertRaises(StatusCodeException):
+                dialogue_repo.dialogue(Request(app, "エラー"))
+        return responses
+
+    def _replay(self, filename):
+        cassette = Cassette(filename, mode="replay")
+        app_repo = cassette.wrap_application_repository(
+            NetworkRepositoryMock()
+        )
+        dialogue_repo = cassette.wrap_dialogue_repository(
+            NetworkRepositoryMock()
+        )
+        return cassette, app_repo, dialogue_repo
+
+    def test_replay(self):
+        filename = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        recorded = self._record(filename)
+
+        _, app_repo, dialogue_repo = self._replay(filename)
+        responses = []
+        app_ids = []
+        for _ in range(2):
+            app = app_repo.register(bot=self.bot)
+            app_ids.append(app.app_id)
+            for text in ["こんにちは", "こんにちは"]:
+                # 実行毎に変わるパラメータはキーに影響しない
+                responses.append(dialogue_repo.dialogue(
+                    Request(app, text, appRecvTime="2021-01-01 00:00:00")
+                ))
+        self.assertEqual(app_ids, ["app1", "app2"])
+        self.assertEqual(responses, recorded)
+
+    def test_replay_context(self):
+        filename = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        self._record(filename)
+
+        # 同じ発話でも対話の何番目かによって応答が異なる
+        _, _, dialogue_repo = self._replay(filename)
+        app = Application(bot=self.bot, app_id="other")
+        first = dialogue_repo.dialogue(Request(app, "こんにちは"))
+        second = dialogue_repo.dialogue(Request(app, "こんにちは"))
+        self.assertEqual(first["systemText"]["expression"], "こんにちは1")
+        self.assertEqual(second["systemText"]["expression"], "こんにちは2")
+
+    def test_replay_error(self):
+        filename = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        self._record(filename)
+
+        _, _, dialogue_repo = self._replay(filename)
+        app = Application(bot=self.bot, app_id="other")
+        dialogue_repo.dialogue(Request(app, "こんにちは"))
+        dialogue_repo.dialogue(Request(app, "こんにちは"))
+        with self.assertRaises(StatusCodeException) as cm:
+            dialogue_repo.dialogue(Request(app, "エラー"))
+        self.assertEqual(cm.exception.status_code, 500)
+
+    def test_replay_miss(self):
+        filename = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        self._record(filename)
+
+        _, _, dialogue_repo = self._replay(filename)
+        app = Application(bot=self.bot, app_id="other")
+        with self.assertRaises(CassetteMissException):
+            dialogue_repo.dialogue(Request(app, "さようなら"))
+
+    def test_gzip(self):
+        filename = os.path.join(self.tmpdir.name, "cassette.jsonl.gz")
+        recorded = self._record(filename)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+
+        _, app_repo, dialogue_repo = self._replay(filename)
+        app = app_repo.register(bot=self.bot)
+        self.assertEqual(
+            dialogue_repo.dialogue(Request(app, "こんにちは")), recorded[0]
+        )
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Cassette("cassette.jsonl", mode="rewind")
@@ -0,0 +1,61 @@
+import unittest
+import io
+from contextlib import redirect_stdout
+from dialogapi.entity import Application
+from dialogapi.entity import Bot
+from dialogapi.test.method import AssertionMethodFactory
+from dialogapi.test.task import Test
+from dialogapi.test.task import Task
+from dialogapi.test.task import TaskConfig
+from dialogapi.test.task import TaskManager
+import dialogapi.command as command
+
+
+class ApplicationRepositoryMock:
+    def register(self, bot):
+        return Application(bot=bot, app_id="test_app_id")
+
+
+class DialogRepositoryMock:
+    def dialogue(self, request):
+        return {"systemText": {"expression": request.dict()["botId"]}}
+
+
+def build_tests(bot_id, expected, n_tasks):
+    factory = AssertionMethodFactory()
+    tasks = [
+        Task(
+            name="{}-{}".format(bot_id, i),
+            request={"voiceText": "ハロー"},
+            tests=[Test(method=factory.build("equal"),
+                        param="response.systemText.expression",
+                        expected=expected)]
+        )
+        for i in range(n_tasks)
+    ]
+    return [TaskManager(tasks=tasks, config=TaskConfig(keep_app_id=True))]
+
+
+class ProjectTestTest(unittest.TestCase):
+    def test_project_test(self):
+        bot_tests = [
+            (Bot(id_="Bot1"), build_tests("Bot1", "Bot1", 1)),
+            (Bot(id_="Bot2"), build_tests("Bot2", "NG", 3)),
+            (Bot(id_="Bot3"), build_tests("Bot3", "Bot3", 2)),
+        ]
+        out = io.StringIO()
+        with redirect_stdout(out):
+            results = command.project_test(
+                ApplicationRepositoryMock(), DialogRepositoryMock(),
+                bot_tests, workers=3
+            )
+        self.assertEqual(results, [True, False, True])
+
+        # 出力はボット毎にまとまり、ボットの定義順となる
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line for line in lines if line.startswith("Testing")],
+            ["Testing bot Bot1", "Testing bot Bot2", "Testing bot Bot3"]
+        )
+        self.assertEqual(lines.index("Testing bot Bot2"), 2)
+        self.assertEqual(lines.index("Testing bot Bot3"), 6)
@@ -27,6 +27,8 @@ servers:
         prefix: /SpontaneousDialogueServer/dialogue
         header:
           content-type: application/json;charset=utf-8
+        pool_connections: 1
+        pool_maxsize: 64
 
 projects:
 - name: TestProject
@@ -107,6 +109,26 @@ class ParserTest(unittest.TestCase):
              "SpontaneousDialogueServer/dialogue/testend")
         )
 
+    def test_server_endpoint_pool(self):
+        server, _ = build_config()
+        # 指定しない場合は requests のデフォルト値となる
+        requests = server.management_endpoint.requests
+        self.assertEqual(requests.pool_connections, 10)
+        self.assertEqual(requests.pool_maxsize, 10)
+
+        requests = server.dialogue_endpoint.requests
+        self.assertEqual(requests.pool_connections, 1)
+        self.assertEqual(requests.pool_maxsize, 64)
+
+    def test_server_deploy_config(self):
+        server, _ = build_config()
+        self.assertEqual(server.deploy_config.max_concurrent_compiles, 4)
+
+    def test_server_capabilities(self):
+        server, _ = build_config()
+        self.assertIsNone(server.capabilities.sraix)
+        self.assertEqual(server.cache_config.capability_ttl, 86400)
+
     def test_bucket_get_project(self):
         _, bucket = build_config()
         project = bucket.get_project(project="TestProject")
@@ -0,0 +1,162 @@
+import unittest
+import io
+import multiprocessing
+import sys
+import threading
+from dialogapi.bench import Bench
+from dialogapi.bench import BenchRequest
+from dialogapi.bench import BenchResult
+from dialogapi.distributed_bench import Coordinator
+from dialogapi.distributed_bench import DistributedBenchException
+from dialogapi.distributed_bench import build_assignments
+from dialogapi.distributed_bench import parse_address
+from dialogapi.distributed_bench import run_worker
+from dialogapi.distributed_bench import split_corpus
+from dialogapi.entity import Application
+from dialogapi.entity import Bot
+
+
+class ApplicationRepositoryMock:
+    def register(self, bot):
+        return Application(bot=bot, app_id="test_app_id")
+
+
+class DialogueRepositoryMock:
+    def __init__(self):
+        self.voice_texts = []
+        self._lock = threading.Lock()
+
+    def dialogue(self, request):
+        with self._lock:
+            self.voice_texts.append(request.dict()["voiceText"])
+        return {}
+
+
+CORPUS = [
+    BenchRequest(name="task{}".format(i), request={"voiceText": str(i)})
+    for i in range(5)
+]
+
+
+def run_worker_quietly(address, build_bench):
+    # 失敗はコーディネータ側で検証する
+    try:
+        run_worker(address, b"secret", build_bench)
+    except Exception:
+        pass
+
+
+class DistributedBenchTest(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address("localhost:7000"), ("localhost", 7000))
+        with self.assertRaises(ValueError):
+            parse_address("localhost")
+
+    def test_split_corpus(self):
+        shares = [split_corpus(CORPUS, i, 2) for i in range(2)]
+        self.assertEqual(sorted(shares[0] + shares[1]), sorted(CORPUS))
+        self.assertEqual(split_corpus(CORPUS[:1], 1, 2), CORPUS[:1])
+
+    def test_build_assignments(self):
+        assignments = build_assignments(
+            3, "P", "B", concurrency=4, rate=30, duration=1
+        )
+        self.assertEqual(
+            [a["concurrency"] for a in assignments], [2, 1, 1]
+        )
+        self.assertEqual([a["rate"] for a in assignments], [10, 10, 10])
+        # 全体で一定間隔になるように、ワーカー毎に送信予定時刻をずらす
+        self.assertEqual(
+            [a["phase"] for a in assignments], [0, 1 / 30, 2 / 30]
+        )
+
+        assignments = build_assignments(
+            2, "P", "B", concurrency=2, rate=None, duration=1
+        )
+        self.assertEqual([a["phase"] for a in assignments], [0, 0])
+
+    def test_build_assignments_concurrency(self):
+        with self.assertRaises(ValueError):
+            build_assignments(3, "P", "B", concurrency=2, rate=30, duration=1)
+
+    def run_coordinator(self, build_bench, workers=2):
+        assignments = build_assignments(
+            workers, "P", "JP_testBot", concurrency=2, rate=None,
+            duration=0.3, interval=0.1
+        )
+        coordinator = Coordinator(
+            ("127.0.0.1", 0), b"secret", assignments, out=io.StringIO()
+        )
+        threads = [
+            threading.Thread(
+                target=run_worker_quietly,
+                args=(coordinator.address, build_bench)
+            )
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            return coordinator.run()
+        finally:
+            for thread in threads:
+                thread.join()
+
+    def test_run(self):
+        repository = DialogueRepositoryMock()
+
+        def build_bench(assignment):
+            return Bench(
+                ApplicationRepositoryMock(), repository, Bot(id_="JP_testBot"),
+                split_corpus(
+                    CORPUS, assignment["index"], assignment["workers"]
+                ),
+                concurrency=assignment["concurrency"],
+                duration=assignment["duration"]
+            )
+
+        result = self.run_coordinator(build_bench)
+        self.assertEqual(result.total.count, len(repository.voice_texts))
+        self.assertEqual(
+            set(repository.voice_texts), {"0", "1", "2", "3", "4"}
+        )
+        self.assertGreater(result.duration, 0)
+
+        # 辞書への変換と復元で結果は変わらない
+        restored = BenchResult.from_dict(result.to_dict())
+        self.assertEqual(restored.to_dict(), result.to_dict())
+
+    def test_run_worker_error(self):
+        def build_bench(assignment):
+            raise Exception("broken config")
+
+        with self.assertRaisesRegex(DistributedBenchException, "broken"):
+            self.run_coordinator(build_bench)
+
+    def test_accept_timeout(self):
+        # 接続しないワーカーを名前を挙げて報告する
+        coordinator = Coordinator(
+            ("127.0.0.1", 0), b"secret",
+            build_assignments(2, "P", "B", concurrency=2, rate=None,
+                              duration=0.1),
+            out=io.StringIO(), accept_timeout=0.2
+        )
+        with self.assertRaisesRegex(
+            DistributedBenchException, "Workers 0, 1 did not connect"
+        ):
+            coordinator.run()
+
+    def test_worker_process_exited(self):
+        process = multiprocessing.Process(target=sys.exit, args=(3,))
+        coordinator = Coordinator(
+            ("127.0.0.1", 0), b"secret",
+            build_assignments(1, "P", "B", concurrency=1, rate=None,
+                              duration=0.1),
+            out=io.StringIO(), processes=[process]
+        )
+        process.start()
+        process.join()
+        with self.assertRaisesRegex(
+            DistributedBenchException, "Workers 0 .*exited with code 3"
+        ):
+            coordinator.run()
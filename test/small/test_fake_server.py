@@ -0,0 +1,236 @@
+import unittest
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from dialogapi.auth import Authenticator
+from dialogapi.fake_server import FakeServer
+from dialogapi.fake_server import MANAGEMENT_PREFIX
+from dialogapi.fake_server import REGISTRATION_PREFIX
+from dialogapi.fake_server import DIALOGUE_PREFIX
+from dialogapi.fake_server import parse_operation_settings
+from dialogapi.server import Capabilities
+from dialogapi.server import Endpoint
+from dialogapi.repository import StatusCodeException
+from dialogapi.repository import UserRepository
+from dialogapi.repository import ProjectRepository
+from dialogapi.repository import BotRepository
+from dialogapi.repository import AIMLRepository
+from dialogapi.repository import PropertyRepository
+from dialogapi.repository import ConfigRepository
+from dialogapi.repository import ApplicationRepository
+from dialogapi.repository import DialogueRepository
+from dialogapi.entity import User
+from dialogapi.entity import Project
+from dialogapi.entity import Bot
+from dialogapi.entity import AIML
+from dialogapi.entity import Property
+from dialogapi.entity import Config
+from dialogapi.entity import Request
+
+
+AIML_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<aiml version="2.4.0" xmlns="http://www.nttdocomo.com/aiml/schema">
+<topic name="conv">
+    <category>
+        <pattern>ハロー</pattern>
+        <template>
+            ワールド
+        </template>
+    </category>
+    <category>
+        <pattern>こんにちは</pattern>
+        <template>
+            こんにちは！
+            <random>
+                <li><srai>ask-name</srai></li>
+            </random>
+        </template>
+    </category>
+    <category>
+        <pattern>ask-name</pattern>
+        <template id="ask-name">名前は？</template>
+    </category>
+    <category>
+        <pattern>*</pattern>
+        <that id="ask-name" />
+        <template>なるほど</template>
+    </category>
+</topic>
+</aiml>
+"""
+
+
+def _endpoint(server, prefix):
+    return Endpoint(
+        host=server.host, port=server.port, protocol="http",
+        prefix=prefix,
+        header={"content-type": "application/json;charset=utf-8"},
+        ssl_verify=False
+    )
+
+
+class FakeServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.server = FakeServer(
+            projects=["TestProject"], users={"user": "password"}
+        )
+        self.server.start()
+        self.management = _endpoint(self.server, MANAGEMENT_PREFIX)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmpdir.cleanup()
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(content)
+        return filename
+
+    def _login(self):
+        user = User(name="user", password="password")
+        return Authenticator(
+            UserRepository(endpoint=self.management), user, key="fake"
+        ).authorize()
+
+    def _project(self, user):
+        return ProjectRepository(endpoint=self.management, user=user).get(
+            project=Project(name="TestProject")
+        )
+
+    def test_login_failure(self):
+        with self.assertRaises(StatusCodeException) as cm:
+            UserRepository(endpoint=self.management).login(
+                user=User(name="user", password="wrong")
+            )
+        self.assertEqual(cm.exception.status_code, 401)
+
+    def test_setup_and_dialogue(self):
+        user = self._login()
+        project = self._project(user)
+        bot = Bot(id_="TestBot")
+        bot_repository = BotRepository(
+            endpoint=self.management, user=user, project=project
+        )
+
+        self.assertFalse(bot_repository.exists(bot))
+        bot_repository.add(bot)
+        self.assertTrue(bot_repository.exists(bot))
+        self.assertEqual(
+            [bot_.id_ for bot_ in bot_repository.get_all()], ["TestBot"]
+        )
+
+        AIMLRepository(
+            endpoint=self.management, user=user, project=project, bot=bot
+        ).upsert(AIML(self._write("test.aiml", AIML_CONTENT)))
+        property_repository = PropertyRepository(
+            endpoint=self.management, user=user, project=project, bot=bot
+        )
+        self.assertFalse(property_repository.exists())
+        property_repository.upsert(
+            Property(self._write("test.property", "name=テスト\n"))
+        )
+        ConfigRepository(
+            endpoint=self.management, user=user, project=project, bot=bot
+        ).upsert(Config(self._write("test.config", "key=value\n")))
+
+        bot_repository.compile(bot)
+        self.assertTrue(bot_repository.compile_status(bot))
+        bot_repository.transfer(bot)
+        self.assertTrue(bot_repository.transfer_status(bot))
+
+        app = ApplicationRepository(
+            endpoint=_endpoint(self.server, REGISTRATION_PREFIX)
+        ).register(bot=bot)
+        dialogue_repository = DialogueRepository(
+            endpoint=_endpoint(self.server, DIALOGUE_PREFIX)
+        )
+        res = dialogue_repository.dialogue(Request(app, "ハロー"))
+        self.assertEqual(res["systemText"]["expression"], "ワールド")
+        res = dialogue_repository.dialogue(Request(app, "こんにちは"))
+        self.assertEqual(res["systemText"]["expression"], "こんにちは！名前は？")
+        res = dialogue_repository.dialogue(Request(app, "さようなら"))
+        self.assertEqual(res["systemText"]["expression"], "NOMATCH")
+
+        bot_repository.remove(bot)
+        self.assertEqual(bot_repository.get_all(), [])
+
+    def test_compile_in_progress(self):
+        self.server.stop()
+        self.server = FakeServer(projects=["TestProject"], compile_time=60)
+        self.server.start()
+        self.management = _endpoint(self.server, MANAGEMENT_PREFIX)
+
+        user = self._login()
+        bot = Bot(id_="TestBot")
+        bot_repository = BotRepository(
+            endpoint=self.management, user=user, project=self._project(user)
+        )
+        bot_repository.add(bot)
+        bot_repository.compile(bot)
+        self.assertFalse(bot_repository.compile_status(bot))
+
+    def test_reauthorize(self):
+        user = self._login()
+        project = self._project(user)
+        self.server.expire_tokens()
+        self.assertEqual(self._project(user).id_, project.id_)
+        self.assertEqual(self.server.request_count("login"), 2)
+
+    def test_fail(self):
+        user = self._login()
+        self.server.fail("projects", status=500, count=2)
+        for _ in range(2):
+            with self.assertRaises(StatusCodeException) as cm:
+                self._project(user)
+            self.assertEqual(cm.exception.status_code, 500)
+        self.assertEqual(self._project(user).name, "TestProject")
+        self.assertEqual(self.server.request_count("projects"), 3)
+
+    def test_failure_rate(self):
+        self.server.stop()
+        self.server = FakeServer(
+            projects=["TestProject"], failure_rate={"projects": 1}
+        )
+        self.server.start()
+        self.management = _endpoint(self.server, MANAGEMENT_PREFIX)
+
+        user = self._login()
+        with self.assertRaises(StatusCodeException) as cm:
+            self._project(user)
+        self.assertEqual(cm.exception.status_code, 503)
+
+    def test_without_sraix(self):
+        self.server.stop()
+        self.server = FakeServer(projects=["TestProject"], sraix=False)
+        self.server.start()
+        self.management = _endpoint(self.server, MANAGEMENT_PREFIX)
+
+        user = self._login()
+        capabilities = Capabilities()
+        bot_repository = BotRepository(
+            endpoint=self.management, user=user, project=self._project(user),
+            capabilities=capabilities
+        )
+        with self.assertRaises(StatusCodeException) as cm:
+            bot_repository.add(Bot(id_="TestBot1"), ignore_sraix=False)
+        self.assertEqual(cm.exception.status_code, 400)
+        with redirect_stdout(io.StringIO()):
+            bot_repository.add(Bot(id_="TestBot2"))
+        self.assertFalse(capabilities.sraix)
+        self.assertEqual(
+            [bot.id_ for bot in bot_repository.get_all()], ["TestBot2"]
+        )
+
+
+class ParseOperationSettingsTest(unittest.TestCase):
+    def test_parse(self):
+        settings = parse_operation_settings(["dialogue=0.5", "0.1"])
+        self.assertEqual(settings["dialogue"], 0.5)
+        self.assertEqual(settings["login"], 0.1)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            parse_operation_settings(["unknown=1"])
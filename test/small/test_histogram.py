@@ -0,0 +1,79 @@
+import unittest
+import os
+import random
+import tempfile
+from dialogapi.histogram import Histogram
+from dialogapi.histogram import HistogramException
+
+
+def exact_percentile(values, percentile):
+    values = sorted(values)
+    index = max(-(-len(values) * percentile // 100) - 1, 0)
+    return values[int(index)]
+
+
+class HistogramTest(unittest.TestCase):
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.count, 0)
+        self.assertIsNone(histogram.percentile(50))
+        self.assertIsNone(histogram.max)
+        self.assertIsNone(histogram.mean)
+
+    def test_percentile(self):
+        random_ = random.Random(0)
+        values = [random_.lognormvariate(-3, 1) for _ in range(10000)]
+        histogram = Histogram()
+        for value in values:
+            histogram.record(value)
+
+        self.assertEqual(histogram.count, 10000)
+        for percentile in [0, 50, 90, 99, 99.9, 100]:
+            expected = exact_percentile(values, percentile)
+            actual = histogram.percentile(percentile)
+            # 有効桁数 3 の精度で一致する
+            self.assertLessEqual(abs(actual - expected), expected * 1e-3)
+        self.assertAlmostEqual(histogram.max, max(values), places=5)
+        self.assertAlmostEqual(
+            histogram.mean, sum(values) / len(values), places=5
+        )
+
+    def test_constant_memory(self):
+        histogram = Histogram()
+        for i in range(100000):
+            histogram.record(0.001 + (i % 1000) * 1e-6)
+        size = len(histogram.to_dict()["counts"])
+        for i in range(100000):
+            histogram.record(0.001 + (i % 1000) * 1e-6)
+        self.assertEqual(len(histogram.to_dict()["counts"]), size)
+
+    def test_highest(self):
+        histogram = Histogram(highest=10)
+        histogram.record(100)
+        histogram.record(-1)
+        self.assertEqual(histogram.max, 10)
+        self.assertEqual(histogram.min, 0)
+
+    def test_merge(self):
+        values = [i / 1000 for i in range(1, 2001)]
+        whole = Histogram()
+        parts = [Histogram(), Histogram()]
+        for i, value in enumerate(values):
+            whole.record(value)
+            parts[i % 2].record(value)
+        parts[0].merge(parts[1])
+        self.assertEqual(parts[0].to_dict(), whole.to_dict())
+
+        with self.assertRaises(HistogramException):
+            whole.merge(Histogram(significant_figures=2))
+
+    def test_dump_load(self):
+        histogram = Histogram()
+        for value in [0.01, 0.02, 0.5]:
+            histogram.record(value)
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "latency.json")
+            histogram.dump(filename)
+            loaded = Histogram.load(filename)
+        self.assertEqual(loaded.to_dict(), histogram.to_dict())
+        self.assertEqual(loaded.percentile(50), histogram.percentile(50))
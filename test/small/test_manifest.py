@@ -0,0 +1,149 @@
+import unittest
+import io
+import os
+import tempfile
+from contextlib import redirect_stderr
+from dialogapi.entity import AIML
+from dialogapi.entity import Bot
+from dialogapi.entity import Set
+from dialogapi.manifest import DeployManifest
+from dialogapi.repository import ScenarioStatus
+import dialogapi.command as command
+
+
+class ManifestTestBase(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.manifest = DeployManifest(
+            os.path.join(self._dir.name, "manifests", "bot.json")
+        )
+        self.aiml = AIML(self.write("test.aiml", "<aiml/>"))
+        self.set = Set(self.write("test.set", "a\nb\n"))
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def write(self, name, content):
+        filename = os.path.join(self._dir.name, name)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(content)
+        return filename
+
+    def plan(self, bot):
+        return self.manifest.plan(bot, [self.aiml], [self.set], [], [], [])
+
+
+class DeployManifestTest(ManifestTestBase):
+    def test_plan_first(self):
+        plan = self.plan(Bot(id_="TestBot"))
+        self.assertTrue(plan.bot_changed)
+        self.assertEqual(plan.aimls, [self.aiml])
+        self.assertEqual(plan.sets, [self.set])
+        self.assertFalse(plan.up_to_date)
+
+    def test_plan_unchanged(self):
+        self.manifest.save(self.plan(Bot(id_="TestBot")))
+        plan = self.plan(Bot(id_="TestBot"))
+        self.assertTrue(plan.up_to_date)
+        self.assertEqual(
+            plan.skipped, [self.aiml.filename, self.set.filename]
+        )
+
+    def test_plan_changed(self):
+        self.manifest.save(self.plan(Bot(id_="TestBot")))
+        self.write("test.aiml", "<aiml></aiml>")
+        plan = self.plan(Bot(id_="TestBot"))
+        self.assertFalse(plan.bot_changed)
+        self.assertEqual(plan.aimls, [self.aiml])
+        self.assertEqual(plan.sets, [])
+
+        plan = self.plan(Bot(id_="TestBot", description="changed"))
+        self.assertTrue(plan.bot_changed)
+
+    def test_remove(self):
+        self.manifest.save(self.plan(Bot(id_="TestBot")))
+        self.manifest.remove()
+        self.manifest.remove()
+        self.assertFalse(self.plan(Bot(id_="TestBot")).up_to_date)
+
+
+class RepositoryMock:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def func(**kwargs):
+            self.calls.append(name)
+            if name in {"compile_state", "transfer_state"}:
+                return ScenarioStatus(True, False, "")
+        return func
+
+
+class FailingRepositoryMock(RepositoryMock):
+    """コンパイルに失敗するリポジトリのモック"""
+    def compile(self, **kwargs):
+        raise RuntimeError("compile failed")
+
+
+class BotSetupIncrementalTest(ManifestTestBase):
+    def bot_setup(self, repository, incremental=True):
+        with redirect_stderr(io.StringIO()):
+            command.bot_setup(
+                repository, repository, repository, repository,
+                repository, repository,
+                bot=Bot(id_="TestBot"), aimls=[self.aiml], sets=[self.set],
+                maps=[], configs=[], properties=[],
+                manifest=self.manifest, incremental=incremental
+            )
+
+    def test_bot_setup(self):
+        repository = RepositoryMock()
+        self.bot_setup(repository)
+        self.assertEqual(repository.calls.count("upsert"), 2)
+        self.assertIn("compile", repository.calls)
+
+        # 変更がない場合はアップロード・コンパイル・転送を行わない
+        repository = RepositoryMock()
+        self.bot_setup(repository)
+        self.assertEqual(repository.calls, [])
+
+        self.write("test.set", "a\n")
+        repository = RepositoryMock()
+        self.bot_setup(repository)
+        self.assertEqual(
+            repository.calls,
+            ["upsert", "compile", "compile_state",
+             "transfer", "transfer_state"]
+        )
+
+    def test_full_deploy_then_revert(self):
+        # 差分デプロイでない場合もマニフェストを更新する
+        self.bot_setup(RepositoryMock())
+        self.write("test.set", "c\n")
+        repository = RepositoryMock()
+        self.bot_setup(repository, incremental=False)
+        self.assertEqual(repository.calls.count("upsert"), 2)
+
+        # 元の内容に戻したファイルはアップロードする
+        self.write("test.set", "a\nb\n")
+        repository = RepositoryMock()
+        self.bot_setup(repository)
+        self.assertEqual(
+            repository.calls,
+            ["upsert", "compile", "compile_state",
+             "transfer", "transfer_state"]
+        )
+
+    def test_failed_deploy(self):
+        self.bot_setup(RepositoryMock())
+        self.write("test.set", "c\n")
+        repository = FailingRepositoryMock()
+        with self.assertRaises(RuntimeError):
+            self.bot_setup(repository)
+
+        # 途中で失敗した後の差分デプロイでは全てをアップロードする
+        self.write("test.set", "a\nb\n")
+        repository = RepositoryMock()
+        self.bot_setup(repository)
+        self.assertEqual(repository.calls.count("upsert"), 2)
+        self.assertIn("compile", repository.calls)
@@ -0,0 +1,212 @@
+import unittest
+import asyncio
+import io
+import os
+import tempfile
+import threading
+from contextlib import redirect_stderr
+from dialogapi.entity import Bot
+from dialogapi.entity import AIML
+from dialogapi.manifest import DeployManifest
+from dialogapi.pipeline import DeployTarget
+from dialogapi.pipeline import DeployException
+from dialogapi.pipeline import PipelinedDeployer
+from dialogapi.pipeline import StatusPoller
+from dialogapi.poller import PollingTimeoutException
+from dialogapi.repository import ScenarioStatus
+from dialogapi.server import DeployConfig
+
+
+class BotRepositoryMock:
+    """コンパイル・転送が2回目の状態確認で完了する asyncio 版リポジトリのモック"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.compiling = set()
+        self.max_compiling = 0
+        self.calls = []
+        self._status_count = {}
+
+    def _record(self, name, bot):
+        with self.lock:
+            self.calls.append((name, bot.id_))
+
+    async def exists(self, bot):
+        return bot.id_ == "Exists"
+
+    async def add(self, bot, ignore_sraix=None):
+        self._record("add", bot)
+        if bot.id_ in {"Exists", "Unknown"}:
+            raise Exception("exists")
+
+    async def update(self, bot, ignore_sraix=None):
+        self._record("update", bot)
+
+    async def compile(self, bot):
+        self._record("compile", bot)
+        with self.lock:
+            self.compiling.add(bot.id_)
+            self.max_compiling = max(self.max_compiling, len(self.compiling))
+
+    def _status(self, name, bot):
+        self._record(name, bot)
+        with self.lock:
+            key = (name, bot.id_)
+            self._status_count[key] = self._status_count.get(key, 0) + 1
+            completed = self._status_count[key] >= 2
+        failed = completed and bot.id_ == "CompileError"
+        return ScenarioStatus(
+            completed=completed and not failed,
+            failed=failed,
+            message="Error: syntax error" if failed else ""
+        )
+
+    async def compile_state(self, bot):
+        status = self._status("compile_state", bot)
+        if status.completed or status.failed:
+            with self.lock:
+                self.compiling.discard(bot.id_)
+        return status
+
+    async def transfer(self, bot):
+        self._record("transfer", bot)
+        if bot.id_ == "Broken":
+            raise Exception("transfer failed")
+
+    async def transfer_state(self, bot):
+        return self._status("transfer_state", bot)
+
+
+class AIMLRepositoryMock:
+    def __init__(self):
+        self.uploaded = []
+
+    async def upsert(self, aiml):
+        self.uploaded.append(aiml.filename)
+
+
+def build_deploy_config(max_concurrent_compiles):
+    return DeployConfig(
+        max_concurrent_compiles=max_concurrent_compiles,
+        poll_initial_interval=0.01,
+        poll_max_interval=0.02,
+        poll_timeout=5
+    )
+
+
+def build_target(bot_repository, bot_id):
+    return DeployTarget(
+        bot_repository=bot_repository,
+        aiml_repository=AIMLRepositoryMock(),
+        set_repository=None, map_repository=None,
+        config_repository=None, property_repository=None,
+        bot=Bot(id_=bot_id), aimls=[AIML("{}.aiml".format(bot_id))],
+        sets=[], maps=[], configs=[], properties=[]
+    )
+
+
+class PipelinedDeployerTest(unittest.TestCase):
+    def test_deploy(self):
+        bot_repository = BotRepositoryMock()
+        targets = [build_target(bot_repository, bot_id)
+                   for bot_id in ["Bot1", "Bot2", "Bot3", "Exists",
+                                  "Unknown"]]
+        deployer = PipelinedDeployer(
+            deploy_config=build_deploy_config(max_concurrent_compiles=2)
+        )
+        with redirect_stderr(io.StringIO()):
+            deployer.deploy(targets)
+
+        self.assertLessEqual(bot_repository.max_compiling, 2)
+        # 既存のボットは追加を試みずに更新する
+        self.assertIn(("update", "Exists"), bot_repository.calls)
+        self.assertNotIn(("add", "Exists"), bot_repository.calls)
+        # 追加に失敗した場合は更新する
+        self.assertIn(("update", "Unknown"), bot_repository.calls)
+        for bot_id in ["Bot1", "Bot2", "Bot3", "Exists", "Unknown"]:
+            self.assertIn(("transfer", bot_id), bot_repository.calls)
+            self.assertEqual(
+                bot_repository.calls.count(("transfer_state", bot_id)), 2
+            )
+
+    def test_deploy_failure(self):
+        bot_repository = BotRepositoryMock()
+        targets = [build_target(bot_repository, bot_id)
+                   for bot_id in ["Bot1", "Broken"]]
+        deployer = PipelinedDeployer(
+            deploy_config=build_deploy_config(max_concurrent_compiles=1)
+        )
+        with redirect_stderr(io.StringIO()):
+            with self.assertRaises(DeployException):
+                deployer.deploy(targets)
+        # 失敗したボット以外はデプロイを完了する
+        self.assertIn(("transfer_state", "Bot1"), bot_repository.calls)
+
+    def test_deploy_compile_error(self):
+        bot_repository = BotRepositoryMock()
+        targets = [build_target(bot_repository, bot_id)
+                   for bot_id in ["CompileError", "Bot1"]]
+        deployer = PipelinedDeployer(
+            deploy_config=build_deploy_config(max_concurrent_compiles=1)
+        )
+        with redirect_stderr(io.StringIO()):
+            with self.assertRaisesRegex(DeployException, "syntax error"):
+                deployer.deploy(targets)
+        self.assertNotIn(("transfer", "CompileError"), bot_repository.calls)
+        self.assertIn(("transfer_state", "Bot1"), bot_repository.calls)
+
+    def test_deploy_manifest(self):
+        # 差分デプロイでない場合もマニフェストを保存し、失敗した場合は削除する
+        with tempfile.TemporaryDirectory() as dirname:
+            bot_repository = BotRepositoryMock()
+            targets = []
+            for bot_id in ["Bot1", "Broken"]:
+                target = build_target(bot_repository, bot_id)
+                filename = os.path.join(dirname, "{}.aiml".format(bot_id))
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.write("<aiml/>")
+                target.aimls = [AIML(filename)]
+                target.manifest = DeployManifest(
+                    os.path.join(dirname, "{}.json".format(bot_id))
+                )
+                # 失敗したボットには古いマニフェストが残っている
+                target.manifest.save(target.manifest.plan(
+                    target.bot, target.aimls, [], [], [], []
+                ))
+                targets.append(target)
+            os.remove(targets[0].manifest.filename)
+
+            deployer = PipelinedDeployer(
+                deploy_config=build_deploy_config(max_concurrent_compiles=1)
+            )
+            with redirect_stderr(io.StringIO()):
+                with self.assertRaises(DeployException):
+                    deployer.deploy(targets)
+            self.assertTrue(os.path.exists(targets[0].manifest.filename))
+            self.assertFalse(os.path.exists(targets[1].manifest.filename))
+
+
+class StatusPollerTest(unittest.TestCase):
+    def poll(self, statuses):
+        calls = []
+
+        async def get_status():
+            calls.append(1)
+            return statuses[min(len(calls), len(statuses)) - 1]
+
+        async def run():
+            poller = StatusPoller(deploy_config=DeployConfig(
+                poll_initial_interval=10, poll_max_interval=10,
+                poll_timeout=0.05
+            ))
+            await poller.wait(get_status, "Compiling")
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+        return len(calls)
+
+    def test_poll_at_deadline(self):
+        # 間隔が期限より長い場合も、期限に最後のポーリングを行う
+        running = ScenarioStatus(completed=False, failed=False, message="")
+        completed = ScenarioStatus(completed=True, failed=False, message="")
+        self.assertEqual(self.poll([running, completed]), 2)
+        with self.assertRaises(PollingTimeoutException):
+            self.poll([running])
@@ -0,0 +1,93 @@
+import unittest
+import time
+from dialogapi.poller import Backoff
+from dialogapi.poller import PollingTimeoutException
+from dialogapi.poller import ScenarioFailedException
+from dialogapi.poller import wait_status
+from dialogapi.repository import ScenarioStatus
+from dialogapi.server import DeployConfig
+
+
+def build_deploy_config(poll_timeout=5):
+    return DeployConfig(
+        poll_initial_interval=0.001,
+        poll_max_interval=0.002,
+        poll_timeout=poll_timeout
+    )
+
+
+class StatusMock:
+    def __init__(self, statuses):
+        self._statuses = list(statuses)
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        if len(self._statuses) > 1:
+            return self._statuses.pop(0)
+        return self._statuses[0]
+
+
+RUNNING = ScenarioStatus(completed=False, failed=False, message="")
+COMPLETED = ScenarioStatus(completed=True, failed=False, message="")
+FAILED = ScenarioStatus(completed=False, failed=True,
+                        message="Error: invalid aiml")
+
+
+class BackoffTest(unittest.TestCase):
+    def test_next(self):
+        backoff = Backoff(initial_interval=1, max_interval=3,
+                          multiplier=2, jitter=0.1)
+        intervals = [backoff.next() for _ in range(4)]
+        for interval, expected in zip(intervals, [1, 2, 3, 3]):
+            self.assertGreaterEqual(interval, expected * 0.9)
+            self.assertLessEqual(interval, min(expected * 1.1, 3))
+
+    def test_next_max_interval(self):
+        # ゆらぎを加えても上限を超えない
+        backoff = Backoff(initial_interval=3, max_interval=3, jitter=0.5)
+        for _ in range(100):
+            self.assertLessEqual(backoff.next(), 3)
+
+
+class WaitStatusTest(unittest.TestCase):
+    def test_completed(self):
+        get_status = StatusMock([RUNNING, RUNNING, COMPLETED])
+        ticks = []
+        wait_status(get_status, "Compiling", build_deploy_config(),
+                    on_tick=lambda: ticks.append(1))
+        self.assertEqual(get_status.count, 3)
+        self.assertEqual(len(ticks), 2)
+
+    def test_failed(self):
+        get_status = StatusMock([RUNNING, FAILED])
+        with self.assertRaisesRegex(ScenarioFailedException, "invalid aiml"):
+            wait_status(get_status, "Compiling", build_deploy_config())
+
+    def test_timeout(self):
+        get_status = StatusMock([RUNNING])
+        with self.assertRaises(PollingTimeoutException):
+            wait_status(get_status, "Compiling",
+                        build_deploy_config(poll_timeout=0.01))
+
+    def test_poll_at_deadline(self):
+        # 間隔が期限より長い場合も、期限に最後のポーリングを行う
+        get_status = StatusMock([RUNNING, COMPLETED])
+        deploy_config = DeployConfig(
+            poll_initial_interval=10, poll_max_interval=10,
+            poll_timeout=0.05
+        )
+        start = time.monotonic()
+        wait_status(get_status, "Compiling", deploy_config)
+        self.assertEqual(get_status.count, 2)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_timeout_after_last_poll(self):
+        get_status = StatusMock([RUNNING])
+        deploy_config = DeployConfig(
+            poll_initial_interval=10, poll_max_interval=10,
+            poll_timeout=0.05
+        )
+        with self.assertRaises(PollingTimeoutException):
+            wait_status(get_status, "Compiling", deploy_config)
+        self.assertEqual(get_status.count, 2)
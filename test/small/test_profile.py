@@ -0,0 +1,136 @@
+import unittest
+import contextvars
+import io
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dialogapi import profile
+from dialogapi.profile import Profiler
+from dialogapi.transport import Timings
+from dialogapi.transport import Transport
+
+
+class ResponseMock:
+    status_code = 200
+    content = b"ok"
+
+
+class TransportMock(Transport):
+    def _prepare(self, method, url, kwargs):
+        return url, 0
+
+    def _send(self, prepared):
+        return ResponseMock(), Timings(None, None, 0.01, None)
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler()
+        self.transport = TransportMock(hooks=[self.profiler.hook()])
+
+    def test_span_inactive(self):
+        with profile.span("setup", bot="bot1"):
+            pass
+        self.assertEqual(self.profiler.spans, [])
+
+    def test_span(self):
+        with self.profiler.activate():
+            with profile.span("setup", bot="bot1"):
+                with profile.span("compile", key="value"):
+                    self.transport.post("http://host/bots/bot1/compile")
+            self.transport.get("http://host/login")
+
+        spans = {span.name: span for span in self.profiler.spans}
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(spans["setup"].category, "phase")
+        self.assertIsNone(spans["setup"].phase)
+        self.assertEqual(spans["compile"].bot, "bot1")
+        self.assertEqual(spans["compile"].phase, "setup")
+        self.assertEqual(spans["compile"].args, {"key": "value"})
+
+        http = spans["POST /bots/bot1/compile"]
+        self.assertEqual(http.category, "http")
+        self.assertEqual(http.bot, "bot1")
+        self.assertEqual(http.phase, "compile")
+        self.assertEqual(http.args["status"], 200)
+        self.assertEqual(http.args["size"], 2)
+        self.assertEqual(http.args["ttfb"], 0.01)
+        self.assertLessEqual(spans["compile"].start, http.start)
+
+        login = spans["GET /login"]
+        self.assertIsNone(login.bot)
+        self.assertIsNone(login.phase)
+
+    def test_span_in_executor(self):
+        def send():
+            self.transport.get("http://host/dialogue")
+            return threading.get_ident()
+
+        with self.profiler.activate(), ThreadPoolExecutor(2) as executor:
+            with profile.span("test", bot="bot1"):
+                context = contextvars.copy_context()
+                thread = executor.submit(context.run, send).result()
+            executor.submit(send).result()
+
+        with_context, without_context = [
+            span for span in self.profiler.spans if span.category == "http"
+        ]
+        self.assertEqual(with_context.thread, thread)
+        self.assertEqual(with_context.bot, "bot1")
+        self.assertEqual(with_context.phase, "test")
+        self.assertIsNone(without_context.bot)
+
+    def test_report(self):
+        with self.profiler.activate():
+            for bot in ["bot1", "bot2"]:
+                with profile.span("compile", bot=bot):
+                    self.transport.post("http://host/compile")
+                    self.transport.get("http://host/status")
+
+        out = io.StringIO()
+        self.profiler.report(out=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Profile by bot and phase")
+        self.assertEqual(lines[1].split()[:3], ["bot", "phase", "count"])
+        bot1 = lines[2].split()
+        self.assertEqual(bot1[:3], ["bot1", "compile", "1"])
+        self.assertEqual(bot1[4], "2")
+        self.assertEqual(lines[4], "Profile by phase")
+        total = lines[6].split()
+        self.assertEqual(total[:3], ["(all)", "compile", "2"])
+        self.assertEqual(total[4], "4")
+
+    def test_chrome_trace(self):
+        with self.profiler.activate():
+            with profile.span("setup", bot="bot1"):
+                self.transport.get("http://host/bots")
+            with profile.span("setup", bot="bot2"):
+                pass
+
+        events = self.profiler.chrome_trace()["traceEvents"]
+        names = {
+            event["tid"]: event["args"]["name"]
+            for event in events if event["ph"] == "M"
+        }
+        spans = [event for event in events if event["ph"] == "X"]
+        self.assertEqual(len(names), 3)
+        self.assertEqual(
+            [(span["name"], span["cat"]) for span in spans],
+            [("setup", "phase"), ("GET /bots", "http"), ("setup", "phase")]
+        )
+        self.assertEqual(names[spans[0]["tid"]], "bot bot1")
+        self.assertEqual(names[spans[2]["tid"]], "bot bot2")
+        self.assertEqual(spans[1]["args"]["bot"], "bot1")
+        for span in spans:
+            self.assertGreaterEqual(span["ts"], 0)
+            self.assertGreaterEqual(span["dur"], 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "trace.json")
+            self.profiler.dump_chrome_trace(filename)
+            with open(filename, encoding="utf-8") as f:
+                self.assertEqual(
+                    len(json.load(f)["traceEvents"]), len(events)
+                )
@@ -0,0 +1,186 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from dialogapi.entity import Application
+from dialogapi.entity import Bot
+from dialogapi.test.method import AssertionMethodFactory
+from dialogapi.test.reporter import JSONLReporter
+from dialogapi.test.reporter import JUnitReporter
+from dialogapi.test.reporter import MultiReporter
+from dialogapi.test.reporter import TaskResult
+from dialogapi.test.reporter import TestRecord
+from dialogapi.test.task import Task
+from dialogapi.test.task import TaskConfig
+from dialogapi.test.task import TaskManager
+from dialogapi.test.task import Test
+
+
+PASSED = TaskResult(
+    name="挨拶テスト", bot="bot1", suite="hello_test.yml",
+    request={"voiceText": "ハロー"}, app_id="app1", latency=0.25,
+    passed=True,
+    tests=[TestRecord(
+        method="equal", param="response.systemText.expression",
+        expected="ワールド", value="ワールド", passed=True, error=None
+    )]
+)
+
+FAILED = TaskResult(
+    name="失敗 <テスト>", bot="bot1", suite=None,
+    request={"voiceText": "ハロー"}, app_id="app2", latency=0.5,
+    passed=False,
+    tests=[
+        TestRecord(
+            method="equal", param="response.systemText.expression",
+            expected="こんにちは", value="ワールド", passed=False, error=None
+        ),
+        TestRecord(
+            method="equal", param="response.command",
+            expected="x", value=None, passed=False,
+            error='"response.command" is missing: key "command" not found'
+        ),
+    ]
+)
+
+
+class UnseekableIO(io.StringIO):
+    def seekable(self):
+        return False
+
+
+class ApplicationRepositoryMock:
+    def __init__(self):
+        self.count = 0
+
+    def register(self, bot):
+        self.count += 1
+        return Application(bot=bot, app_id="app{}".format(self.count))
+
+
+class EchoDialogRepositoryMock:
+    def dialogue(self, request):
+        return {"systemText": {"expression": request.dict()["voiceText"]}}
+
+
+class JSONLReporterTest(unittest.TestCase):
+    def test_report(self):
+        out = io.StringIO()
+        with JSONLReporter(out) as reporter:
+            reporter.report(PASSED)
+            reporter.report(FAILED)
+
+        first, second = [json.loads(line)
+                         for line in out.getvalue().splitlines()]
+        self.assertEqual(first["name"], "挨拶テスト")
+        self.assertEqual(first["bot"], "bot1")
+        self.assertEqual(first["app_id"], "app1")
+        self.assertEqual(first["latency"], 0.25)
+        self.assertTrue(first["passed"])
+        self.assertEqual(first["tests"][0]["value"], "ワールド")
+        self.assertFalse(second["passed"])
+        self.assertIsNone(second["tests"][1]["value"])
+
+
+class JUnitReporterTest(unittest.TestCase):
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "junit.xml")
+            with open(filename, "w", encoding="utf-8") as out, \
+                    JUnitReporter(out) as reporter:
+                reporter.report(PASSED)
+                reporter.report(FAILED)
+            root = ET.parse(filename).getroot()
+
+        self.assertEqual(root.tag, "testsuite")
+        self.assertEqual(root.get("tests"), "2")
+        self.assertEqual(root.get("failures"), "1")
+        self.assertEqual(root.get("time"), "0.750")
+
+        passed, failed = root.findall("testcase")
+        self.assertEqual(passed.get("classname"), "bot1")
+        self.assertEqual(passed.get("name"), "挨拶テスト")
+        self.assertEqual(passed.get("file"), "hello_test.yml")
+        self.assertEqual(passed.get("time"), "0.250")
+        self.assertEqual(passed.findall("failure"), [])
+        properties = {
+            prop.get("name"): prop.get("value")
+            for prop in passed.iter("property")
+        }
+        self.assertEqual(properties["app_id"], "app1")
+        self.assertEqual(json.loads(properties["request"]),
+                         {"voiceText": "ハロー"})
+        self.assertEqual(
+            json.loads(properties["response.systemText.expression"]),
+            "ワールド"
+        )
+
+        self.assertEqual(failed.get("name"), "失敗 <テスト>")
+        self.assertIsNone(failed.get("file"))
+        messages = [failure.get("message")
+                    for failure in failed.findall("failure")]
+        self.assertEqual(messages, [
+            'result "ワールド" != expected "こんにちは"',
+            'param "response.command" is missing: key "command" not found',
+        ])
+
+    def test_unseekable(self):
+        out = UnseekableIO()
+        with JUnitReporter(out) as reporter:
+            reporter.report(FAILED)
+        root = ET.fromstring(out.getvalue())
+        self.assertEqual(root.get("tests"), "0")
+        self.assertEqual(len(root.findall("testcase")), 1)
+
+
+class TaskManagerReporterTest(unittest.TestCase):
+    def _manager(self, count):
+        factory = AssertionMethodFactory()
+        tasks = [
+            Task(name="task{}".format(i), request={"voiceText": str(i)},
+                 tests=[Test(method=factory.build("equal"),
+                             param="response.systemText.expression",
+                             expected="1" if i == 3 else str(i))])
+            for i in range(count)
+        ]
+        return TaskManager(
+            tasks=tasks, config=TaskConfig(), name="test.yml"
+        )
+
+    def test_execute_tasks(self):
+        for concurrency in [1, 3]:
+            jsonl = io.StringIO()
+            junit = io.StringIO()
+            with MultiReporter([JSONLReporter(jsonl),
+                                JUnitReporter(junit)]) as reporter:
+                result = self._manager(10).execute_tasks(
+                    bot=Bot(id_="bot1"),
+                    application_repository=ApplicationRepositoryMock(),
+                    dialogue_repository=EchoDialogRepositoryMock(),
+                    concurrency=concurrency,
+                    out=io.StringIO(),
+                    reporter=reporter
+                )
+            self.assertFalse(result)
+
+            results = [json.loads(line)
+                       for line in jsonl.getvalue().splitlines()]
+            self.assertEqual(
+                sorted(res["name"] for res in results),
+                sorted("task{}".format(i) for i in range(10))
+            )
+            failed = [res for res in results if not res["passed"]]
+            self.assertEqual(len(failed), 1)
+            self.assertEqual(failed[0]["name"], "task3")
+            self.assertEqual(failed[0]["tests"][0]["value"], "3")
+            self.assertEqual(failed[0]["bot"], "bot1")
+            self.assertEqual(failed[0]["suite"], "test.yml")
+            self.assertEqual(failed[0]["request"], {"voiceText": "3"})
+            self.assertTrue(failed[0]["app_id"].startswith("app"))
+            self.assertGreaterEqual(failed[0]["latency"], 0)
+
+            root = ET.fromstring(junit.getvalue())
+            self.assertEqual(root.get("failures"), "1")
+            self.assertEqual(len(root.findall("testcase")), 10)
@@ -0,0 +1,272 @@
+import unittest
+import io
+import os
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from dialogapi.entity import Bot
+from dialogapi.entity import Project
+from dialogapi.entity import Property
+from dialogapi.entity import User
+from dialogapi.repository import BotRepository
+from dialogapi.repository import PropertyRepository
+from dialogapi.repository import StatusCodeException
+from dialogapi.server import Capabilities
+
+
+class ResponseMock:
+    def __init__(self, status_code, json=None):
+        self.status_code = status_code
+        self._json = json
+
+    def json(self):
+        return self._json
+
+
+class EndpointMock:
+    """sraix に対応していない NLU v2.5 の Management API のモック"""
+    def __init__(self, bots):
+        self.transport = self
+        self.bots = bots
+        self.calls = []
+
+    def url(self, point=None):
+        return point
+
+    def get(self, url, headers):
+        self.calls.append(("get", url))
+        return ResponseMock(200, {"bots": self.bots})
+
+    def post(self, url, headers, json):
+        self.calls.append(("post", url))
+        if "sraix" in json:
+            return ResponseMock(400)
+        return ResponseMock(201)
+
+    def put(self, url, headers, json):
+        self.calls.append(("put", url))
+        if "sraix" in json:
+            return ResponseMock(400)
+        return ResponseMock(204)
+
+
+def build_bot_repository(endpoint, capabilities):
+    user = User(name="TestUser")
+    user.set_authorized(access_token="token")
+    return BotRepository(
+        endpoint=endpoint, user=user, project=Project(name="P", id_=1),
+        capabilities=capabilities
+    )
+
+
+class BotRepositoryCapabilitiesTest(unittest.TestCase):
+    def test_add_listing_without_sraix(self):
+        # ボット一覧に sraix が含まれないことからは判定しない
+        endpoint = EndpointMock(bots=[{
+            "botId": "Exists", "scenarioProjectId": "DSU",
+            "language": "ja-JP", "description": ""
+        }])
+        capabilities = Capabilities()
+        repository = build_bot_repository(endpoint, capabilities)
+        repository.get_all()
+        self.assertIsNone(capabilities.sraix)
+
+        with redirect_stdout(io.StringIO()):
+            repository.add(bot=Bot(id_="Bot1"))
+        repository.add(bot=Bot(id_="Bot2"))
+        repository.update(bot=Bot(id_="Bot2"))
+
+        self.assertFalse(capabilities.sraix)
+        self.assertEqual(
+            [method for method, _ in endpoint.calls],
+            ["get", "post", "post", "post", "put"]
+        )
+
+    def test_listing_with_sraix(self):
+        endpoint = EndpointMock(bots=[{
+            "botId": "Exists", "scenarioProjectId": "DSU",
+            "language": "ja-JP", "description": "", "sraix": "null"
+        }])
+        capabilities = Capabilities()
+        build_bot_repository(endpoint, capabilities).get_all()
+        self.assertTrue(capabilities.sraix)
+
+    def test_add_fallback(self):
+        # 400 が返った結果から判定する
+        endpoint = EndpointMock(bots=None)
+        capabilities = Capabilities()
+        repository = build_bot_repository(endpoint, capabilities)
+        with redirect_stdout(io.StringIO()):
+            repository.add(bot=Bot(id_="Bot1"))
+        repository.add(bot=Bot(id_="Bot2"))
+
+        self.assertFalse(capabilities.sraix)
+        self.assertEqual(
+            [method for method, _ in endpoint.calls],
+            ["post", "post", "post"]
+        )
+
+    def test_add_stale_cache(self):
+        # 対応しているとキャッシュされていても、400 が返れば再送して訂正する
+        endpoint = EndpointMock(bots=None)
+        capabilities = Capabilities()
+        capabilities.set_sraix(True)
+        repository = build_bot_repository(endpoint, capabilities)
+        with redirect_stdout(io.StringIO()):
+            repository.add(bot=Bot(id_="Bot1"))
+            repository.update(bot=Bot(id_="Bot1", sraix="global"))
+
+        self.assertFalse(capabilities.sraix)
+        # 訂正後は sraix を指定せずに送信する
+        self.assertEqual(
+            [method for method, _ in endpoint.calls],
+            ["post", "post", "put"]
+        )
+
+    def test_cached_unsupported(self):
+        # 対応していないと判定済みの場合は再送せず、警告は一度だけ表示する
+        endpoint = EndpointMock(bots=None)
+        capabilities = Capabilities()
+        capabilities.set_sraix(False)
+        repository = build_bot_repository(endpoint, capabilities)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            repository.add(bot=Bot(id_="Bot1", sraix="global"))
+            repository.add(bot=Bot(id_="Bot2", sraix="public"))
+            repository.update(bot=Bot(id_="Bot1", sraix="global"))
+
+        self.assertEqual(
+            [method for method, _ in endpoint.calls], ["post", "post", "put"]
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+    def test_detect_concurrent(self):
+        # 判定するまでは一つずつ送信し、400 は一度だけ返る
+        endpoint = EndpointMock(bots=None)
+        capabilities = Capabilities()
+        repository = build_bot_repository(endpoint, capabilities)
+        with redirect_stdout(io.StringIO()):
+            threads = [
+                threading.Thread(
+                    target=repository.add,
+                    kwargs={"bot": Bot(id_="Bot{}".format(i))}
+                )
+                for i in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(endpoint.calls), 6)
+
+    def test_add_configured(self):
+        endpoint = EndpointMock(bots=None)
+        repository = build_bot_repository(
+            endpoint, Capabilities(sraix=False)
+        )
+        repository.add(bot=Bot(id_="Bot1"))
+        self.assertEqual(endpoint.calls, [("post", "projects/1/bots")])
+
+    def test_add_configured_no_fallback(self):
+        endpoint = EndpointMock(bots=None)
+        repository = build_bot_repository(
+            endpoint, Capabilities(sraix=True)
+        )
+        with self.assertRaises(StatusCodeException):
+            repository.add(bot=Bot(id_="Bot1"))
+        self.assertEqual(endpoint.calls, [("post", "projects/1/bots")])
+
+    def test_exists(self):
+        endpoint = EndpointMock(bots=[{
+            "botId": "Exists", "scenarioProjectId": "DSU",
+            "language": "ja-JP", "description": ""
+        }])
+        repository = build_bot_repository(
+            endpoint, Capabilities(sraix=False)
+        )
+        self.assertTrue(repository.exists(bot=Bot(id_="Exists")))
+        self.assertFalse(repository.exists(bot=Bot(id_="Bot1")))
+        repository.add(bot=Bot(id_="Bot1"))
+        self.assertTrue(repository.exists(bot=Bot(id_="Bot1")))
+
+        # ボット一覧の取得は一度だけ行う
+        self.assertEqual(
+            [method for method, _ in endpoint.calls], ["get", "post"]
+        )
+
+
+class PropertyEndpointMock:
+    def __init__(self, properties):
+        self.transport = self
+        self.properties = properties
+        self.calls = []
+
+    def url(self, point=None):
+        return point
+
+    def get(self, url, headers):
+        self.calls.append("get")
+        if self.properties is None:
+            return ResponseMock(404)
+        return ResponseMock(200, self.properties)
+
+    def post(self, url, headers, json):
+        self.calls.append("post")
+        if self.properties:
+            return ResponseMock(409)
+        self.properties = json
+        return ResponseMock(201)
+
+    def put(self, url, headers, json):
+        self.calls.append("put")
+        if self.properties is None:
+            return ResponseMock(404)
+        self.properties = json
+        return ResponseMock(204)
+
+
+class PropertyRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        filename = os.path.join(self._dir.name, "bot.properties")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write("name=TestBot\n")
+        self.property = Property(filename)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def build_repository(self, endpoint):
+        user = User(name="TestUser")
+        user.set_authorized(access_token="token")
+        return PropertyRepository(
+            endpoint, user, Project(name="P", id_=1), Bot(id_="Bot1")
+        )
+
+    def test_upsert_existing(self):
+        endpoint = PropertyEndpointMock(properties={"name": "Old"})
+        self.build_repository(endpoint).upsert(property=self.property)
+        self.assertEqual(endpoint.calls, ["get", "put"])
+        self.assertEqual(endpoint.properties, {"name": "TestBot"})
+
+    def test_upsert_new(self):
+        endpoint = PropertyEndpointMock(properties=None)
+        repository = self.build_repository(endpoint)
+        repository.upsert(property=self.property)
+        repository.upsert(property=self.property)
+        self.assertEqual(endpoint.calls, ["get", "post", "put"])
+
+    def test_upsert_stale_exists(self):
+        # 登録済みと判定した後にサーバで削除された場合は追加する
+        endpoint = PropertyEndpointMock(properties={"name": "Old"})
+        repository = self.build_repository(endpoint)
+        self.assertTrue(repository.exists())
+        endpoint.properties = None
+        repository.upsert(property=self.property)
+        self.assertEqual(endpoint.calls, ["get", "put", "post"])
+        self.assertEqual(endpoint.properties, {"name": "TestBot"})
+
+    def test_exists_empty(self):
+        # 空のボットプロパティもステータスコード 200 なら登録済みとする
+        endpoint = PropertyEndpointMock(properties={})
+        self.assertTrue(self.build_repository(endpoint).exists())
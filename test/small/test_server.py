@@ -1,4 +1,8 @@
 import unittest
+import os
+import tempfile
+from dialogapi.cache import FileCache
+from dialogapi.server import Capabilities
 from dialogapi.server import Server
 from dialogapi.server import Endpoint
 from dialogapi.server import EndpointException
@@ -34,6 +38,21 @@ class EndpointTest(unittest.TestCase):
         self.assertEqual(endpoint.ssl_verify, ssl_verify)
         self.assertEqual(endpoint.requests.verify, ssl_verify)
 
+    def test_requests_is_shared(self):
+        endpoint = build_endpoint()[0]
+        self.assertIs(endpoint.requests, endpoint.requests)
+
+    def test_pool_size(self):
+        endpoint = Endpoint(
+            host="host.example.jp", port=10443, protocol="https",
+            prefix="/management", header={}, ssl_verify=False,
+            pool_connections=2, pool_maxsize=32
+        )
+        self.assertEqual(endpoint.requests.pool_connections, 2)
+        self.assertEqual(endpoint.requests.pool_maxsize, 32)
+        self.assertEqual(endpoint.pool_maxsize, 32)
+        self.assertEqual(endpoint.requests.verify, False)
+
 
 class ServerTest(unittest.TestCase):
     def test_management_endpoint(self):
@@ -109,3 +128,31 @@ class PropertyTest(unittest.TestCase):
     def test_url_with_point(self):
         endpoint, _, url = build_endpoint()[:3]
         self.assertEqual(endpoint.url("test"), url + "/test")
+
+
+class CapabilitiesTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.cache = FileCache(
+            os.path.join(self._dir.name, "capabilities.json"), ttl=60
+        )
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_cache(self):
+        capabilities = Capabilities()
+        capabilities.bind_cache(self.cache, "server")
+        self.assertIsNone(capabilities.sraix)
+        capabilities.set_sraix(False)
+
+        capabilities = Capabilities()
+        capabilities.bind_cache(self.cache, "server")
+        self.assertFalse(capabilities.sraix)
+
+    def test_fixed(self):
+        capabilities = Capabilities(sraix=True)
+        capabilities.bind_cache(self.cache, "server")
+        capabilities.set_sraix(False)
+        self.assertTrue(capabilities.sraix)
+        self.assertIsNone(self.cache.get("server"))
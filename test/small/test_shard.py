@@ -0,0 +1,92 @@
+import unittest
+from dialogapi.entity import Bot
+from dialogapi.test.method import AssertionMethodFactory
+from dialogapi.test.shard import shard_tests
+from dialogapi.test.task import Task
+from dialogapi.test.task import TaskConfig
+from dialogapi.test.task import TaskManager
+from dialogapi.test.task import Test
+
+
+def _manager(name, count, keep_app_id=False):
+    factory = AssertionMethodFactory()
+    tasks = [
+        Task(name="{}-task{}".format(name, i), request={"voiceText": str(i)},
+             tests=[Test(method=factory.build("equal"),
+                         param="response.systemText.expression",
+                         expected=str(i))])
+        for i in range(count)
+    ]
+    return TaskManager(
+        tasks=tasks, config=TaskConfig(keep_app_id=keep_app_id), name=name
+    )
+
+
+def _bot_tests():
+    return [
+        (Bot(id_="bot1"), [_manager("a.yml", 20),
+                           _manager("keep.yml", 6, keep_app_id=True)]),
+        (Bot(id_="bot2"), [_manager("b.yml", 13)]),
+        (Bot(id_="bot3"), []),
+    ]
+
+
+def _task_names(bot_tests):
+    return [(bot.id_, manager.name, task.name)
+            for bot, tests in bot_tests
+            for manager in tests
+            for task in manager.tasks]
+
+
+class ShardTestsTest(unittest.TestCase):
+    def test_partition(self):
+        bot_tests = _bot_tests()
+        all_names = _task_names(bot_tests)
+        for count in [1, 2, 3, 5, 50]:
+            shards = [_task_names(shard_tests(bot_tests, i, count))
+                      for i in range(count)]
+            names = [name for shard in shards for name in shard]
+            self.assertEqual(sorted(names), sorted(all_names))
+            # シャード内の順序は元の順序を保つ
+            for shard in shards:
+                self.assertEqual(
+                    shard, [name for name in all_names if name in shard]
+                )
+
+    def test_balance(self):
+        bot_tests = _bot_tests()
+        sizes = [len(_task_names(shard_tests(bot_tests, i, 3)))
+                 for i in range(3)]
+        self.assertEqual(sum(sizes), 39)
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_keep_app_id(self):
+        bot_tests = _bot_tests()
+        keep = bot_tests[0][1][1]
+        found = []
+        for i in range(4):
+            for bot, tests in shard_tests(bot_tests, i, 4):
+                for manager in tests:
+                    if manager.name == "keep.yml":
+                        found.append(manager)
+        self.assertEqual(found, [keep])
+
+    def test_subset(self):
+        sharded = shard_tests(_bot_tests(), 0, 2)
+        for bot, tests in sharded:
+            self.assertTrue(tests)
+            for manager in tests:
+                self.assertTrue(manager.tasks)
+                self.assertIsInstance(manager.config, TaskConfig)
+        self.assertNotIn("bot3", [bot.id_ for bot, _ in sharded])
+
+    def test_deterministic(self):
+        self.assertEqual(
+            _task_names(shard_tests(_bot_tests(), 1, 3)),
+            _task_names(shard_tests(_bot_tests(), 1, 3))
+        )
+
+    def test_invalid_index(self):
+        for index, count in [(2, 2), (-1, 2)]:
+            with self.assertRaises(ValueError):
+                shard_tests(_bot_tests(), index, count)
@@ -1,7 +1,19 @@
 import unittest
+import re
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import redirect_stdout
+from dialogapi.cache import FileCache
 from dialogapi.entity import Application
 from dialogapi.entity import Bot
+from dialogapi.test.accessor import MissingValueException
 from dialogapi.test.method import AssertEqual
+from dialogapi.test.method import AssertLatencyLessThan
 from dialogapi.test.method import AssertIn
 from dialogapi.test.method import AssertRegexEqual
 from dialogapi.test.method import AssertRegexIn
@@ -15,6 +27,10 @@ from dialogapi.test.task import Task
 from dialogapi.test.task import TaskConfig
 from dialogapi.test.task import TaskManager
 from dialogapi.test.config import Parser
+from dialogapi.test.app_pool import AppIdPool
+from dialogapi.test.reporter import JSONLReporter
+from dialogapi.test.reporter import JUnitReporter
+from dialogapi.test.reporter import MultiReporter
 
 
 class ApplicationRepositoryMock:
@@ -25,11 +41,36 @@ class ApplicationRepositoryMock:
         )
 
 
+class CountingApplicationRepositoryMock:
+    """登録毎に異なる app_id を払い出すモック"""
+    def __init__(self):
+        self.count = 0
+        self.endpoint = self
+        self._lock = threading.Lock()
+
+    def url(self):
+        return "https://registration.example.jp"
+
+    def register(self, bot):
+        with self._lock:
+            self.count += 1
+            app_id = "app{}".format(self.count)
+        return Application(bot=bot, app_id=app_id)
+
+
 class DialogRepositoryMock:
     def dialogue(self, request):
         return {"systemText": {"expression": "ワールド"}}
 
 
+class EchoDialogRepositoryMock:
+    """入力発話をそのまま返すモック。後のタスクほど早く応答する"""
+    def dialogue(self, request):
+        voice_text = request.dict()["voiceText"]
+        time.sleep(0.01 * (5 - int(voice_text)))
+        return {"systemText": {"expression": voice_text}}
+
+
 class TaskManagerTest(unittest.TestCase):
     def test_execute_tasks_ok(self):
         # タスクの定義
@@ -56,6 +97,110 @@ class TaskManagerTest(unittest.TestCase):
         )
         self.assertTrue(result)
 
+    def _build_echo_manager(self, keep_app_id):
+        factory = AssertionMethodFactory()
+        tasks = [
+            Task(
+                name="task{}".format(i),
+                request={"voiceText": str(i)},
+                tests=[Test(method=factory.build("equal"),
+                            param="response.systemText.expression",
+                            expected="1" if i == 3 else str(i))]
+            )
+            for i in range(5)
+        ]
+        return TaskManager(
+            tasks=tasks,
+            config=TaskConfig(keep_app_id=keep_app_id),
+        )
+
+    def _execute_echo(self, keep_app_id, concurrency):
+        manager = self._build_echo_manager(keep_app_id)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            result = manager.execute_tasks(
+                bot=Bot(id_="JP_testBot"),
+                application_repository=ApplicationRepositoryMock(),
+                dialogue_repository=EchoDialogRepositoryMock(),
+                concurrency=concurrency
+            )
+        return result, out.getvalue()
+
+    def test_execute_tasks_concurrent(self):
+        result, text = self._execute_echo(False, 5)
+        serial_result, serial_text = self._execute_echo(False, 1)
+        self.assertFalse(result)
+        # 出力はタスクの定義順となる
+        self.assertEqual(text, serial_text)
+        self.assertEqual(result, serial_result)
+
+    def test_execute_tasks_concurrent_keep_app_id(self):
+        result, text = self._execute_echo(True, 5)
+        _, serial_text = self._execute_echo(True, 1)
+        self.assertFalse(result)
+        self.assertEqual(text, serial_text)
+
+    def test_execute_tasks_register_count(self):
+        for keep_app_id, concurrency, expected in [
+            (False, 1, 5), (False, 5, 5), (True, 1, 1)
+        ]:
+            manager = self._build_echo_manager(keep_app_id)
+            repository = CountingApplicationRepositoryMock()
+            with redirect_stdout(io.StringIO()):
+                manager.execute_tasks(
+                    bot=Bot(id_="JP_testBot"),
+                    application_repository=repository,
+                    dialogue_repository=EchoDialogRepositoryMock(),
+                    concurrency=concurrency
+                )
+            self.assertEqual(repository.count, expected)
+
+
+class AppIdPoolTest(unittest.TestCase):
+    def test_acquire(self):
+        repository = CountingApplicationRepositoryMock()
+        with AppIdPool(repository, Bot(id_="JP_testBot")) as pool:
+            pool.reserve(3)
+            app_ids = {pool.acquire().app_id for _ in range(4)}
+        self.assertEqual(app_ids, {"app1", "app2", "app3", "app4"})
+        self.assertEqual(repository.count, 4)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            cache = FileCache(os.path.join(dirname, "app_ids.json"), ttl=60)
+            repository = CountingApplicationRepositoryMock()
+            bot = Bot(id_="JP_testBot")
+            with AppIdPool(repository, bot, cache=cache) as pool:
+                pool.reserve(3)
+                used = pool.acquire().app_id
+
+            # 使われなかった app_id を次回に使う
+            with AppIdPool(repository, bot, cache=cache) as pool:
+                pool.reserve(2)
+                app_ids = {pool.acquire().app_id for _ in range(2)}
+            self.assertEqual(repository.count, 3)
+            self.assertNotIn(used, app_ids)
+
+    def test_cache_take_shortfall(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            cache = FileCache(os.path.join(dirname, "app_ids.json"), ttl=60)
+            repository = CountingApplicationRepositoryMock()
+            bot = Bot(id_="JP_testBot")
+            with AppIdPool(repository, bot, cache=cache) as pool:
+                pool.reserve(4)
+
+            # 不足する数だけキャッシュから取り出し、残りは他のプールに残す
+            first = AppIdPool(repository, bot, cache=cache)
+            second = AppIdPool(repository, bot, cache=cache)
+            first.reserve(2)
+            second.reserve(2)
+            app_ids = [pool.acquire().app_id
+                       for pool in [first, first, second, second]]
+            first.close()
+            second.close()
+            self.assertEqual(repository.count, 4)
+            self.assertEqual(len(set(app_ids)), 4)
+
 
 class TaskTest(unittest.TestCase):
     def test_execute_tests_ok(self):
@@ -97,6 +242,22 @@ class TaskTest(unittest.TestCase):
         res = task.execute_tests(response=response)
         self.assertFalse(res)
 
+    def test_execute_tests_missing(self):
+        factory = AssertionMethodFactory()
+        test = Test(method=factory.build("equal"),
+                    param="response.systemText.utterance",
+                    expected="お疲れ様です。")
+        task = Task(name="テストタスク", request=None, tests=[test])
+        out = io.StringIO()
+        res = task.execute_tests(response={"systemText": {}}, out=out)
+        self.assertFalse(res)
+        self.assertEqual(
+            out.getvalue(),
+            '- テストタスク ... fail. In assertion method "equal", '
+            'param "response.systemText.utterance" is missing: '
+            'key "utterance" not found.\n'
+        )
+
 
 class TestTest(unittest.TestCase):
     def test_execute(self):
@@ -118,6 +279,33 @@ class TestTest(unittest.TestCase):
         self.assertEqual(res.result, "お疲れ様です。")
         self.assertEqual(res.expected, "お疲れ様です。")
 
+    def test_execute_missing(self):
+        factory = AssertionMethodFactory()
+        test = Test(method=factory.build("not_equal"),
+                    param="response.systemText.utterance",
+                    expected="お疲れ様です。")
+        res = test.execute(response={"systemText": {}})
+
+        self.assertFalse(res.bool)
+        self.assertIsInstance(res.error, MissingValueException)
+        self.assertEqual(res.error.path, "response.systemText.utterance")
+
+    def test_execute_shared_values(self):
+        factory = AssertionMethodFactory()
+        test = Test(method=factory.build("equal"),
+                    param="response.items[*].id",
+                    expected=["a", "b"])
+        values = dict()
+        res = test.execute(
+            response={"items": [{"id": "a"}, {"id": "b"}]}, values=values
+        )
+        self.assertTrue(res.bool)
+        self.assertEqual(values, {"response.items[*].id": ["a", "b"]})
+
+        # キャッシュがある場合はレスポンスを参照しない
+        res = test.execute(response={}, values=values)
+        self.assertTrue(res.bool)
+
 
 class AssertionMethodFactoryTest(unittest.TestCase):
     def test_build_equal(self):
@@ -330,3 +518,192 @@ tasks:
         self.assertEqual(len(manager.tasks[0].tests), 3)
         self.assertEqual(manager.tasks[1].name, "「はろー」に対するテスト")
         self.assertEqual(len(manager.tasks[1].tests), 1)
+
+
+class CompileTest(unittest.TestCase):
+    def test_regex(self):
+        method = AssertRegexEqual()
+        second = method.compile(r"^\w ")
+        self.assertTrue(method.execute(first="テ スト", second=second))
+        self.assertFalse(method.execute(first="テスト", second=second))
+
+    def test_regex_list_merged(self):
+        for method, matched in [(AssertRegexIn(), True),
+                                (AssertRegexNotIn(), False)]:
+            second = method.compile(["感じ$", r"^\w ", "a|b"])
+            self.assertEqual(len(second), 1)
+            self.assertEqual(method.execute(first="テ スト", second=second),
+                             matched)
+            self.assertEqual(method.execute(first="b", second=second),
+                             matched)
+            self.assertEqual(method.execute(first="テスト", second=second),
+                             not matched)
+
+    def test_regex_list_not_merged(self):
+        method = AssertRegexIn()
+        for expected in [[r"(a)\1", "b"],
+                         ["(?i)abc", "d"],
+                         ["(?P<x>a)", "(?P<x>b)"]]:
+            second = method.compile(expected)
+            self.assertEqual(len(second), 2)
+        second = method.compile([r"(a)\1", r"(b)\1"])
+        self.assertTrue(method.execute(first="bb", second=second))
+        self.assertFalse(method.execute(first="ab", second=second))
+        second = method.compile(["(?i)abc", "d"])
+        self.assertTrue(method.execute(first="ABC", second=second))
+        self.assertFalse(method.execute(first="D", second=second))
+
+    def test_invalid_regex(self):
+        with self.assertRaises(re.error):
+            AssertRegexIn().compile(["(a", "b"])
+
+    def test_membership(self):
+        for method, contained in [(AssertIn(), True),
+                                  (AssertNotIn(), False)]:
+            second = method.compile(["テスト", "テスト2"])
+            self.assertEqual(method.execute(first="テスト", second=second),
+                             contained)
+            self.assertEqual(method.execute(first="テスト1", second=second),
+                             not contained)
+            # ハッシュ化できない値
+            self.assertEqual(method.execute(first=["テスト"], second=second),
+                             not contained)
+
+    def test_membership_unhashable(self):
+        method = AssertIn()
+        second = method.compile([{"a": 1}, {"b": 2}])
+        self.assertTrue(method.execute(first={"b": 2}, second=second))
+        self.assertFalse(method.execute(first={"c": 3}, second=second))
+
+    def test_membership_string(self):
+        method = AssertIn()
+        second = method.compile("こんにちは")
+        self.assertTrue(method.execute(first="にち", second=second))
+
+
+class LatencyTest(unittest.TestCase):
+    def test_build_latency_lt(self):
+        factory = AssertionMethodFactory()
+        cls = factory.build("latency_lt")
+        self.assertEqual(cls.__class__.__name__, "AssertLatencyLessThan")
+
+    def test_compile_not_number(self):
+        for expected in ["500", True, None]:
+            with self.assertRaises(ValueError):
+                AssertLatencyLessThan().compile(expected)
+
+    def test_execute(self):
+        test = Test(method=AssertLatencyLessThan(), param=None, expected=500)
+        self.assertEqual(test.param, "latency")
+
+        res = test.execute(response={}, latency=0.3)
+        self.assertTrue(res.bool)
+        self.assertEqual(res.result, 300.0)
+        self.assertFalse(test.execute(response={}, latency=0.5).bool)
+
+        res = test.execute(response={})
+        self.assertFalse(res.bool)
+        self.assertEqual(res.error.reason, "not measured")
+
+    def test_param(self):
+        test = Test(
+            method=AssertLatencyLessThan(), param="latency", expected=500
+        )
+        self.assertEqual(test.param, "latency")
+        # 所要時間以外の param は無視せずにエラーとする
+        with self.assertRaises(ValueError):
+            Test(method=AssertLatencyLessThan(),
+                 param="response.systemText.expression", expected=500)
+
+    def test_param_required(self):
+        with self.assertRaises(ValueError):
+            Test(method=AssertEqual(), param=None, expected="x")
+
+    def test_config(self):
+        config = TaskConfig(latency_p95=500, latency_p99=1000.5)
+        self.assertEqual(config.latency_budgets, {95: 500, 99: 1000.5})
+        self.assertEqual(TaskConfig().latency_budgets, {})
+        with self.assertRaises(ValueError):
+            TaskConfig(latency_p95="500ms")
+
+    def _execute(self, config, concurrency=1, reporter=None):
+        manager = Parser().parse_fd("""
+config:
+  {}
+tasks:
+  - name: 遅いタスク
+    request:
+      voiceText: "0"
+    tests:
+      - method: latency_lt
+        expected: 10
+  - name: 速いタスク
+    request:
+      voiceText: "4"
+    tests:
+      - method: latency_lt
+        expected: 10000
+""".format(config))
+        out = io.StringIO()
+        result = manager.execute_tasks(
+            bot=Bot(id_="JP_testBot"),
+            application_repository=ApplicationRepositoryMock(),
+            dialogue_repository=EchoDialogRepositoryMock(),
+            concurrency=concurrency,
+            out=out,
+            reporter=reporter
+        )
+        return result, out.getvalue().splitlines()
+
+    def test_latency_lt(self):
+        # EchoDialogRepositoryMock は "0" に 50 ミリ秒かけて応答する
+        result, lines = self._execute("keep_app_id: false", concurrency=2)
+        self.assertFalse(result)
+        self.assertTrue(lines[0].startswith(
+            '- 遅いタスク ... fail. In assertion method "latency_lt", result "'
+        ))
+        self.assertEqual(lines[1], "- 速いタスク ... ok.")
+
+    def test_budget(self):
+        result, lines = self._execute("latency_p50: 10000")
+        self.assertFalse(result)
+        self.assertEqual(lines[2], "- latency p50 ... ok.")
+
+        result, lines = self._execute(
+            "latency_p50: 10000\n  latency_p99: 20"
+        )
+        self.assertEqual(lines[2], "- latency p50 ... ok.")
+        self.assertRegex(
+            lines[3],
+            r"^- latency p99 \.\.\. fail\. p99 latency \d+\.\d ms "
+            r"exceeds budget 20 ms\.$"
+        )
+
+    def test_budget_report(self):
+        # パーセンタイルの判定もタスクと同じくレポーターに報告する
+        jsonl = io.StringIO()
+        junit = io.StringIO()
+        with MultiReporter([JSONLReporter(jsonl),
+                            JUnitReporter(junit)]) as reporter:
+            self._execute(
+                "latency_p50: 10000\n  latency_p99: 20", reporter=reporter
+            )
+
+        results = [json.loads(line) for line in jsonl.getvalue().splitlines()]
+        self.assertEqual(
+            [res["name"] for res in results],
+            ["遅いタスク", "速いタスク", "latency p50", "latency p99"]
+        )
+        p50, p99 = results[2:]
+        self.assertTrue(p50["passed"])
+        self.assertFalse(p99["passed"])
+        self.assertEqual(p99["bot"], "JP_testBot")
+        self.assertEqual(p99["tests"][0]["method"], "latency_p99")
+        self.assertEqual(p99["tests"][0]["expected"], 20)
+        self.assertGreater(p99["tests"][0]["value"], 20)
+
+        root = ET.fromstring(junit.getvalue())
+        self.assertEqual(root.get("failures"), "2")
+        testcase = root.findall("testcase")[3]
+        self.assertEqual(testcase.get("name"), "latency p99")
+        self.assertEqual(len(testcase.findall("failure")), 1)
@@ -0,0 +1,210 @@
+import unittest
+import asyncio
+from dialogapi.async_http import AsyncHTTP
+from dialogapi.fake_server import FakeServer
+from dialogapi.fake_server import MANAGEMENT_PREFIX
+from dialogapi.requests import Requests
+from dialogapi.server import Endpoint
+from dialogapi.transport import Timings
+from dialogapi.transport import Transport
+from dialogapi.transport import TransportHook
+
+
+class ResponseMock:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+
+class TransportMock(Transport):
+    """ペイロードの長さを返すトランスポートのモック。"error" への送信は失敗する"""
+    def _prepare(self, method, url, kwargs):
+        body = kwargs.get("data", b"")
+        return (url, body), len(body)
+
+    def _send(self, prepared):
+        url, body = prepared
+        if url == "error":
+            raise ConnectionError("refused")
+        timings = Timings(connect=None, tls=None, ttfb=0.1, total=None)
+        return ResponseMock(200, b"x" * len(body)), timings
+
+
+class RecordingHook(TransportHook):
+    def __init__(self):
+        self.events = []
+
+    def before_request(self, request):
+        self.events.append(("before", request))
+
+    def after_response(self, request, response):
+        self.events.append(("after", request, response))
+
+
+class TransportTest(unittest.TestCase):
+    def test_hooks(self):
+        hook = RecordingHook()
+        transport = TransportMock(hooks=[hook])
+        res = transport.post("url", data=b"abc")
+        self.assertEqual(res.status_code, 200)
+
+        (_, request), (_, request_, response) = hook.events
+        self.assertEqual(request, request_)
+        self.assertEqual(request.method, "POST")
+        self.assertEqual(request.url, "url")
+        self.assertEqual(request.payload_size, 3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.size, 3)
+        self.assertEqual(response.timings.ttfb, 0.1)
+        self.assertIsNotNone(response.timings.total)
+        self.assertIsNone(response.error)
+
+    def test_hooks_on_error(self):
+        hook = RecordingHook()
+        transport = TransportMock(hooks=[hook])
+        with self.assertRaises(ConnectionError):
+            transport.get("error")
+
+        _, _, response = hook.events[1]
+        self.assertIsNone(response.status_code)
+        self.assertIsInstance(response.error, ConnectionError)
+        self.assertIsNotNone(response.timings.total)
+
+    def test_remove_hook(self):
+        hook = RecordingHook()
+        transport = TransportMock()
+        transport.add_hook(hook)
+        transport.get("url")
+        transport.remove_hook(hook)
+        transport.get("url")
+        self.assertEqual(len(hook.events), 2)
+
+    def test_endpoint_transport(self):
+        transport = TransportMock()
+        endpoint = Endpoint(
+            host="host.example.jp", port=443, protocol="https",
+            prefix="/management", header={}, ssl_verify=True,
+            transport=transport
+        )
+        self.assertIs(endpoint.transport, transport)
+        self.assertIs(endpoint.requests, transport)
+
+
+class RequestsTest(unittest.TestCase):
+    def test_timings(self):
+        hook = RecordingHook()
+        transport = Requests(verify=False, hooks=[hook])
+        with FakeServer() as server:
+            url = "http://{}:{}{}/login".format(
+                server.host, server.port, MANAGEMENT_PREFIX
+            )
+            for _ in range(2):
+                res = transport.post(
+                    url, json={"accountName": "user"}, timeout=3
+                )
+                self.assertEqual(res.status_code, 200)
+            transport.close()
+
+        responses = [event[2] for event in hook.events if event[0] == "after"]
+        first, second = responses
+        self.assertEqual(hook.events[0][1].payload_size,
+                         len(b'{"accountName": "user"}'))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.size, len(res.content))
+        # 最初のリクエストのみ接続し、http のため TLS ハンドシェイクはない
+        self.assertIsNotNone(first.timings.connect)
+        self.assertIsNone(first.timings.tls)
+        self.assertIsNone(second.timings.connect)
+        for response in responses:
+            self.assertLessEqual(response.timings.ttfb, response.timings.total)
+
+    def test_verify(self):
+        transport = Requests(verify=True)
+        verifies = []
+        send = transport._session.send
+
+        def send_mock(request, **kwargs):
+            verifies.append(kwargs["verify"])
+            return send(request, **kwargs)
+
+        transport._session.send = send_mock
+        with FakeServer() as server:
+            url = "http://{}:{}{}/login".format(
+                server.host, server.port, MANAGEMENT_PREFIX
+            )
+            # リクエスト毎の verify はセッションの値より優先する
+            transport.post(url, json={"accountName": "user"}, verify=False)
+            transport.post(url, json={"accountName": "user"})
+            transport.close()
+        # True は環境変数により CA バンドルのパスに置き換わることがある
+        self.assertIs(verifies[0], False)
+        self.assertIsNot(verifies[1], False)
+
+
+class AsyncHTTPTest(unittest.TestCase):
+    def test_timings(self):
+        hook = RecordingHook()
+        transport = AsyncHTTP(verify=False, hooks=[hook])
+
+        async def run(url):
+            statuses = []
+            for _ in range(2):
+                res = await transport.post(
+                    url, json={"accountName": "user"}, timeout=3
+                )
+                statuses.append(res.status_code)
+            await transport.close()
+            return statuses, res
+
+        with FakeServer() as server:
+            url = "http://{}:{}{}/login".format(
+                server.host, server.port, MANAGEMENT_PREFIX
+            )
+            statuses, res = asyncio.run(run(url))
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertIn("accessToken", res.json())
+        responses = [event[2] for event in hook.events if event[0] == "after"]
+        first, second = responses
+        self.assertEqual(hook.events[0][1].payload_size,
+                         len(b'{"accountName": "user"}'))
+        self.assertEqual(first.size, len(res.content))
+        # 最初のリクエストのみ接続し、http のため TLS ハンドシェイクはない
+        self.assertIsNotNone(first.timings.connect)
+        self.assertIsNone(first.timings.tls)
+        self.assertIsNone(second.timings.connect)
+        for response in responses:
+            self.assertLessEqual(response.timings.ttfb, response.timings.total)
+
+    def test_chunked(self):
+        # chunked のレスポンスを読み込み、Connection: close の接続は再利用しない
+        hook = RecordingHook()
+        transport = AsyncHTTP(verify=False, hooks=[hook])
+        requests = []
+
+        async def handle(reader, writer):
+            requests.append(await reader.readuntil(b"\r\n\r\n"))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n"
+                b"Connection: close\r\n\r\n"
+                b"3\r\n{\"a\r\n5\r\n\": 1}\r\n0\r\n\r\n"
+            )
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            url = "http://127.0.0.1:{}/path?q=1".format(port)
+            responses = [await transport.get(url) for _ in range(2)]
+            await transport.close()
+            server.close()
+            await server.wait_closed()
+            return responses
+
+        responses = asyncio.run(run())
+        self.assertEqual([res.json() for res in responses], [{"a": 1}] * 2)
+        self.assertTrue(requests[0].startswith(b"GET /path?q=1 HTTP/1.1\r\n"))
+        connects = [event[2].timings.connect for event in hook.events
+                    if event[0] == "after"]
+        self.assertNotIn(None, connects)